@@ -0,0 +1,104 @@
+"""Bot and crawler filtering for analytics tracking.
+
+Runs before geolocation, enrichment and insert. Events from known bot
+User-Agents, requests without a User-Agent, and sessions sending events
+faster than a person could are dropped. They are only counted: the counts
+are kept in memory and folded into the rollups (dimension 'filtered') by the
+ingest worker, so the dashboard can show how much traffic was discarded.
+"""
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from analytics_dimensions import compile_bot_patterns, is_bot_user_agent
+from analytics_rollups import ROLLUP_GRANULARITIES, bucket_start, upsert_counts
+from cache import LRUCache
+
+FILTER_REASONS = ('bot_user_agent', 'empty_user_agent', 'session_rate')
+# How long a session that went over the rate limit stays flagged
+FLAG_DURATION = timedelta(minutes=10)
+
+
+class BotFilter:
+    """Classifies tracking requests as bot traffic and counts what it drops"""
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.max_events_per_minute = 120
+        self._matcher = compile_bot_patterns()
+        # session id -> [minute, events in that minute, flagged until (None when not flagged)]
+        self._sessions = LRUCache(maxsize=50000, default_ttl=3600)
+        self._pending = Counter()  # (granularity, bucket_start, reason) -> events not yet in the rollups
+        self._lock = threading.Lock()
+        self.stats = Counter()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('ANALYTICS_BOT_FILTER', True)
+        self.max_events_per_minute = app.config.get('ANALYTICS_BOT_MAX_EVENTS_PER_MINUTE', 120)
+        extra = [p.strip() for p in app.config.get('ANALYTICS_BOT_EXTRA_PATTERNS', '').split(',') if p.strip()]
+        self._matcher = compile_bot_patterns(extra)
+
+    def check(self, user_agent, session_id=None, events=1, now=None):
+        """Return why the events should be dropped (and count them), or None to keep them"""
+        if not self.enabled:
+            return None
+        now = now or datetime.utcnow()
+        if not user_agent:
+            reason = 'empty_user_agent'
+        elif is_bot_user_agent(user_agent, self._matcher):
+            reason = 'bot_user_agent'
+        elif session_id and self._over_rate(session_id, events, now):
+            reason = 'session_rate'
+        else:
+            return None
+        self._record(reason, events, now)
+        return reason
+
+    def _over_rate(self, session_id, events, now):
+        # Fixed one-minute window per session; once over the limit the session is flagged for FLAG_DURATION
+        minute = now.replace(second=0, microsecond=0)
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is not None and state[2] is not None:
+                if now < state[2]:
+                    return True  # Not stored again: more events must not extend the flag
+                state = None
+            if state is None or state[0] != minute:
+                state = [minute, 0, None]
+            state[1] += events
+            if state[1] > self.max_events_per_minute:
+                state[2] = now + FLAG_DURATION
+            self._sessions.set(session_id, state)
+            return state[2] is not None
+
+    def _record(self, reason, events, now):
+        with self._lock:
+            self.stats[reason] += events
+            for granularity in ROLLUP_GRANULARITIES:
+                self._pending[(granularity, bucket_start(now, granularity), reason)] += events
+
+    def flush_counts(self, session):
+        """Ingest periodic task: add the filtered-event counts to the rollups"""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return
+        upsert_counts(session, Counter({
+            (granularity, 'filtered', start, 'filtered', reason, ''): count
+            for (granularity, start, reason), count in pending.items()
+        }))
+
+    def get_stats(self):
+        with self._lock:
+            filtered = dict(self.stats)
+        return {
+            'enabled': self.enabled,
+            'max_events_per_minute': self.max_events_per_minute,
+            'filtered': {reason: filtered.get(reason, 0) for reason in FILTER_REASONS},
+            'tracked_sessions': len(self._sessions),
+        }
+
+
+bot_filter = BotFilter()
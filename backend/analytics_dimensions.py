@@ -0,0 +1,231 @@
+"""User-Agent and referrer dimensions for analytics events.
+
+Raw User-Agent and referrer strings are long and repeat across most events.
+Each distinct string is parsed once (memoized) and stored in a small
+dimension table, and Analytics rows reference it by integer id. The parsed
+attributes (browser, os, device, referrer domain) feed the rollups, so the
+dashboard breakdowns never touch the raw strings.
+"""
+import hashlib
+import re
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from sqlalchemy import bindparam, insert, select, update
+
+from models import db, Analytics, Referrer, UserAgent
+from cache import LRUCache
+
+# Bot User-Agents: case-insensitive regex fragments matched anywhere in the string.
+# Fragments must not match real devices or browsers (e.g. a bare 'bot' matches
+# CUBOT phones), so generic words are only used in crawler-style tokens.
+# Used by analytics_bots to drop bot traffic; extend at deploy time with
+# ANALYTICS_BOT_EXTRA_PATTERNS.
+BOT_PATTERNS = (
+    # Crawler-style product tokens: "Somebot/2.1", "Somebot;" and "+http://example.com/bot.html" contact URLs
+    r'bot[/;]', r'\+https?://', r'crawl', r'spider', r'slurp', r'scraper', r'archiver', r'fetcher',
+    # Search engines and link unfurlers
+    r'googlebot', r'bingbot', r'bingpreview', r'baiduspider', r'duckduckbot', r'applebot', r'facebookexternalhit',
+    r'twitterbot', r'linkedinbot', r'slackbot', r'discordbot', r'telegrambot', r'whatsapp', r'embedly',
+    r'skypeuripreview',
+    # SEO and AI crawlers
+    r'ahrefs', r'semrush', r'mj12bot', r'dotbot', r'petalbot', r'bytespider', r'gptbot', r'claudebot',
+    r'ccbot', r'perplexity', r'dataforseo',
+    # Uptime and performance monitors
+    r'uptimerobot', r'pingdom', r'statuscake', r'site24x7', r'newrelicpinger', r'datadog', r'uptime-kuma',
+    r'betteruptime', r'lighthouse', r'pagespeed', r'gtmetrix',
+    # Headless browsers and automation
+    r'headlesschrome', r'phantomjs', r'puppeteer', r'playwright', r'selenium',
+    # HTTP libraries and command-line clients
+    r'python-requests', r'python-urllib', r'aiohttp', r'httpx', r'curl/', r'wget/', r'go-http-client',
+    r'java/', r'okhttp', r'apache-httpclient', r'node-fetch', r'libwww-perl', r'postmanruntime',
+)
+
+
+def compile_bot_patterns(extra=()):
+    """One alternation over every pattern, so a User-Agent is matched in a single pass"""
+    return re.compile('|'.join(f'(?:{p})' for p in (*BOT_PATTERNS, *extra)), re.IGNORECASE)
+
+
+_BOT = compile_bot_patterns()
+
+
+def is_bot_user_agent(user_agent, matcher=None):
+    return bool((matcher or _BOT).search(user_agent or ''))
+
+
+# (browser, pattern capturing the major version); order matters, e.g. Edge and Opera also say "Chrome"
+_BROWSERS = (
+    ('Edge', re.compile(r'Edg(?:e|A|iOS)?/(\d+)')),
+    ('Opera', re.compile(r'(?:OPR|Opera)/(\d+)')),
+    ('Samsung Internet', re.compile(r'SamsungBrowser/(\d+)')),
+    ('Firefox', re.compile(r'(?:Firefox|FxiOS)/(\d+)')),
+    ('Chrome', re.compile(r'(?:Chrome|CriOS)/(\d+)')),
+    ('Safari', re.compile(r'Version/(\d+).*Safari/')),
+    ('Internet Explorer', re.compile(r'(?:MSIE |Trident/.*rv:)(\d+)')),
+)
+_OPERATING_SYSTEMS = (
+    ('iOS', re.compile(r'iPhone|iPad|iPod')),
+    ('Android', re.compile(r'Android')),
+    ('Windows', re.compile(r'Windows')),
+    ('ChromeOS', re.compile(r'CrOS')),
+    ('macOS', re.compile(r'Macintosh|Mac OS X')),
+    ('Linux', re.compile(r'Linux')),
+)
+_TABLET = re.compile(r'iPad|Tablet|Android(?!.*Mobile)')
+_MOBILE = re.compile(r'Mobi|iPhone|iPod|Android')
+
+_UA_LENGTH = UserAgent.__table__.c.user_agent.type.length
+_URL_LENGTH = Referrer.__table__.c.url.type.length
+_MAX_HOST_LENGTH = 253
+
+# (table name, string hash) -> dimension row id
+_ids = LRUCache(maxsize=10000)
+
+
+@lru_cache(maxsize=4096)
+def parse_user_agent(user_agent):
+    """(browser, major_version, os, device) for a raw User-Agent string"""
+    if not user_agent:
+        return 'Unknown', None, 'Unknown', 'unknown'
+    os_name = next((name for name, pattern in _OPERATING_SYSTEMS if pattern.search(user_agent)), 'Other')
+    if is_bot_user_agent(user_agent):
+        return 'Bot', None, os_name, 'bot'
+    browser, version = 'Other', None
+    for name, pattern in _BROWSERS:
+        match = pattern.search(user_agent)
+        if match:
+            browser, version = name, match.group(1)
+            break
+    if _TABLET.search(user_agent):
+        device = 'tablet'
+    elif _MOBILE.search(user_agent):
+        device = 'mobile'
+    else:
+        device = 'desktop'
+    return browser, version, os_name, device
+
+
+@lru_cache(maxsize=4096)
+def referrer_domain(url):
+    """Host of a referrer URL without a leading 'www.'; None when there is none"""
+    if not url:
+        return None
+    try:
+        host = urlsplit(url).hostname
+    except ValueError:
+        return None
+    if not host or len(host) > _MAX_HOST_LENGTH:  # Longer than any DNS name: not a real referrer
+        return None
+    return host[4:] if host.startswith('www.') else host
+
+
+def describe(row):
+    """Add the parsed browser, os, device and referrer_domain of an event row's raw strings"""
+    browser, _, os_name, device = parse_user_agent(row.get('user_agent') or '')
+    row['browser'] = browser
+    row['os'] = os_name
+    row['device'] = device
+    row['referrer_domain'] = referrer_domain(row.get('referrer') or '')
+    return row
+
+
+def _hash(value):
+    return hashlib.blake2b(value.encode('utf-8', 'replace'), digest_size=16).hexdigest()
+
+
+def _user_agent_values(user_agent):
+    browser, version, os_name, device = parse_user_agent(user_agent)
+    return {'user_agent': user_agent[:_UA_LENGTH], 'browser': browser, 'browser_version': version,
+            'os': os_name, 'device': device}
+
+
+def _referrer_values(url):
+    return {'url': url[:_URL_LENGTH], 'domain': referrer_domain(url)}
+
+
+def _insert_missing(conn, model, hash_column, rows):
+    dialect = conn.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        conn.execute(dialect_insert(model).on_conflict_do_nothing(index_elements=[hash_column]), rows)
+        return
+    # Generic fallback for databases without INSERT ... ON CONFLICT
+    column = getattr(model, hash_column)
+    existing = set(conn.execute(select(column).where(column.in_([r[hash_column] for r in rows]))).scalars())
+    rows = [r for r in rows if r[hash_column] not in existing]
+    if rows:
+        conn.execute(insert(model), rows)
+
+
+def dimension_ids(model, hash_column, strings, values_fn):
+    """Map raw strings to dimension row ids, inserting the ones not seen before"""
+    table = model.__tablename__
+    ids = {}
+    missing = {}
+    for value in strings:
+        digest = _hash(value)
+        cached = _ids.get((table, digest))
+        if cached is not None:
+            ids[value] = cached
+        else:
+            missing[digest] = value
+    if not missing:
+        return ids
+
+    # Committed on their own, so the ids stay valid if the event flush is retried
+    rows = [dict(values_fn(value), **{hash_column: digest}) for digest, value in missing.items()]
+    column = getattr(model, hash_column)
+    with db.engine.begin() as conn:
+        _insert_missing(conn, model, hash_column, rows)
+        found = conn.execute(select(column, model.id).where(column.in_(list(missing)))).all()
+    for digest, row_id in found:
+        _ids.set((table, digest), row_id)
+        ids[missing[digest]] = row_id
+    return ids
+
+
+def resolve_dimensions(rows):
+    """Ingest enricher: swap raw User-Agent/referrer strings for dimension ids and parsed attributes"""
+    pending = [row for row in rows if 'user_agent_id' not in row]  # Rows of a retried batch are done
+    if not pending:
+        return
+    agent_ids = dimension_ids(UserAgent, 'ua_hash', {r['user_agent'] for r in pending if r.get('user_agent')},
+                              _user_agent_values)
+    referrer_ids = dimension_ids(Referrer, 'url_hash', {r['referrer'] for r in pending if r.get('referrer')},
+                                 _referrer_values)
+    for row in pending:
+        describe(row)
+        row['user_agent_id'] = agent_ids.get(row.get('user_agent'))
+        row['referrer_id'] = referrer_ids.get(row.get('referrer'))
+        row['user_agent'] = None
+        row['referrer'] = None
+
+
+def backfill_dimensions(chunk_size=1000):
+    """Move raw strings of existing hot-table rows into the dimension tables; returns rows updated"""
+    table = Analytics.__table__
+    query = select(table.c.id, table.c.user_agent, table.c.referrer).where(
+        table.c.user_agent_id.is_(None),
+        table.c.referrer_id.is_(None),
+        (table.c.user_agent.isnot(None)) | (table.c.referrer.isnot(None))
+    ).order_by(table.c.id).limit(chunk_size)
+    statement = update(table).where(table.c.id == bindparam('row_id')).values(
+        user_agent_id=bindparam('ua_id'), referrer_id=bindparam('ref_id'), user_agent=None, referrer=None
+    )
+    total = 0
+    last_id = 0
+    while True:
+        rows = [dict(r) for r in db.session.execute(query.where(table.c.id > last_id)).mappings()]
+        if not rows:
+            return total
+        resolve_dimensions(rows)
+        db.session.execute(statement, [
+            {'row_id': r['id'], 'ua_id': r['user_agent_id'], 'ref_id': r['referrer_id']} for r in rows
+        ])
+        db.session.commit()
+        total += len(rows)
+        last_id = rows[-1]['id']
@@ -0,0 +1,84 @@
+"""Streaming export of raw analytics events as NDJSON or CSV.
+
+Rows are read through a server-side cursor (`yield_per`) and encoded one
+chunk at a time, so memory stays constant however many events are exported.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from models import db, Analytics, Referrer, UserAgent
+from analytics_partitions import events_source
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+_FACT_COLUMNS = tuple(name for name in Analytics.__table__.c.keys()
+                      if name not in ('user_agent', 'referrer', 'user_agent_id', 'referrer_id'))
+# Dimension ids are resolved back to readable values
+EXPORT_COLUMNS = _FACT_COLUMNS + ('user_agent', 'browser', 'os', 'device', 'referrer', 'referrer_domain')
+
+
+def export_query(start=None, end=None, event_types=None):
+    events = events_source(start, end)
+    query = select(
+        *[events.c[name] for name in _FACT_COLUMNS],
+        func.coalesce(UserAgent.user_agent, events.c.user_agent).label('user_agent'),
+        UserAgent.browser,
+        UserAgent.os,
+        UserAgent.device,
+        func.coalesce(Referrer.url, events.c.referrer).label('referrer'),
+        Referrer.domain.label('referrer_domain')
+    ).select_from(events).outerjoin(
+        UserAgent, UserAgent.id == events.c.user_agent_id
+    ).outerjoin(
+        Referrer, Referrer.id == events.c.referrer_id
+    )
+    if start is not None:
+        query = query.where(events.c.timestamp >= start)
+    if end is not None:
+        query = query.where(events.c.timestamp < end)
+    if event_types:
+        query = query.where(events.c.event_type.in_(event_types))
+    return query.order_by(events.c.timestamp)
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _ndjson_chunk(rows):
+    return ''.join(json.dumps(dict(zip(EXPORT_COLUMNS, map(_json_value, row)))) + '\n' for row in rows)
+
+
+def _csv_chunk(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def iter_export(query, fmt='ndjson', chunk_size=2000):
+    """Yield the encoded export, one chunk of `chunk_size` rows at a time"""
+    encode = _ndjson_chunk if fmt == 'ndjson' else _csv_chunk
+    if fmt == 'csv':
+        yield _csv_chunk([EXPORT_COLUMNS])
+    # A dedicated connection keeps the cursor open while the response streams
+    with db.engine.connect() as conn:
+        result = conn.execution_options(yield_per=chunk_size).execute(query)
+        for rows in result.partitions():
+            yield encode(rows)
+
+
+def gzip_stream(chunks, level=6):
+    """Compress a stream of text chunks into a single gzip member"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 writes the gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
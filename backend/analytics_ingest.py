@@ -0,0 +1,318 @@
+"""Buffered ingestion pipeline for analytics events.
+
+`/api/analytics/track` used to commit one row per request, so throughput was
+bounded by database commit latency. Events are now accepted into a bounded
+in-memory queue and written to the Analytics table by a background worker as
+multi-row INSERTs, flushed when a batch fills up or the flush interval expires.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from models import db, Analytics
+
+# Client-supplied string fields and their column limits
+_STRING_FIELDS = {name: Analytics.__table__.c[name].type.length for name in ('event_type', 'section', 'item_name')}
+_INT_FIELDS = ('item_id', 'duration')
+# Range of the Integer columns (32-bit on Postgres); larger values would fail the whole flushed batch
+_INT_MIN, _INT_MAX = -2 ** 31, 2 ** 31 - 1
+_COLUMNS = tuple(Analytics.__table__.c.keys())
+# Clients may send their own timestamp (batched events are delayed) within this window
+_MAX_EVENT_AGE = timedelta(hours=24)
+_MAX_EVENT_SKEW = timedelta(minutes=5)
+
+
+class InvalidEvent(ValueError):
+    """Raised when a client-supplied event payload cannot be stored"""
+
+
+def normalize_event(data, now=None):
+    """Validate a client event payload and return the client-controlled column values"""
+    if not isinstance(data, dict):
+        raise InvalidEvent('event must be an object')
+
+    event = {}
+    for name, max_length in _STRING_FIELDS.items():
+        value = data.get(name)
+        if value is None or value == '':
+            event[name] = None
+            continue
+        if not isinstance(value, str):
+            raise InvalidEvent(f'{name} must be a string')
+        event[name] = value[:max_length]
+    event['event_type'] = event['event_type'] or 'page_view'
+
+    for name in _INT_FIELDS:
+        value = data.get(name)
+        if value is None or value == '':
+            event[name] = None
+        elif isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise InvalidEvent(f'{name} must be an integer')
+        else:
+            try:
+                number = int(value)
+            except (ValueError, OverflowError):  # OverflowError: int(float('inf'))
+                raise InvalidEvent(f'{name} must be an integer')
+            if not _INT_MIN <= number <= _INT_MAX:
+                raise InvalidEvent(f'{name} is out of range')
+            event[name] = number
+
+    now = now or datetime.utcnow()
+    timestamp = data.get('timestamp')
+    if isinstance(timestamp, str):
+        try:
+            parsed = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+            if parsed.tzinfo is not None:
+                # Timestamps are stored as naive UTC
+                parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+            if now - _MAX_EVENT_AGE <= parsed <= now + _MAX_EVENT_SKEW:
+                event['timestamp'] = parsed
+        except ValueError:
+            pass  # Fall back to the server receive time
+    return event
+
+
+class IngestQueueFull(Exception):
+    """Raised when the ingest queue is saturated and the client should back off"""
+
+    def __init__(self, message, accepted=0):
+        super().__init__(message)
+        self.accepted = accepted  # Rows queued before the buffer filled up
+
+
+class IngestBuffer:
+    """Bounded queue of analytics rows drained by a background flush worker"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = True
+        self.batch_size = 500
+        self.flush_interval = 2.0
+        self.enqueue_timeout = 0.05
+        self._queue = queue.Queue(maxsize=10000)
+        self._enrichers = []
+        self._sinks = []
+        self._periodic = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.flush_latency_ms = 0.0  # Smoothed per-flush latency; decays while the queue is idle
+        self.stats = {
+            'accepted': 0,
+            'rejected': 0,
+            'flushed': 0,
+            'batches': 0,
+            'errors': 0,
+            'dropped': 0,
+            'last_batch_size': 0,
+            'last_flush_ms': 0.0,
+        }
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('ANALYTICS_BUFFER_ENABLED', True)
+        self.batch_size = app.config.get('ANALYTICS_BATCH_SIZE', 500)
+        self.flush_interval = app.config.get('ANALYTICS_FLUSH_INTERVAL', 2.0)
+        self.enqueue_timeout = app.config.get('ANALYTICS_ENQUEUE_TIMEOUT', 0.05)
+        self._queue = queue.Queue(maxsize=app.config.get('ANALYTICS_QUEUE_SIZE', 10000))
+        atexit.register(self.shutdown)
+
+    def add_enricher(self, enricher):
+        """Register a callable(rows) run on every batch before it is inserted; it may add or replace values"""
+        self._enrichers.append(enricher)
+
+    def add_sink(self, sink):
+        """Register a callable(session, rows) run inside every flush transaction"""
+        self._sinks.append(sink)
+
+    def add_periodic(self, task):
+        """Register a callable(session) the worker runs about once per flush interval and on shutdown"""
+        self._periodic.append(task)
+
+    def submit(self, row):
+        """Queue a single event row (dict of Analytics column values)"""
+        self.submit_many([row])
+
+    def submit_many(self, rows):
+        """Queue event rows, raising IngestQueueFull if the buffer stays full"""
+        for row in rows:
+            row.setdefault('timestamp', datetime.utcnow())
+            row.setdefault('weight', 1)
+
+        if not self.enabled:
+            # Synchronous mode: write straight through (scripts, debugging)
+            self._flush(list(rows))
+            self._count('accepted', len(rows))
+            return
+
+        self._ensure_worker()
+        accepted = 0
+        try:
+            for row in rows:
+                # Block briefly so short bursts are absorbed, then push back
+                self._queue.put(row, timeout=self.enqueue_timeout)
+                accepted += 1
+        except queue.Full:
+            self._count('rejected', len(rows) - accepted)
+            raise IngestQueueFull('Analytics ingest queue is full', accepted=accepted)
+        finally:
+            self._count('accepted', accepted)
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def capacity(self):
+        return self._queue.maxsize
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats.update({
+            'enabled': self.enabled,
+            'queue_depth': self.depth(),
+            'queue_capacity': self.capacity(),
+            'batch_size': self.batch_size,
+            'flush_interval': self.flush_interval,
+            'flush_latency_ms': round(self.flush_latency_ms, 2),
+            'worker_alive': bool(self._thread and self._thread.is_alive()),
+        })
+        return stats
+
+    def drain(self):
+        """Synchronously flush everything currently queued"""
+        while True:
+            batch = self._take(self.batch_size, block=False)
+            if not batch:
+                break
+            self._flush(batch)
+        self._run_periodic()
+
+    def shutdown(self, timeout=10.0):
+        """Stop the worker and write out any events still in the queue"""
+        self._stop.set()
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(timeout)
+        self.drain()
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _ensure_worker(self):
+        # Start lazily, and again after a fork, since threads do not survive fork()
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='analytics-ingest', daemon=True)
+            self._thread.start()
+
+    def _take(self, limit, block=True):
+        """Collect up to `limit` rows, waiting at most one flush interval"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < limit:
+            try:
+                if block:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take(self.batch_size)
+            if batch:
+                self._flush(batch)
+            else:
+                self.flush_latency_ms /= 2
+            self._run_periodic()
+
+    def _run_periodic(self):
+        if not self._periodic:
+            return
+        with self.app.app_context():
+            for task in self._periodic:
+                try:
+                    task(db.session)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    self._count('errors')
+                    print(f"⚠️  Analytics periodic task failed: {e}")
+            db.session.remove()
+
+    def _flush(self, rows):
+        if not rows:
+            return
+        started = time.perf_counter()
+        with self.app.app_context():
+            written = self._write(rows)
+            db.session.remove()
+
+        if written < len(rows):
+            self._count('dropped', len(rows) - written)
+        if not written:
+            return
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.stats['flushed'] += written
+            self.stats['batches'] += 1
+            self.stats['last_batch_size'] = written
+            self.stats['last_flush_ms'] = round(elapsed_ms, 2)
+            self.flush_latency_ms = 0.7 * self.flush_latency_ms + 0.3 * elapsed_ms
+
+    def _write(self, rows):
+        """Write rows in one transaction, returning how many were written
+
+        A batch mixes every client's events. When the database rejects its data (a value out of a
+        column's range, a broken constraint) the batch is split in halves and retried, so only the
+        rows that fail on their own are dropped. Other errors are retried once for the whole batch.
+        """
+        for attempt in range(2):
+            try:
+                for enricher in self._enrichers:
+                    enricher(rows)
+                # executemany on a Core insert renders multi-row INSERT ... VALUES.
+                # Enrichers may add derived keys for the sinks; only columns are inserted.
+                db.session.execute(insert(Analytics), [
+                    {name: row[name] for name in _COLUMNS if name in row} for row in rows
+                ])
+                for sink in self._sinks:
+                    sink(db.session, rows)
+                db.session.commit()
+                return len(rows)
+            except (DataError, IntegrityError) as e:
+                db.session.rollback()
+                self._count('errors')
+                if len(rows) == 1:
+                    print(f"⚠️  Analytics event dropped: {e}")
+                    return 0
+                middle = len(rows) // 2
+                return self._write(rows[:middle]) + self._write(rows[middle:])
+            except Exception as e:
+                db.session.rollback()
+                self._count('errors')
+                print(f"⚠️  Analytics flush failed (attempt {attempt + 1}): {e}")
+        return 0
+
+
+ingest_buffer = IngestBuffer()
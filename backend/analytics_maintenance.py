@@ -0,0 +1,53 @@
+"""Maintain monthly analytics partitions and apply the retention policy.
+
+Usage:
+    python analytics_maintenance.py              # maintain partitions and rollups, then archive old months
+    python analytics_maintenance.py partition    # Postgres only: convert analytics to native partitions (one-time)
+    python analytics_maintenance.py dimensions   # move raw User-Agent/referrer strings into dimension tables (one-time)
+
+Months older than ANALYTICS_RETENTION_MONTHS are written to gzipped NDJSON
+files in ANALYTICS_ARCHIVE_DIR and then dropped. Minute rollups older than
+ANALYTICS_MINUTE_ROLLUP_DAYS are deleted. Schedule it daily (cron or
+a Render cron job).
+"""
+import sys
+from datetime import datetime, timedelta
+
+from app import app
+from analytics_partitions import apply_retention, convert_to_native_partitions, maintain_partitions
+from analytics_rollups import prune_minute_rollups
+from analytics_dimensions import backfill_dimensions
+
+with app.app_context():
+    if 'partition' in sys.argv[1:]:
+        print("🗂️  Converting analytics to a partitioned table...")
+        if convert_to_native_partitions():
+            print("✅ analytics is now partitioned by month")
+        else:
+            print("ℹ️  analytics is already partitioned")
+        sys.exit(0)
+
+    if 'dimensions' in sys.argv[1:]:
+        print("🧩 Moving User-Agent and referrer strings into dimension tables...")
+        print(f"✅ Updated {backfill_dimensions()} analytics events (run VACUUM on SQLite to reclaim space)")
+        sys.exit(0)
+
+    for partition in maintain_partitions(hot_months=app.config['ANALYTICS_HOT_MONTHS'],
+                                         months_ahead=app.config['ANALYTICS_PARTITIONS_AHEAD']):
+        print(f"🗂️  Analytics partition maintained: {partition}")
+
+    minute_days = app.config['ANALYTICS_MINUTE_ROLLUP_DAYS']
+    pruned = prune_minute_rollups(datetime.utcnow() - timedelta(days=minute_days))
+    print(f"🧹 Pruned {pruned} minute rollups older than {minute_days} days")
+
+    keep_months = app.config['ANALYTICS_RETENTION_MONTHS']
+    if keep_months <= 0:
+        print("ℹ️  ANALYTICS_RETENTION_MONTHS is not set; keeping all raw events")
+        sys.exit(0)
+
+    print(f"📦 Archiving analytics events older than {keep_months} months...")
+    archived = apply_retention(keep_months, app.config['ANALYTICS_ARCHIVE_DIR'])
+    for entry in archived:
+        print(f"✅ {entry['partition']}: {entry['rows']} events -> {entry['file']}")
+    if not archived:
+        print("✅ Nothing to archive")
@@ -0,0 +1,304 @@
+"""Monthly partitions, retention and cold archival for raw analytics events.
+
+Postgres: `analytics` can be converted (once, via `analytics_maintenance.py
+partition`) into a natively range-partitioned table with one partition per
+month named analytics_pYYYYMM. The planner prunes partitions from the
+timestamp predicate, and upcoming months are created ahead of time.
+
+SQLite: `analytics` stays the hot table for the current and previous month.
+Older months are rotated into per-month tables with the same columns and
+indexes. `events_source()` unions only the month tables that overlap a
+requested time range.
+
+Retention exports partitions older than ANALYTICS_RETENTION_MONTHS to
+gzipped NDJSON files and then drops them. Rollups and sketches are kept, so
+the dashboard history survives after the raw events are archived; full
+rebuilds cannot restore those months and leave them untouched.
+"""
+import gzip
+import json
+import os
+import re
+from datetime import datetime
+
+from sqlalchemy import Column, Index, MetaData, Table, cast, inspect, null, select, text, union_all
+
+from models import db, Analytics
+
+PARTITION_PREFIX = 'analytics_p'
+_PARTITION_NAME = re.compile(r'^analytics_p(\d{4})(\d{2})$')
+
+
+def month_start(timestamp):
+    return timestamp.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month, count):
+    index = month.year * 12 + (month.month - 1) + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month):
+    return f'{PARTITION_PREFIX}{month.year:04d}{month.month:02d}'
+
+
+def partition_month(name):
+    match = _PARTITION_NAME.match(name)
+    if not match:
+        return None
+    return datetime(int(match.group(1)), int(match.group(2)), 1)
+
+
+def list_partitions(engine=None):
+    """Existing month partitions as [(month_start, table_name), ...] in time order"""
+    engine = engine or db.engine
+    names = inspect(engine).get_table_names()
+    return sorted((partition_month(name), name) for name in names if partition_month(name))
+
+
+def is_native_partitioned(conn):
+    """True when `analytics` is a Postgres partitioned table"""
+    if conn.dialect.name != 'postgresql':
+        return False
+    return conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = 'analytics'"
+    )).first() is not None
+
+
+# ---------------------------------------------------------------------------
+# Partition maintenance
+# ---------------------------------------------------------------------------
+
+def _create_native_partition(conn, month):
+    name = partition_name(month)
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF analytics "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+    ))
+    return name
+
+
+def convert_to_native_partitions(now=None):
+    """One-time Postgres migration of `analytics` into a monthly range-partitioned table"""
+    engine = db.engine
+    if engine.dialect.name != 'postgresql':
+        raise RuntimeError('Native partitioning is only available on Postgres')
+    now = now or datetime.utcnow()
+    with engine.begin() as conn:
+        if is_native_partitioned(conn):
+            return False
+        conn.execute(text("LOCK TABLE analytics IN ACCESS EXCLUSIVE MODE"))
+        conn.execute(text("UPDATE analytics SET timestamp = now() AT TIME ZONE 'utc' WHERE timestamp IS NULL"))
+        first = conn.execute(text("SELECT min(timestamp) FROM analytics")).scalar() or now
+
+        conn.execute(text("ALTER TABLE analytics RENAME TO analytics_legacy"))
+        # Index names are schema-wide in Postgres; free them for the new parent table
+        for index in Analytics.__table__.indexes:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        conn.execute(text(
+            "CREATE TABLE analytics (LIKE analytics_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (timestamp)"
+        ))
+        conn.execute(text("ALTER TABLE analytics ALTER COLUMN timestamp SET NOT NULL"))
+        # The partition key must be part of the primary key
+        conn.execute(text("ALTER TABLE analytics ADD PRIMARY KEY (id, timestamp)"))
+        conn.execute(text("ALTER SEQUENCE IF EXISTS analytics_id_seq OWNED BY analytics.id"))
+
+        month = month_start(first)
+        while month <= add_months(month_start(now), 2):
+            _create_native_partition(conn, month)
+            month = add_months(month, 1)
+        conn.execute(text("CREATE TABLE IF NOT EXISTS analytics_pdefault PARTITION OF analytics DEFAULT"))
+
+        conn.execute(text("INSERT INTO analytics SELECT * FROM analytics_legacy"))
+        conn.execute(text("DROP TABLE analytics_legacy"))
+        for index in Analytics.__table__.indexes:
+            index.create(bind=conn)
+    return True
+
+
+def _month_table(name):
+    """Standalone copy of the Analytics table definition (columns and indexes) under a new name"""
+    # Plain copies: month tables carry no foreign keys to the dimension tables
+    columns = [Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable)
+               for c in Analytics.__table__.columns]
+    table = Table(name, MetaData(), *columns)
+    for index in Analytics.__table__.indexes:
+        Index(index.name.replace('ix_analytics', f'ix_{name}', 1), *[table.c[c.name] for c in index.columns])
+    return table
+
+
+def rotate_sqlite_partitions(now=None, hot_months=2):
+    """Move months older than the hot window out of `analytics` into per-month tables"""
+    engine = db.engine
+    now = now or datetime.utcnow()
+    boundary = add_months(month_start(now), -(hot_months - 1))
+    oldest = db.session.execute(select(Analytics.timestamp).order_by(Analytics.timestamp).limit(1)).scalar()
+    if oldest is None or oldest >= boundary:
+        return []
+
+    rotated = []
+    hot_columns = [c.name for c in Analytics.__table__.columns]
+    month = month_start(oldest)
+    while month < boundary:
+        end = add_months(month, 1)
+        name = partition_name(month)
+        table = _month_table(name)
+        with engine.begin() as conn:
+            table.create(bind=conn, checkfirst=True)
+            target_columns = {c['name'] for c in inspect(conn).get_columns(name)}
+            columns = ', '.join(f'"{c}"' for c in hot_columns if c in target_columns)
+            moved = conn.execute(text(
+                f'INSERT INTO {name} ({columns}) SELECT {columns} FROM analytics '
+                f'WHERE timestamp >= :start AND timestamp < :end'
+            ), {'start': month, 'end': end}).rowcount
+            conn.execute(text('DELETE FROM analytics WHERE timestamp >= :start AND timestamp < :end'),
+                         {'start': month, 'end': end})
+        if moved:
+            rotated.append((name, moved))
+        month = end
+    return rotated
+
+
+def maintain_partitions(now=None, hot_months=2, months_ahead=2):
+    """Create upcoming native partitions (Postgres) or rotate old months out (SQLite)"""
+    now = now or datetime.utcnow()
+    engine = db.engine
+    if engine.dialect.name == 'sqlite':
+        return rotate_sqlite_partitions(now, hot_months=hot_months)
+    created = []
+    with engine.begin() as conn:
+        if is_native_partitioned(conn):
+            existing = {name for _, name in list_partitions(conn)}
+            for offset in range(months_ahead + 1):
+                month = add_months(month_start(now), offset)
+                if partition_name(month) not in existing:
+                    created.append(_create_native_partition(conn, month))
+    return created
+
+
+# ---------------------------------------------------------------------------
+# Query layer
+# ---------------------------------------------------------------------------
+
+def _partition_select(name, conn, columns=None):
+    table_columns = {c['name'] for c in inspect(conn).get_columns(name)}
+    table = _month_table(name)
+    selected = [
+        table.c[c.name] if c.name in table_columns else cast(null(), c.type).label(c.name)
+        for c in Analytics.__table__.columns if columns is None or c.name in columns
+    ]
+    return table, select(*selected)
+
+
+def events_source(start=None, end=None, columns=None, bind=None):
+    """FROM clause with Analytics' columns covering [start, end), pruned to overlapping partitions
+
+    Postgres (native or unpartitioned) returns the analytics table itself; the
+    planner prunes partitions from the timestamp predicate the caller adds.
+    Pass `columns` (names) to select only those, so each month table can be
+    read from a covering index. Pass `bind` (the caller's connection) from
+    inside a write transaction: on SQLite a second connection would wait on
+    the lock that transaction holds.
+    """
+    table = Analytics.__table__
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return table
+    selects = []
+    for month, name in list_partitions(bind or engine):
+        if end is not None and month >= end:
+            continue
+        if start is not None and add_months(month, 1) <= start:
+            continue
+        if bind is not None:
+            partition, query = _partition_select(name, bind, columns)
+        else:
+            with engine.connect() as conn:
+                partition, query = _partition_select(name, conn, columns)
+        if start is not None:
+            query = query.where(partition.c.timestamp >= start)
+        if end is not None:
+            query = query.where(partition.c.timestamp < end)
+        selects.append(query)
+    if not selects:
+        return table
+
+    hot = select(*[c for c in table.columns if columns is None or c.name in columns])
+    if start is not None:
+        hot = hot.where(table.c.timestamp >= start)
+    if end is not None:
+        hot = hot.where(table.c.timestamp < end)
+    return union_all(hot, *selects).subquery('analytics_events')
+
+
+# ---------------------------------------------------------------------------
+# Retention
+# ---------------------------------------------------------------------------
+
+def _serialize(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _export_rows(conn, query, path):
+    """Stream query results to a gzipped NDJSON file; returns the row count"""
+    count = 0
+    tmp_path = f'{path}.tmp'
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as out:
+        result = conn.execution_options(yield_per=5000).execute(query).mappings()
+        for row in result:
+            out.write(json.dumps({k: _serialize(v) for k, v in row.items()}) + '\n')
+            count += 1
+    os.replace(tmp_path, path)
+    return count
+
+
+def apply_retention(keep_months, archive_dir, now=None):
+    """Archive and drop raw events older than `keep_months` whole months
+
+    Rollups and sketches of the dropped months stay, but can no longer be
+    recomputed: rebuilds (rebuild_rollups) start at the oldest raw event left.
+    """
+    now = now or datetime.utcnow()
+    cutoff = add_months(month_start(now), -keep_months)
+    os.makedirs(archive_dir, exist_ok=True)
+    engine = db.engine
+    archived = []
+
+    # Whole partitions (native Postgres partitions or SQLite month tables)
+    for month, name in list_partitions(engine):
+        if month >= cutoff:
+            continue
+        path = os.path.join(archive_dir, f'{name}.ndjson.gz')
+        with engine.begin() as conn:
+            partition, query = _partition_select(name, conn)
+            count = _export_rows(conn, query.order_by(partition.c.timestamp), path)
+            if is_native_partitioned(conn):
+                conn.execute(text(f'ALTER TABLE analytics DETACH PARTITION {name}'))
+            conn.execute(text(f'DROP TABLE {name}'))
+        archived.append({'partition': name, 'rows': count, 'file': path})
+
+    # Rows still in an unpartitioned table (SQLite hot table, Postgres before conversion)
+    with engine.connect() as conn:
+        native = is_native_partitioned(conn)
+    if not native:
+        table = Analytics.__table__
+        oldest = db.session.execute(select(table.c.timestamp).order_by(table.c.timestamp).limit(1)).scalar()
+        db.session.remove()
+        month = month_start(oldest) if oldest else cutoff
+        while month < cutoff:
+            end = add_months(month, 1)
+            in_month = (table.c.timestamp >= month) & (table.c.timestamp < end)
+            path = os.path.join(archive_dir, f'{partition_name(month)}.ndjson.gz')
+            if os.path.exists(path):
+                path = os.path.join(archive_dir, f'{partition_name(month)}-{now:%Y%m%d%H%M%S}.ndjson.gz')
+            with engine.begin() as conn:
+                count = _export_rows(conn, select(table).where(in_month).order_by(table.c.timestamp), path)
+                if count:
+                    conn.execute(table.delete().where(in_month))
+            if count:
+                archived.append({'partition': partition_name(month), 'rows': count, 'file': path})
+            else:
+                os.remove(path)
+            month = end
+    return archived
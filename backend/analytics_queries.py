@@ -0,0 +1,97 @@
+"""Raw-event queries behind the analytics dashboard.
+
+The statements are built here so the endpoints and check_query_plans.py run
+exactly the same SQL.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import desc, func, select
+from sqlalchemy.orm import joinedload
+
+from models import Analytics
+from analytics_rollups import rollup_series_query, rollup_totals_query, bucket_start
+from analytics_sketches import sketch_query, DURATION_KIND, TOPK_KIND
+from analytics_realtime import window_query
+from analytics_partitions import events_source
+from analytics_sessions import funnel_query
+
+
+def parse_time_arg(value):
+    """Parse an ISO date or datetime query argument into naive UTC; None when absent"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+    return parsed
+
+
+def recent_activity_query(since, limit=50):
+    return select(Analytics).options(joinedload(Analytics.agent), joinedload(Analytics.referrer_info)).where(
+        Analytics.timestamp >= since
+    ).order_by(desc(Analytics.timestamp)).limit(limit)
+
+
+def _exact_events(columns, start, end):
+    """Partition-pruned events source plus its time-range conditions"""
+    if start is not None or end is not None:
+        columns = columns + ('timestamp',)
+    events = events_source(start, end, columns=columns)
+    conditions = []
+    if start is not None:
+        conditions.append(events.c.timestamp >= start)
+    if end is not None:
+        conditions.append(events.c.timestamp < end)
+    return events, conditions
+
+
+def exact_visitors_query(start=None, end=None):
+    events, conditions = _exact_events(('session_id',), start, end)
+    return select(func.count(func.distinct(events.c.session_id))).where(*conditions)
+
+
+def exact_visitors_by_country_query(start=None, end=None):
+    events, conditions = _exact_events(('country', 'session_id'), start, end)
+    count = func.count(func.distinct(events.c.session_id)).label('count')
+    return select(events.c.country, count).where(
+        events.c.country.isnot(None),
+        events.c.country != 'Unknown',
+        *conditions
+    ).group_by(events.c.country).order_by(desc('count'))
+
+
+def exact_visitors_by_city_query(limit=20, start=None, end=None):
+    events, conditions = _exact_events(('city', 'country', 'session_id'), start, end)
+    count = func.count(func.distinct(events.c.session_id)).label('count')
+    return select(events.c.city, events.c.country, count).where(
+        events.c.city.isnot(None),
+        events.c.city != 'Unknown',
+        *conditions
+    ).group_by(events.c.city, events.c.country).order_by(desc('count')).limit(limit)
+
+
+def stats_queries(now=None):
+    """Every query the stats and realtime endpoints can run: [(name, statement), ...]"""
+    now = now or datetime.utcnow()
+    yesterday = now - timedelta(days=1)
+    return [
+        ('total_views', rollup_totals_query('total', event_type='page_view')),
+        ('section_views', rollup_totals_query('section')),
+        ('browsers', rollup_totals_query('browser', limit=10)),
+        ('hourly_traffic', rollup_series_query('hour', start=bucket_start(yesterday, 'hour') + timedelta(hours=1))),
+        ('minute_traffic', rollup_series_query('minute', start=bucket_start(now - timedelta(hours=1), 'minute'))),
+        ('daily_traffic', rollup_series_query('day', start=bucket_start(now - timedelta(days=90), 'day'))),
+        ('range_section_views', rollup_totals_query('section', start=bucket_start(now - timedelta(days=30), 'day'))),
+        ('visitors_sketch', sketch_query('total')),
+        ('visitors_by_country_sketch', sketch_query('country')),
+        ('visitors_by_city_sketch', sketch_query('city')),
+        ('top_items_sketch', sketch_query('item_name', start=now - timedelta(days=30), kind=TOPK_KIND)),
+        ('time_on_section_sketch', sketch_query('section', start=now - timedelta(days=30), kind=DURATION_KIND)),
+        ('exact_visitors', exact_visitors_query()),
+        ('exact_visitors_by_country', exact_visitors_by_country_query()),
+        ('exact_visitors_by_city', exact_visitors_by_city_query()),
+        ('range_exact_visitors', exact_visitors_query(start=now - timedelta(days=30))),
+        ('recent_activity', recent_activity_query(yesterday)),
+        ('realtime_window', window_query(now - timedelta(hours=1))),
+        ('funnel_paths', funnel_query(start=now - timedelta(days=30))),
+    ]
@@ -0,0 +1,100 @@
+"""In-memory sliding window behind /api/analytics/realtime.
+
+A ring of per-minute buckets is updated as events are accepted, so the admin
+dashboard's polling reads at most 60 buckets instead of scanning the last hour
+of the Analytics table. The window is rebuilt from the database on startup.
+Each worker process keeps its own window.
+"""
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from models import db, Analytics
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _minute_of(timestamp):
+    return int((timestamp - _EPOCH).total_seconds() // 60)
+
+
+def window_query(since):
+    return select(Analytics.timestamp, Analytics.session_id, Analytics.city, Analytics.country, Analytics.weight).where(
+        Analytics.timestamp >= since
+    )
+
+
+class _MinuteBucket:
+    __slots__ = ('minute', 'views', 'sessions', 'locations')
+
+    def __init__(self, minute):
+        self.minute = minute
+        self.views = 0
+        self.sessions = set()
+        self.locations = {}  # (city, country) -> set of session ids
+
+
+class RealtimeWindow:
+    """Ring buffer of per-minute event counters covering the last `minutes` minutes"""
+
+    def __init__(self, minutes=60):
+        self.minutes = minutes
+        self._buckets = [None] * minutes
+        self._lock = threading.Lock()
+
+    def record(self, row, now=None):
+        self.record_many([row], now=now)
+
+    def record_many(self, rows, now=None):
+        current = _minute_of(now or datetime.utcnow())
+        with self._lock:
+            for row in rows:
+                minute = _minute_of(row['timestamp'])
+                if minute <= current - self.minutes or minute > current:
+                    continue  # Outside the window (late or clock-skewed client timestamps)
+                slot = minute % self.minutes
+                bucket = self._buckets[slot]
+                if bucket is None or bucket.minute != minute:
+                    bucket = self._buckets[slot] = _MinuteBucket(minute)
+                bucket.views += row.get('weight') or 1
+                session_id = row.get('session_id')
+                if session_id:
+                    bucket.sessions.add(session_id)
+                city = row.get('city')
+                if session_id and city and city != 'Unknown':
+                    bucket.locations.setdefault((city, row.get('country')), set()).add(session_id)
+
+    def snapshot(self, now=None, top=10):
+        """Views, distinct sessions and top locations over the window"""
+        current = _minute_of(now or datetime.utcnow())
+        views = 0
+        sessions = set()
+        locations = {}
+        with self._lock:
+            for bucket in self._buckets:
+                if bucket is None or bucket.minute <= current - self.minutes or bucket.minute > current:
+                    continue
+                views += bucket.views
+                sessions |= bucket.sessions
+                for key, ids in bucket.locations.items():
+                    locations.setdefault(key, set()).update(ids)
+        ranked = sorted(((key, len(ids)) for key, ids in locations.items()), key=lambda item: item[1], reverse=True)
+        return {
+            'views': views,
+            'visitors': len(sessions),
+            'locations': [(city, country, count) for (city, country), count in ranked[:top]],
+        }
+
+    def rebuild(self, now=None):
+        """Reload the window from events already stored in the database"""
+        now = now or datetime.utcnow()
+        since = now - timedelta(minutes=self.minutes)
+        rows = [dict(row) for row in db.session.execute(window_query(since)).mappings()]
+        with self._lock:
+            self._buckets = [None] * self.minutes
+        self.record_many(rows, now=now)
+        return len(rows)
+
+
+realtime_window = RealtimeWindow()
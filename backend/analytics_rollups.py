@@ -0,0 +1,338 @@
+"""Hourly and daily rollups of analytics events.
+
+Every event increments one counter per (granularity, bucket, dimension value,
+event type) by its weight (1, or 1/sampling rate while ingest is sampling).
+Counters are upserted inside the ingest flush transaction, so the dashboard
+can read a few pre-aggregated rows instead of scanning the raw Analytics
+table. `rebuild_rollups` recomputes them from raw events for
+backfills and for rows written outside the ingest pipeline. It never reaches
+back past the oldest raw event still stored: buckets of months archived by
+retention are kept as they are.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from sqlalchemy import delete, func, select
+
+from models import db, AnalyticsRollup, Referrer, UserAgent
+from analytics_partitions import events_source
+from analytics_dimensions import describe
+
+# Derived tables rebuilt from raw events:
+# (model, apply_fn(session, rows), rows to preserve or None, time column, rows it owns or None)
+_AGGREGATES = []
+
+ROLLUP_GRANULARITIES = ('hour', 'day')
+# Minute buckets are only kept for the site total, for short-range traffic charts
+MINUTE_DIMENSIONS = ('total',)
+SERIES_GRANULARITIES = ('minute', 'hour', 'day', 'week')
+MAX_SERIES_BUCKETS = 2000
+_BUCKET_STEPS = {
+    'minute': timedelta(minutes=1),
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+}
+ROLLUP_DIMENSIONS = ('total', 'section', 'item_name', 'country', 'city', 'browser', 'os', 'device', 'referrer_domain')
+_KEY_COLUMNS = ('granularity', 'dimension', 'bucket_start', 'event_type', 'value', 'parent_value')
+_SOURCE_COLUMNS = ('timestamp', 'session_id', 'event_type', 'section', 'item_name', 'country', 'city', 'weight')
+_RAW_STRING_COLUMNS = ('user_agent', 'referrer', 'user_agent_id', 'referrer_id')
+# Values are cut to the rollup columns, so one long string cannot fail a whole flushed batch
+_VALUE_LENGTH = AnalyticsRollup.__table__.c.value.type.length
+_PARENT_LENGTH = AnalyticsRollup.__table__.c.parent_value.type.length
+
+
+def register_aggregate(model, apply_fn, preserve=None, time_column=None, scope=None):
+    """Register a derived table so backfills rebuild it too
+
+    Rows are rebuilt by time (`time_column`, default bucket_start). `preserve`
+    is a condition selecting rows that cannot be recomputed from raw events
+    (e.g. counters of dropped traffic); rebuilds leave them alone. `scope`
+    selects the rows this aggregate owns when several share one table.
+    """
+    time_column = time_column if time_column is not None else model.bucket_start
+    _AGGREGATES.append((model, apply_fn, preserve, time_column, scope))
+
+
+def bucket_start(timestamp, granularity):
+    """Floor a timestamp to the start of its bucket"""
+    if granularity == 'minute':
+        return timestamp.replace(second=0, microsecond=0)
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == 'week':
+        day = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+        return day - timedelta(days=day.weekday())
+    raise ValueError(f'Unknown granularity: {granularity}')
+
+
+def dimension_values(row):
+    """Yield (dimension, value, parent_value) for every dimension an event counts towards"""
+    for dimension, value, parent in _dimension_values(row):
+        yield dimension, value[:_VALUE_LENGTH], parent[:_PARENT_LENGTH]
+
+
+def _dimension_values(row):
+    yield 'total', '', ''
+    if row.get('section'):
+        yield 'section', row['section'], ''
+    if row.get('item_name'):
+        yield 'item_name', row['item_name'], ''
+    if row.get('country'):
+        yield 'country', row['country'], ''
+    if row.get('city'):
+        yield 'city', row['city'], row.get('country') or ''
+    # Parsed from the User-Agent and referrer by analytics_dimensions.describe
+    for dimension in ('browser', 'os', 'device', 'referrer_domain'):
+        if row.get(dimension):
+            yield dimension, row[dimension], ''
+
+
+def aggregate(rows):
+    """Collapse event rows into rollup increments keyed like the unique constraint"""
+    counts = Counter()
+    for row in rows:
+        timestamp = row['timestamp']
+        event_type = row.get('event_type') or 'page_view'
+        weight = row.get('weight') or 1  # Sampled events stand for `weight` events
+        for granularity in ROLLUP_GRANULARITIES:
+            start = bucket_start(timestamp, granularity)
+            for dimension, value, parent in dimension_values(row):
+                counts[(granularity, dimension, start, event_type, value, parent)] += weight
+        minute = bucket_start(timestamp, 'minute')
+        for dimension in MINUTE_DIMENSIONS:
+            counts[('minute', dimension, minute, event_type, '', '')] += weight
+    return counts
+
+
+def _dialect_insert(session):
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert
+
+
+def upsert_counts(session, counts):
+    """Add aggregated increments to the rollup table"""
+    if not counts:
+        return
+    params = [dict(zip(_KEY_COLUMNS, key), count=count) for key, count in counts.items()]
+    insert = _dialect_insert(session)
+    if insert is not None:
+        stmt = insert(AnalyticsRollup)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(_KEY_COLUMNS),
+            set_={'count': AnalyticsRollup.count + stmt.excluded['count']}
+        )
+        session.execute(stmt, params)
+        return
+
+    # Generic fallback for databases without INSERT ... ON CONFLICT
+    for param in params:
+        key = {name: param[name] for name in _KEY_COLUMNS}
+        rollup = session.execute(select(AnalyticsRollup).filter_by(**key)).scalar_one_or_none()
+        if rollup:
+            rollup.count += param['count']
+        else:
+            session.add(AnalyticsRollup(**param))
+
+
+def apply_rollups(session, rows):
+    """Ingest sink: fold a flushed batch of events into the rollups"""
+    upsert_counts(session, aggregate(rows))
+
+
+# Filtered-traffic counters (analytics_bots) have no raw events behind them
+register_aggregate(AnalyticsRollup, apply_rollups, preserve=AnalyticsRollup.dimension == 'filtered')
+
+
+def oldest_event_time():
+    """Timestamp of the oldest raw event still stored (retention archives older ones), or None"""
+    events = events_source(columns=('timestamp',))
+    return db.session.execute(select(func.min(events.c.timestamp))).scalar()
+
+
+def rebuild_start(since=None):
+    """Start of the range a rebuild from `since` covers: never before the oldest raw event still stored
+
+    Aggregates of older, archived months cannot be recomputed, so they are kept. None when there are no events.
+    """
+    oldest = oldest_event_time()
+    if oldest is None:
+        return None
+    # Start at a day boundary so partially covered daily buckets are rebuilt whole
+    return bucket_start(max(since, oldest) if since is not None else oldest, 'day')
+
+
+def rebuild_rollups(since=None, chunk_size=5000, aggregates=None):
+    """Recompute the registered aggregates (or only `aggregates`) from raw events, from `since` or else from the
+    oldest raw event still stored; returns the number of events rolled up"""
+    session = db.session
+    aggregates = _AGGREGATES if aggregates is None else aggregates
+    since = rebuild_start(since)
+    if since is None:
+        return 0
+    events = events_source(start=since, columns=_SOURCE_COLUMNS + _RAW_STRING_COLUMNS)
+    # Raw User-Agent/referrer strings come from the dimension tables, or the row itself for legacy rows
+    query = select(
+        *[events.c[name] for name in _SOURCE_COLUMNS],
+        func.coalesce(UserAgent.user_agent, events.c.user_agent).label('user_agent'),
+        func.coalesce(Referrer.url, events.c.referrer).label('referrer')
+    ).select_from(events).outerjoin(
+        UserAgent, UserAgent.id == events.c.user_agent_id
+    ).outerjoin(
+        Referrer, Referrer.id == events.c.referrer_id
+    )
+    query = query.where(events.c.timestamp >= since)
+    # Time order lets order-sensitive aggregates (sessions) extend rather than rebuild
+    query = query.order_by(events.c.timestamp)
+    for model, _, preserve, time_column, scope in aggregates:
+        cleanup = delete(model).where(time_column >= since)
+        if scope is not None:
+            cleanup = cleanup.where(scope)
+        if preserve is not None:
+            cleanup = cleanup.where(~preserve)
+        session.execute(cleanup)
+
+    total = 0
+    pending = []
+    for row in session.execute(query.execution_options(yield_per=chunk_size)).mappings():
+        if row['timestamp'] is None:
+            continue
+        pending.append(describe(dict(row)))
+        if len(pending) >= chunk_size:
+            _apply_all(session, pending, aggregates)
+            total += len(pending)
+            pending = []
+    _apply_all(session, pending, aggregates)
+    total += len(pending)
+    session.commit()
+    return total
+
+
+def _apply_all(session, rows, aggregates):
+    if rows:
+        for _, apply_fn, _, _, _ in aggregates:
+            apply_fn(session, rows)
+            session.flush()
+
+
+def prune_minute_rollups(before):
+    """Delete minute rollups older than `before`; returns the number of rows removed"""
+    result = db.session.execute(delete(AnalyticsRollup).where(
+        AnalyticsRollup.granularity == 'minute',
+        AnalyticsRollup.bucket_start < before
+    ))
+    db.session.commit()
+    return result.rowcount
+
+
+def rollups_missing():
+    """Registered aggregates that have not been built yet although raw events exist (pass to rebuild_rollups)"""
+    events = events_source(columns=('id',))
+    if db.session.execute(select(events.c.id).limit(1)).first() is None:
+        return []
+    missing = []
+    for aggregate in _AGGREGATES:
+        model, _, _, _, scope = aggregate
+        query = select(model.id).limit(1)
+        if scope is not None:
+            query = query.where(scope)
+        if db.session.execute(query).first() is None:
+            missing.append(aggregate)
+    return missing
+
+
+def rollup_totals_query(dimension, granularity='day', event_type=None, start=None, end=None, limit=None):
+    total = func.sum(AnalyticsRollup.count).label('count')
+    query = select(AnalyticsRollup.value, AnalyticsRollup.parent_value, total).where(
+        AnalyticsRollup.granularity == granularity,
+        AnalyticsRollup.dimension == dimension
+    )
+    if event_type is not None:
+        query = query.where(AnalyticsRollup.event_type == event_type)
+    if start is not None:
+        query = query.where(AnalyticsRollup.bucket_start >= start)
+    if end is not None:
+        query = query.where(AnalyticsRollup.bucket_start < end)
+    query = query.group_by(AnalyticsRollup.value, AnalyticsRollup.parent_value).order_by(total.desc())
+    if limit:
+        query = query.limit(limit)
+    return query
+
+
+def rollup_totals(dimension, granularity='day', event_type=None, start=None, end=None, limit=None):
+    """Sum rollup counts per dimension value: [(value, parent_value, count), ...]"""
+    query = rollup_totals_query(dimension, granularity, event_type, start, end, limit)
+    return [tuple(row) for row in db.session.execute(query)]
+
+
+def rollup_series_query(granularity, dimension='total', value='', event_type=None, start=None, end=None):
+    total = func.sum(AnalyticsRollup.count)
+    query = select(AnalyticsRollup.bucket_start, total).where(
+        AnalyticsRollup.granularity == granularity,
+        AnalyticsRollup.dimension == dimension,
+        AnalyticsRollup.value == value
+    )
+    if event_type is not None:
+        query = query.where(AnalyticsRollup.event_type == event_type)
+    if start is not None:
+        query = query.where(AnalyticsRollup.bucket_start >= start)
+    if end is not None:
+        query = query.where(AnalyticsRollup.bucket_start < end)
+    query = query.group_by(AnalyticsRollup.bucket_start).order_by(AnalyticsRollup.bucket_start)
+    return query
+
+
+def rollup_series(granularity, dimension='total', value='', event_type=None, start=None, end=None):
+    """Sum rollup counts per bucket: [(bucket_start, count), ...] in time order"""
+    query = rollup_series_query(granularity, dimension, value, event_type, start, end)
+    return [tuple(row) for row in db.session.execute(query)]
+
+
+def range_granularity(start, end):
+    """Rollups to sum for totals over [start, end): daily when both ends fall on midnight, else hourly"""
+    if all(t is None or bucket_start(t, 'day') == t for t in (start, end)):
+        return 'day'
+    return 'hour'
+
+
+def dense_series(granularity, start, end, event_type=None):
+    """Zero-filled [(bucket_start, count), ...] for every bucket overlapping [start, end)
+
+    Weekly buckets are summed from the daily rollups.
+    """
+    source = 'day' if granularity == 'week' else granularity
+    first = bucket_start(start, granularity)
+    counts = Counter()
+    for bucket, count in rollup_series(source, event_type=event_type, start=first, end=end):
+        counts[bucket_start(bucket, granularity)] += count
+    series = []
+    step = _BUCKET_STEPS[granularity]
+    current = first
+    while current < end:
+        series.append((current, counts.get(current, 0)))
+        current += step
+    return series
+
+
+def series_granularity(start, end):
+    """Default bucket size for a traffic chart over [start, end)"""
+    span = end - start
+    if span <= timedelta(hours=2):
+        return 'minute'
+    if span <= timedelta(days=3):
+        return 'hour'
+    if span <= timedelta(days=92):
+        return 'day'
+    return 'week'
+
+
+def bucket_count(granularity, start, end):
+    return int((end - bucket_start(start, granularity)) / _BUCKET_STEPS[granularity]) + 1
@@ -0,0 +1,154 @@
+"""Adaptive sampling and load shedding for analytics tracking.
+
+When a post is shared widely, tracking requests compete with the public
+content endpoints for database connections. Load is measured from the ingest
+queue depth and the smoothed flush latency. Once either crosses its threshold,
+events are kept with probability 1/k and stored with `weight` k, so the
+weighted rollups remain unbiased estimates of the real counts:
+
+    pressure < 1        everything is kept
+    1 <= pressure < 2   sheddable event types are sampled, page views kept
+    pressure >= 2       sheddable event types are dropped (counted as 'load_shed'),
+                        page views and other core events are sampled
+
+Pressure 1 means one of the thresholds is just reached. Weights are whole
+numbers (sampling rates of 1/2, 1/3, ...), so rollup counters stay integers.
+
+Sampling is by session, not by event: a hash of the session_id places every
+session at a fixed share in [0, 1), and an event with weight k is kept when
+that share is below 1/k. A session keeps all of its events or none of them at
+a given rate, and the sessions kept at 1/10 are a subset of those kept at 1/2,
+so visit paths stay whole. The distinct-visitor sketches, visits and funnels
+scale each kept session by its weight.
+"""
+import hashlib
+import math
+import threading
+from collections import Counter
+from datetime import datetime
+
+from analytics_ingest import ingest_buffer
+from analytics_rollups import ROLLUP_GRANULARITIES, bucket_start, upsert_counts
+
+SAMPLING_LEVELS = ('normal', 'sampling', 'shedding')
+SHED_REASON = 'load_shed'
+
+
+def session_share(session_id):
+    """Fixed position of a session in [0, 1); a sampling rate of 1/k keeps the sessions below 1/k"""
+    # Personalized, so the share is independent of the HyperLogLog hash of the same id: sketches of the
+    # kept sessions would otherwise only fill a fraction of their registers
+    data = (session_id or '').encode('utf-8', 'replace')
+    digest = hashlib.blake2b(data, digest_size=8, person=b'sampling').digest()
+    return int.from_bytes(digest, 'big') / 2 ** 64
+
+
+class LoadShedder:
+    """Decides per event whether to keep it under load, and with which weight"""
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.queue_threshold = 0.5  # Fraction of the ingest queue capacity
+        self.latency_threshold_ms = 1000.0
+        self.max_weight = 10  # Lowest sampling rate is 1/max_weight
+        self.sheddable = frozenset(('section_view', 'time_spent', 'link_click'))
+        self._pending = Counter()  # (granularity, bucket_start, event_type) -> shed events not yet in the rollups
+        self._lock = threading.Lock()
+        self.stats = Counter()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('ANALYTICS_SAMPLING', True)
+        self.queue_threshold = app.config.get('ANALYTICS_SAMPLING_QUEUE_THRESHOLD', 0.5)
+        self.latency_threshold_ms = app.config.get('ANALYTICS_SAMPLING_LATENCY_MS', 1000.0)
+        self.max_weight = max(1, app.config.get('ANALYTICS_SAMPLING_MAX_WEIGHT', 10))
+        sheddable = app.config.get('ANALYTICS_SHEDDABLE_EVENTS', 'section_view,time_spent,link_click')
+        self.sheddable = frozenset(t.strip() for t in sheddable.split(',') if t.strip() and t.strip() != 'page_view')
+
+    def pressure(self):
+        """Load relative to the thresholds: below 1 is normal"""
+        depth = ingest_buffer.depth() / ((ingest_buffer.capacity() or 1) * self.queue_threshold)
+        latency = ingest_buffer.flush_latency_ms / self.latency_threshold_ms
+        return max(depth, latency)
+
+    def weights(self, pressure):
+        """(sheddable weight, core weight); weight 0 means drop, k > 1 means keep 1 in k"""
+        if not self.enabled or pressure < 1:
+            return 1, 1
+        if pressure < 2:
+            return min(self.max_weight, math.ceil(pressure * 2)), 1
+        return 0, min(self.max_weight, math.ceil(pressure))
+
+    def level(self, pressure):
+        if not self.enabled or pressure < 1:
+            return 'normal'
+        return 'sampling' if pressure < 2 else 'shedding'
+
+    def sample(self, events, now=None):
+        """Return the events to keep, each with its `weight`; shed events are only counted"""
+        if not self.enabled:
+            return events
+        sheddable_weight, core_weight = self.weights(self.pressure())
+        if sheddable_weight == core_weight == 1:
+            self._count('kept', len(events))
+            return events
+
+        kept = []
+        shed = Counter()
+        for event in events:
+            weight = sheddable_weight if event.get('event_type') in self.sheddable else core_weight
+            if weight == 0:
+                shed[event['event_type']] += 1
+            elif weight == 1 or session_share(event.get('session_id')) * weight < 1:
+                event['weight'] = weight
+                kept.append(event)
+        self._count('kept', len(kept))
+        self._count('sampled_out', len(events) - len(kept) - sum(shed.values()))
+        if shed:
+            self._record_shed(shed, now or datetime.utcnow())
+        return kept
+
+    def _count(self, key, amount):
+        if amount:
+            with self._lock:
+                self.stats[key] += amount
+
+    def _record_shed(self, shed, now):
+        with self._lock:
+            for event_type, count in shed.items():
+                self.stats['shed'] += count
+                for granularity in ROLLUP_GRANULARITIES:
+                    self._pending[(granularity, bucket_start(now, granularity), event_type)] += count
+
+    def flush_counts(self, session):
+        """Ingest periodic task: add the shed-event counts to the rollups"""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return
+        # Stored with the filtered traffic, which rebuilds preserve: there are no raw events behind them
+        upsert_counts(session, Counter({
+            (granularity, 'filtered', start, event_type, SHED_REASON, ''): count
+            for (granularity, start, event_type), count in pending.items()
+        }))
+
+    def get_stats(self):
+        pressure = self.pressure()
+        sheddable_weight, core_weight = self.weights(pressure)
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            'enabled': self.enabled,
+            'pressure': round(pressure, 3),
+            'level': self.level(pressure),
+            'sheddable_weight': sheddable_weight,
+            'core_weight': core_weight,
+            'sheddable_events': sorted(self.sheddable),
+            'kept': stats.get('kept', 0),
+            'sampled_out': stats.get('sampled_out', 0),
+            'shed': stats.get('shed', 0),
+        }
+
+
+load_shedder = LoadShedder()
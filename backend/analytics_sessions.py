@@ -0,0 +1,268 @@
+"""Sessionizer and funnels over analytics events.
+
+Visitors keep their session_id in localStorage, so one session_id spans many
+visits. The sessionizer splits a session_id's events into visits wherever
+there is a gap longer than SESSION_TIMEOUT. It keeps one compact row per
+visit in AnalyticsSession: start, end, counts, entry and exit section, and the
+ordered path of steps.
+
+It runs as an ingest sink, so each flushed batch is folded in incrementally in
+session_id/timestamp order.
+
+Under load, ingest keeps whole sessions at a sampling rate of 1/k and stores
+their events with weight k (analytics_sampling). A visit is in the sample at
+the rate of its least sampled event, so it counts with its lowest event
+weight. A path step sampled at 1/k is stored as [step, k]; a funnel counts a
+visit reaching a step with the highest weight among the steps it matched.
+Summaries and funnels are therefore estimates of the unsampled numbers. Events that arrive late (older than the visit
+they belong to) re-sessionize only that session_id from its indexed raw
+events. Funnels and session summaries read only the sessions table.
+"""
+import json
+from collections import defaultdict
+from datetime import timedelta
+
+from sqlalchemy import case, func, select
+
+from models import db, AnalyticsSession
+from analytics_partitions import events_source
+from analytics_rollups import register_aggregate
+
+SESSION_TIMEOUT = timedelta(minutes=30)
+MAX_PATH_STEPS = 100
+_SECTION_LENGTH = AnalyticsSession.__table__.c.entry_section.type.length
+
+
+def step_token(row):
+    """Path step for an event: 'event_type' or 'event_type:section'"""
+    event_type = row.get('event_type') or 'page_view'
+    return f"{event_type}:{row['section']}" if row.get('section') else event_type
+
+
+def _path_entry(token, weight):
+    return token if weight == 1 else [token, weight]
+
+
+def path_step(entry):
+    """(token, weight) of a stored path entry"""
+    return (entry, 1) if isinstance(entry, str) else (entry[0], entry[1])
+
+
+def _section(row):
+    return (row.get('section') or None) and row['section'][:_SECTION_LENGTH]
+
+
+class _Visit:
+    __slots__ = ('model', 'started_at', 'ended_at', 'event_count', 'page_views', 'entry_section',
+                 'exit_section', 'path', 'weight')
+
+    def __init__(self, model=None):
+        self.model = model
+        if model is None:
+            self.started_at = self.ended_at = None
+            self.event_count = self.page_views = 0
+            self.entry_section = self.exit_section = None
+            self.path = []
+            self.weight = None
+        else:
+            self.started_at, self.ended_at = model.started_at, model.ended_at
+            self.event_count, self.page_views = model.event_count, model.page_views
+            self.entry_section, self.exit_section = model.entry_section, model.exit_section
+            self.path = json.loads(model.path or '[]')
+            self.weight = model.weight or 1
+
+    def add(self, row):
+        timestamp = row['timestamp']
+        if self.started_at is None:
+            self.started_at = timestamp
+        self.ended_at = timestamp
+        self.event_count += 1
+        if (row.get('event_type') or 'page_view') == 'page_view':
+            self.page_views += 1
+        section = _section(row)
+        if section:
+            self.entry_section = self.entry_section or section
+            self.exit_section = section
+        weight = row.get('weight') or 1
+        self.weight = min(self.weight or weight, weight)
+        token = step_token(row)
+        if self.path and path_step(self.path[-1])[0] == token:
+            # A repeated step is seen when any of its events was kept: at the lowest of their weights
+            if weight < path_step(self.path[-1])[1]:
+                self.path[-1] = _path_entry(token, weight)
+        elif len(self.path) < MAX_PATH_STEPS:
+            self.path.append(_path_entry(token, weight))
+
+    def save(self, session, session_id):
+        values = {
+            'started_at': self.started_at,
+            'ended_at': self.ended_at,
+            'event_count': self.event_count,
+            'page_views': self.page_views,
+            'entry_section': self.entry_section,
+            'exit_section': self.exit_section,
+            'path': json.dumps(self.path),
+            'weight': self.weight,
+        }
+        if self.model is None:
+            session.add(AnalyticsSession(session_id=session_id, **values))
+        else:
+            for name, value in values.items():
+                setattr(self.model, name, value)
+
+
+def _build_visits(rows, visit=None):
+    """Split time-ordered events into visits, continuing `visit` if given; returns the touched visits"""
+    visits = [visit] if visit is not None else []
+    for row in rows:
+        if not visits or row['timestamp'] - visits[-1].ended_at > SESSION_TIMEOUT:
+            visits.append(_Visit())
+        visits[-1].add(row)
+    return visits
+
+
+def _raw_events(session, session_id, since):
+    events = events_source(start=since, columns=('session_id', 'timestamp', 'event_type', 'section', 'weight'),
+                           bind=session.connection())
+    query = select(events.c.timestamp, events.c.event_type, events.c.section, events.c.weight).where(
+        events.c.session_id == session_id,
+        events.c.timestamp >= since
+    ).order_by(events.c.timestamp)
+    return [dict(row) for row in session.execute(query).mappings()]
+
+
+def _resessionize(session, session_id, latest_visits, since):
+    """Recompute the visits of one session_id from its raw events (late or replayed events)"""
+    stale = [v for v in latest_visits if v.ended_at >= since - SESSION_TIMEOUT]
+    start = min([since] + [v.started_at for v in stale])
+    for visit in stale:
+        session.delete(visit)
+    session.flush()
+    for visit in _build_visits(_raw_events(session, session_id, start)):
+        visit.save(session, session_id)
+
+
+def apply_sessions(session, rows):
+    """Ingest sink: fold a flushed batch into the visit rows, in session_id/timestamp order"""
+    by_session = defaultdict(list)
+    for row in rows:
+        if row.get('session_id') and row.get('timestamp'):
+            by_session[row['session_id']].append(row)
+    if not by_session:
+        return
+
+    # Every visit that could still be extended, locked (Postgres) against concurrent flushes
+    earliest = min(r['timestamp'] for events in by_session.values() for r in events)
+    open_visits = defaultdict(list)
+    for visit in session.execute(
+        select(AnalyticsSession).where(
+            AnalyticsSession.session_id.in_(list(by_session)),
+            AnalyticsSession.ended_at >= earliest - SESSION_TIMEOUT
+        ).order_by(AnalyticsSession.started_at).with_for_update()
+    ).scalars():
+        open_visits[visit.session_id].append(visit)
+
+    for session_id in sorted(by_session):
+        events = sorted(by_session[session_id], key=lambda r: r['timestamp'])
+        visits = open_visits.get(session_id, [])
+        if visits and events[0]['timestamp'] <= visits[-1].ended_at:
+            # Late or replayed events: rebuild this session_id's recent visits from raw events
+            _resessionize(session, session_id, visits, events[0]['timestamp'])
+            continue
+        current = _Visit(visits[-1]) if visits else None
+        for visit in _build_visits(events, current):
+            visit.save(session, session_id)
+
+
+register_aggregate(AnalyticsSession, apply_sessions, time_column=AnalyticsSession.started_at)
+
+
+# ---------------------------------------------------------------------------
+# Funnels and summaries
+# ---------------------------------------------------------------------------
+
+def parse_steps(value):
+    """Funnel steps from 'page_view,section_view:projects,project_click' ('*:section' matches any event)"""
+    steps = [step.strip() for step in (value or '').split(',') if step.strip()]
+    if len(steps) < 2:
+        raise ValueError('A funnel needs at least two comma-separated steps')
+    return steps
+
+
+def _matches(step, token):
+    event_type, _, section = token.partition(':')
+    step_type, has_section, step_section = step.partition(':')
+    if step_type not in ('*', event_type):
+        return False
+    return not has_section or step_section == section
+
+
+def funnel_query(start=None, end=None):
+    query = select(AnalyticsSession.path, AnalyticsSession.weight)
+    if start is not None:
+        query = query.where(AnalyticsSession.started_at >= start)
+    if end is not None:
+        query = query.where(AnalyticsSession.started_at < end)
+    return query
+
+
+def funnel(steps, start=None, end=None):
+    """Visits reaching each step in order: [(step, visits), ...] in one pass over the sessions table"""
+    reached = [0] * len(steps)
+    for path, visit_weight in db.session.execute(funnel_query(start, end).execution_options(yield_per=2000)):
+        position = 0
+        weight = visit_weight or 1
+        for entry in json.loads(path or '[]'):
+            token, step_weight = path_step(entry)
+            if _matches(steps[position], token):
+                # Seen only if every matched step was kept: at the rate of the most sampled one
+                weight = max(weight, step_weight)
+                reached[position] += weight
+                position += 1
+                if position == len(steps):
+                    break
+    return list(zip(steps, reached))
+
+
+def _duration_seconds():
+    if db.engine.dialect.name == 'sqlite':
+        return (func.julianday(AnalyticsSession.ended_at) - func.julianday(AnalyticsSession.started_at)) * 86400
+    return func.extract('epoch', AnalyticsSession.ended_at - AnalyticsSession.started_at)
+
+
+def session_summary(start=None, end=None, top=5):
+    """Visit count, average duration, bounce rate and top entry/exit sections
+
+    Sampled visits count with their weight. Bounce rate and average events look at the events that were
+    kept, so they read high while sheddable event types are sampled harder than page views.
+    """
+    conditions = []
+    if start is not None:
+        conditions.append(AnalyticsSession.started_at >= start)
+    if end is not None:
+        conditions.append(AnalyticsSession.started_at < end)
+
+    weight = func.coalesce(AnalyticsSession.weight, 1)  # Sampled visits stand for `weight` visits
+    visits, total_duration, bounces, events = db.session.execute(
+        select(
+            func.sum(weight),
+            func.sum(_duration_seconds() * weight),
+            func.sum(case((AnalyticsSession.event_count == 1, weight), else_=0)),
+            func.sum(AnalyticsSession.event_count * weight)
+        ).where(*conditions)
+    ).one()
+
+    def top_sections(column):
+        count = func.sum(weight).label('count')
+        query = select(column, count).where(column.isnot(None), *conditions).group_by(column)
+        return [tuple(row) for row in db.session.execute(query.order_by(count.desc()).limit(top))]
+
+    visits = visits or 0
+    return {
+        'visits': visits,
+        'avg_duration': round(float(total_duration or 0) / visits, 1) if visits else 0,
+        'avg_events': round((events or 0) / visits, 2) if visits else 0,
+        'bounce_rate': round((bounces or 0) / visits, 4) if visits else 0,
+        'entry_sections': top_sections(AnalyticsSession.entry_section),
+        'exit_sections': top_sections(AnalyticsSession.exit_section),
+    }
@@ -0,0 +1,217 @@
+"""Distinct-visitor and engagement sketches for the analytics dashboard.
+
+COUNT(DISTINCT session_id) needs every session id in the range, so it gets
+slower as the Analytics table grows. Instead, each flushed batch updates one
+HyperLogLog per (day, dimension value) for the total, country and city
+dimensions. Distinct visitors for any range are estimated by merging the
+daily sketches that cover it.
+
+The same way, a Space-Saving top-K sketch per (day, dimension, event type)
+tracks the most frequent items and sections, and a DDSketch per (day,
+section) tracks the `duration` distribution for time-on-section percentiles.
+"""
+from collections import Counter, defaultdict
+
+from sqlalchemy import select
+
+from models import AnalyticsSketch, db
+from analytics_rollups import bucket_start, register_aggregate
+from sketches import DDSketch, HyperLogLog, SpaceSaving
+
+HLL_KIND = 'hll'
+HLL_GRANULARITY = 'day'
+HLL_DIMENSIONS = ('total', 'country', 'city')
+
+TOPK_KIND = 'topk'
+TOPK_DIMENSIONS = ('item_name', 'section')  # One sketch per event type (value)
+DURATION_KIND = 'ddsketch'
+DURATION_DIMENSIONS = ('total', 'section')
+ENGAGEMENT_GRANULARITY = 'day'
+PERCENTILES = (0.5, 0.9, 0.99)
+
+# Settings for new sketches; set from ANALYTICS_HLL_ERROR, ANALYTICS_TOPK_CAPACITY and
+# ANALYTICS_DURATION_ACCURACY by init_app
+_settings = {'precision': HyperLogLog.precision_for_error(0.02), 'topk_capacity': 100, 'duration_accuracy': 0.01}
+
+
+def init_app(app):
+    _settings['precision'] = HyperLogLog.precision_for_error(app.config.get('ANALYTICS_HLL_ERROR', 0.02))
+    _settings['topk_capacity'] = app.config.get('ANALYTICS_TOPK_CAPACITY', 100)
+    _settings['duration_accuracy'] = app.config.get('ANALYTICS_DURATION_ACCURACY', 0.01)
+
+
+def error_bound():
+    return round(1.04 / (1 << _settings['precision']) ** 0.5, 4)
+
+
+def _sketch_keys(row):
+    yield 'total', '', ''
+    if row.get('country'):
+        yield 'country', row['country'], ''
+    if row.get('city'):
+        yield 'city', row['city'], row.get('country') or ''
+
+
+def weighted_session_ids(session_id, weight):
+    """Ids a session is counted under: a session kept at a sampling rate of 1/k stands for k sessions"""
+    yield session_id
+    for copy in range(1, weight):
+        yield f'{session_id}#{copy}'
+
+
+def apply_sketches(session, rows):
+    """Ingest sink: add the batch's session ids to the daily HyperLogLog sketches"""
+    # key -> session id -> weight. A session is in the sample at the rate of its least sampled event,
+    # so it counts with its lowest weight (1 when any of its events was kept unsampled).
+    sessions_by_key = defaultdict(dict)
+    for row in rows:
+        if not row.get('session_id'):
+            continue
+        start = bucket_start(row['timestamp'], HLL_GRANULARITY)
+        weight = row.get('weight') or 1
+        for dimension, value, parent in _sketch_keys(row):
+            weights = sessions_by_key[(dimension, start, value, parent)]
+            weights[row['session_id']] = min(weight, weights.get(row['session_id'], weight))
+    if not sessions_by_key:
+        return
+
+    existing = _locked_sketches(session, [HLL_KIND], HLL_GRANULARITY, {key[1] for key in sessions_by_key})
+    for key, weights in sessions_by_key.items():
+        stored = existing.get((HLL_KIND,) + key)
+        hll = HyperLogLog.from_bytes(stored.data) if stored else HyperLogLog(_settings['precision'])
+        for session_id, weight in weights.items():
+            hll.update(weighted_session_ids(session_id, weight))
+        _save(session, stored, HLL_KIND, HLL_GRANULARITY, key, hll)
+
+
+def _locked_sketches(session, kinds, granularity, buckets):
+    """Stored sketches of the given kinds and buckets by (kind, dimension, bucket_start, value, parent_value)
+
+    The rows are locked (Postgres) so concurrent flushes cannot lose updates.
+    """
+    return {
+        (s.kind, s.dimension, s.bucket_start, s.value, s.parent_value): s
+        for s in session.execute(
+            select(AnalyticsSketch).where(
+                AnalyticsSketch.kind.in_(kinds),
+                AnalyticsSketch.granularity == granularity,
+                AnalyticsSketch.bucket_start.in_(buckets)
+            ).with_for_update()
+        ).scalars()
+    }
+
+
+def _save(session, stored, kind, granularity, key, sketch):
+    if stored:
+        stored.data = sketch.to_bytes()
+        return
+    dimension, start, value, parent = key
+    session.add(AnalyticsSketch(
+        kind=kind,
+        granularity=granularity,
+        bucket_start=start,
+        dimension=dimension,
+        value=value,
+        parent_value=parent,
+        data=sketch.to_bytes()
+    ))
+
+
+register_aggregate(AnalyticsSketch, apply_sketches, scope=AnalyticsSketch.kind == HLL_KIND)
+
+
+def apply_engagement_sketches(session, rows):
+    """Ingest sink: fold the batch into the daily top-K item/section and duration sketches"""
+    items = defaultdict(Counter)  # (dimension, day, event_type, '') -> item -> weighted count
+    durations = defaultdict(Counter)  # (dimension, day, section, '') -> duration -> weighted count
+    for row in rows:
+        start = bucket_start(row['timestamp'], ENGAGEMENT_GRANULARITY)
+        event_type = row.get('event_type') or 'page_view'
+        weight = row.get('weight') or 1
+        for dimension in TOPK_DIMENSIONS:
+            if row.get(dimension):
+                items[(dimension, start, event_type, '')][row[dimension]] += weight
+        duration = row.get('duration')
+        if duration is not None and duration >= 0:
+            durations[('total', start, '', '')][duration] += weight
+            if row.get('section'):
+                durations[('section', start, row['section'], '')][duration] += weight
+    if not items and not durations:
+        return
+
+    buckets = {key[1] for key in items} | {key[1] for key in durations}
+    existing = _locked_sketches(session, [TOPK_KIND, DURATION_KIND], ENGAGEMENT_GRANULARITY, buckets)
+    for key, counts in items.items():
+        stored = existing.get((TOPK_KIND,) + key)
+        topk = SpaceSaving.from_bytes(stored.data) if stored else SpaceSaving(_settings['topk_capacity'])
+        for item, count in counts.items():
+            topk.add(item, count)
+        _save(session, stored, TOPK_KIND, ENGAGEMENT_GRANULARITY, key, topk)
+    for key, counts in durations.items():
+        stored = existing.get((DURATION_KIND,) + key)
+        sketch = DDSketch.from_bytes(stored.data) if stored else DDSketch(_settings['duration_accuracy'])
+        for duration, count in counts.items():
+            sketch.add(duration, count)
+        _save(session, stored, DURATION_KIND, ENGAGEMENT_GRANULARITY, key, sketch)
+
+
+register_aggregate(AnalyticsSketch, apply_engagement_sketches,
+                   scope=AnalyticsSketch.kind.in_((TOPK_KIND, DURATION_KIND)))
+
+
+def sketch_query(dimension, start=None, end=None, kind=HLL_KIND, granularity=HLL_GRANULARITY):
+    query = select(AnalyticsSketch.value, AnalyticsSketch.parent_value, AnalyticsSketch.data).where(
+        AnalyticsSketch.kind == kind,
+        AnalyticsSketch.granularity == granularity,
+        AnalyticsSketch.dimension == dimension
+    )
+    if start is not None:
+        query = query.where(AnalyticsSketch.bucket_start >= bucket_start(start, granularity))
+    if end is not None:
+        query = query.where(AnalyticsSketch.bucket_start < end)
+    return query
+
+
+def distinct_sessions(dimension, start=None, end=None):
+    """Estimated distinct sessions per dimension value: {(value, parent_value): count}"""
+    query = sketch_query(dimension, start, end)
+    merged = {}
+    for value, parent, data in db.session.execute(query):
+        hll = HyperLogLog.from_bytes(data)
+        key = (value, parent)
+        if key in merged:
+            merged[key].merge(hll)
+        else:
+            merged[key] = hll
+    return {key: hll.count() for key, hll in merged.items()}
+
+
+def top_items(dimension, event_type=None, start=None, end=None, limit=10):
+    """Most frequent values of an item dimension: [(value, count, error), ...] from the merged top-K sketches"""
+    merged = None
+    query = sketch_query(dimension, start, end, kind=TOPK_KIND, granularity=ENGAGEMENT_GRANULARITY)
+    if event_type is not None:
+        query = query.where(AnalyticsSketch.value == event_type)
+    for _, _, data in db.session.execute(query):
+        topk = SpaceSaving.from_bytes(data)
+        merged = topk if merged is None else merged.merge(topk)
+    return merged.top(limit) if merged else []
+
+
+def duration_percentiles(dimension='section', start=None, end=None):
+    """Duration percentiles per value: {value: {'count', 'mean', 'p50', 'p90', 'p99'}} from the merged DDSketches"""
+    query = sketch_query(dimension, start, end, kind=DURATION_KIND, granularity=ENGAGEMENT_GRANULARITY)
+    merged = {}
+    for value, _, data in db.session.execute(query):
+        sketch = DDSketch.from_bytes(data)
+        if value in merged:
+            merged[value].merge(sketch)
+        else:
+            merged[value] = sketch
+    return {
+        value: dict(
+            {'count': sketch.count, 'mean': round(sketch.mean(), 1)},
+            **{f'p{round(q * 100)}': round(sketch.quantile(q), 1) for q in PERCENTILES}
+        )
+        for value, sketch in merged.items() if sketch.count
+    }
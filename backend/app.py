@@ -1,18 +1,54 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, abort, stream_with_context
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 from flask_mail import Mail, Message
 from datetime import timedelta, datetime
 from config import Config
-from models import db, Project, About, Skill, Analytics, Experience, Contact, ActivityLog, GitHubSettings, Blog, BlogLike, BlogComment, CommentLike
+from models import (db, Project, About, Skill, Analytics, Experience, Contact, ActivityLog, GitHubSettings, Blog, BlogLike,
+                    BlogComment, CommentLike)
+from analytics_ingest import ingest_buffer, normalize_event, IngestQueueFull, InvalidEvent
+from geoip import geoip_resolver, UNKNOWN as UNKNOWN_LOCATION
+from cache import LRUCache
+from analytics_rollups import (apply_rollups, rebuild_rollups, rollups_missing, rollup_totals, bucket_start, dense_series,
+                               range_granularity, series_granularity, bucket_count, SERIES_GRANULARITIES, MAX_SERIES_BUCKETS)
+import analytics_sketches
+from analytics_sketches import apply_sketches, apply_engagement_sketches, distinct_sessions, duration_percentiles, top_items
+from analytics_realtime import realtime_window
+from analytics_dimensions import resolve_dimensions
+from analytics_bots import bot_filter
+from analytics_sampling import load_shedder
+from analytics_sessions import apply_sessions, funnel, parse_steps, session_summary
+from analytics_export import EXPORT_FORMATS, export_query, iter_export, gzip_stream
+from analytics_queries import (parse_time_arg, recent_activity_query, exact_visitors_query, exact_visitors_by_country_query,
+                               exact_visitors_by_city_query)
+from analytics_partitions import maintain_partitions
+import http_cache
+from http_cache import conditional, ensure_versions, response_cache
+from bootstrap import homepage_bootstrap
+from static_snapshot import static_snapshot
+from compression import compression
+from pagination import InvalidCursor, page_response, page_size_arg, paginate, wants_page
+from serializers import (about_serializer, activity_serializer, blog_serializer, contact_serializer,
+                         project_serializer, skill_serializer)
+import json_provider
+from json_provider import dumpb
+import fragments
+from fragments import (backfill_fragments, fragment_json, fragment_query, fragments_json, stale_fragments,
+                       SPLICED_FIELDS)
+from schema import ensure_schema
 import os
 import requests
 import uuid
 import json
+import ipaddress
+from werkzeug.http import is_resource_modified
 from sqlalchemy import func, desc
+from sqlalchemy.orm import undefer
 
 app = Flask(__name__)
 app.config.from_object(Config)
+json_provider.init_app(app)
+fragments.init_app(app)
 
 # Initialize extensions
 db.init_app(app)
@@ -20,6 +56,26 @@ db.init_app(app)
 jwt = JWTManager(app)
 mail = Mail(app)
 CORS(app, origins=app.config['CORS_ORIGINS'])
+ingest_buffer.init_app(app)
+ingest_buffer.add_enricher(resolve_dimensions)
+ingest_buffer.add_sink(apply_rollups)
+ingest_buffer.add_sink(apply_sketches)
+ingest_buffer.add_sink(apply_engagement_sketches)
+ingest_buffer.add_sink(apply_sessions)
+ingest_buffer.add_periodic(bot_filter.flush_counts)
+ingest_buffer.add_periodic(load_shedder.flush_counts)
+bot_filter.init_app(app)
+load_shedder.init_app(app)
+analytics_sketches.init_app(app)
+http_cache.init_app(app)
+compression.init_app(app)
+homepage_bootstrap.init_app(app)
+static_snapshot.init_app(app)
+geoip_resolver.init_app(app)
+location_cache = LRUCache(maxsize=app.config['GEOIP_CACHE_SIZE'])
+# Addresses cached as Unknown (or under the old file) are looked up again after a reload
+geoip_resolver.add_reload_listener(location_cache.clear)
+ingest_buffer.add_periodic(geoip_resolver.check_for_update)
 
 # Function to initialize database with sample data
 def initialize_database():
@@ -385,9 +441,35 @@ with app.app_context():
         db.create_all()
         print("✅ Database tables created/verified successfully")
         
+        # Add columns and indexes declared after the tables were first created
+        ensure_schema()
+        
+        # Create upcoming monthly partitions (Postgres) or move old months out of the hot table (SQLite)
+        for partition in maintain_partitions(hot_months=app.config['ANALYTICS_HOT_MONTHS'],
+                                             months_ahead=app.config['ANALYTICS_PARTITIONS_AHEAD']):
+            print(f"🗂️  Analytics partition maintained: {partition}")
+        
         # Auto-initialize with sample data if database is empty
         # Set AUTO_INIT_DB=false in environment variables to disable
         initialize_database()
+        
+        # Content version counters behind the public ETags
+        ensure_versions()
+        
+        # Pre-render content fragments missing after an upgrade or a FRAGMENT_VERSION bump
+        if stale_fragments():
+            print(f"🧱 Rendered {backfill_fragments()} content fragments")
+        
+        # Build aggregates that are still empty (existing deployments, newly registered sinks) from the raw
+        # events still stored; the others are left alone, since archived months cannot be rebuilt
+        missing = rollups_missing()
+        if missing:
+            print("📊 Building analytics rollups from existing events...")
+            rebuilt = rebuild_rollups(aggregates=missing)
+            print(f"✅ Rolled up {rebuilt} analytics events")
+        
+        # Warm the realtime window so a restart doesn't blank the dashboard panel
+        realtime_window.rebuild()
     except Exception as e:
         db_url = app.config.get('SQLALCHEMY_DATABASE_URI', 'Not set')
         # Don't print full URL for security
@@ -442,14 +524,37 @@ def login():
 
 # Projects routes
 @app.route('/api/projects', methods=['GET'])
+@conditional('projects')
 def get_projects():
-    projects = Project.query.order_by(Project.created_at.desc()).all()
-    return jsonify([project.to_dict() for project in projects]), 200
+    """Get all projects, or one page of them with ?page_size= / ?cursor="""
+    if not wants_page(request.args):
+        return json_response(projects_json()), 200
+    return list_page(project_serializer.query(), 'projects', (Project.created_at, Project.id),
+                     project_serializer.compile())
+
+def list_page(query, name, keys, serialize, key_of=None):
+    """One cursor page of a list endpoint, newest first by keys (query rows are column tuples)"""
+    page_size = page_size_arg(request.args)
+    try:
+        rows, next_cursor = paginate(query, name, keys, page_size, request.args.get('cursor'), key_of=key_of)
+    except InvalidCursor as e:
+        return jsonify({'message': str(e)}), 400
+    return jsonify(page_response([serialize(row) for row in rows], next_cursor, page_size)), 200
+
+def json_response(body):
+    """Response of already serialized JSON bytes"""
+    return app.response_class(body, mimetype='application/json')
+
+def projects_json():
+    return fragments_json(Project, fragment_query(Project).order_by(Project.created_at.desc()))
 
 @app.route('/api/projects/<int:project_id>', methods=['GET'])
+@conditional('projects')
 def get_project(project_id):
-    project = Project.query.get_or_404(project_id)
-    return jsonify(project.to_dict()), 200
+    body = fragment_json(Project, project_id)
+    if body is None:
+        abort(404)
+    return json_response(body), 200
 
 @app.route('/api/projects', methods=['POST'])
 @jwt_required()
@@ -519,12 +624,17 @@ def delete_project(project_id):
 
 # About routes
 @app.route('/api/about', methods=['GET'])
+@conditional('about')
 def get_about():
-    about = About.query.first()
+    about = about_payload()
     if about:
-        return jsonify(about.to_dict()), 200
+        return jsonify(about), 200
     return jsonify({'message': 'About information not found'}), 404
 
+def about_payload():
+    about = about_serializer.query().order_by(About.id).first()
+    return about_serializer.compile()(about) if about else None
+
 @app.route('/api/about', methods=['PUT'])
 @jwt_required()
 def update_about():
@@ -564,9 +674,12 @@ def update_about():
 
 # Skills routes
 @app.route('/api/skills', methods=['GET'])
+@conditional('skills')
 def get_skills():
-    skills = Skill.query.all()
-    return jsonify([skill.to_dict() for skill in skills]), 200
+    return jsonify(skills_payload()), 200
+
+def skills_payload():
+    return skill_serializer.all(skill_serializer.query())
 
 @app.route('/api/skills', methods=['POST'])
 @jwt_required()
@@ -628,10 +741,33 @@ def delete_skill(skill_id):
 
 # Helper function to get location from IP
 def get_location_from_ip(ip_address):
-    """Get country and city from IP address using free API"""
+    """Get country and city from IP address, cached per IP"""
     try:
-        # Using ipapi.co free service (1000 requests/day free)
-        if ip_address and ip_address != '127.0.0.1' and not ip_address.startswith('192.168'):
+        ip = ipaddress.ip_address(ip_address)
+    except (ValueError, TypeError):
+        return dict(UNKNOWN_LOCATION)
+    if ip.is_private or ip.is_loopback:
+        return dict(UNKNOWN_LOCATION)
+    
+    location = location_cache.get(ip_address)
+    if location is None:
+        location = resolve_location(ip_address)
+        # Cache misses for a shorter time so a reloaded database or a recovered API is picked up
+        if location['country'] == 'Unknown':
+            location_cache.set(ip_address, location, ttl=app.config['GEOIP_NEGATIVE_CACHE_TTL'])
+        else:
+            location_cache.set(ip_address, location, ttl=app.config['GEOIP_CACHE_TTL'])
+    return dict(location)
+
+def resolve_location(ip_address):
+    """Resolve a public IP address using the local GeoIP database"""
+    if geoip_resolver.loaded:
+        location = geoip_resolver.lookup(ip_address)
+        return dict(location) if location else dict(UNKNOWN_LOCATION)
+    
+    if app.config.get('GEOIP_REMOTE_FALLBACK'):
+        try:
+            # No local database - use ipapi.co free service (1000 requests/day free)
             response = requests.get(f'https://ipapi.co/{ip_address}/json/', timeout=2)
             if response.status_code == 200:
                 data = response.json()
@@ -639,153 +775,418 @@ def get_location_from_ip(ip_address):
                     'country': data.get('country_name', 'Unknown'),
                     'city': data.get('city', 'Unknown')
                 }
-    except:
-        pass
-    return {'country': 'Unknown', 'city': 'Unknown'}
+        except (requests.RequestException, ValueError):
+            pass
+    return dict(UNKNOWN_LOCATION)
 
 # Analytics routes
+def get_client_ip():
+    return request.remote_addr or request.headers.get('X-Forwarded-For', '').split(',')[0]
+
+def queue_events(events):
+    """Hand events to the ingest buffer and count them in the realtime window"""
+    try:
+        ingest_buffer.submit_many(events)
+    except IngestQueueFull as e:
+        realtime_window.record_many(events[:e.accepted])
+        raise
+    realtime_window.record_many(events)
+
 @app.route('/api/analytics/track', methods=['POST'])
 def track_event():
     """Track user interaction events"""
-    data = request.get_json()
-    ip_address = request.remote_addr or request.headers.get('X-Forwarded-For', '').split(',')[0]
+    data = request.get_json(silent=True)
+    ip_address = get_client_ip()
+    
+    try:
+        event = normalize_event(data)
+    except InvalidEvent as e:
+        return jsonify({'message': f'Invalid event: {str(e)}'}), 400
+    
+    session_id = data.get('session_id') or str(uuid.uuid4())
+    
+    # Bot traffic is only counted, before any geolocation or insert work
+    if bot_filter.check(request.headers.get('User-Agent', ''), str(session_id)):
+        return jsonify({'message': 'Event tracked', 'session_id': session_id}), 202
+    
+    # Under load, keep a weighted sample so the database stays free for content reads
+    if not load_shedder.sample([event]):
+        return jsonify({'message': 'Event tracked', 'session_id': session_id}), 202
     
     # Get location
     location = get_location_from_ip(ip_address)
     
-    analytics = Analytics(
-        session_id=data.get('session_id', str(uuid.uuid4())),
-        event_type=data.get('event_type', 'page_view'),
-        section=data.get('section'),
-        item_id=data.get('item_id'),
-        item_name=data.get('item_name'),
-        ip_address=ip_address,
-        user_agent=request.headers.get('User-Agent', ''),
-        country=location['country'],
-        city=location['city'],
-        referrer=request.headers.get('Referer', ''),
-        duration=data.get('duration')
-    )
+    event.update({
+        'session_id': str(session_id)[:200],
+        'ip_address': ip_address,
+        'user_agent': request.headers.get('User-Agent', ''),
+        'country': location['country'],
+        'city': location['city'],
+        'referrer': request.headers.get('Referer', '')
+    })
     
-    db.session.add(analytics)
-    db.session.commit()
-    return jsonify({'message': 'Event tracked', 'session_id': analytics.session_id}), 201
+    # Queue for batched insert - the background worker commits it
+    try:
+        queue_events([event])
+    except IngestQueueFull:
+        return jsonify({'message': 'Analytics ingest is busy, retry later'}), 503, {'Retry-After': '5'}
+    
+    return jsonify({'message': 'Event tracked', 'session_id': session_id}), 202
+
+@app.route('/api/analytics/track/batch', methods=['POST'])
+def track_event_batch():
+    """Track several events from one session in a single request"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('events'), list):
+        return jsonify({'message': 'Expected {"session_id": ..., "events": [...]}'}), 400
+    
+    raw_events = data['events']
+    max_events = app.config['ANALYTICS_MAX_BATCH_EVENTS']
+    if len(raw_events) > max_events:
+        return jsonify({'message': f'Too many events in batch (max {max_events})'}), 413
+    
+    session_id = str(data.get('session_id') or uuid.uuid4())[:200]
+    ip_address = get_client_ip()
+    user_agent = request.headers.get('User-Agent', '')
+    # The page's document.referrer when sent by the client; the Referer header is the portfolio page itself
+    referrer = data.get('referrer') if isinstance(data.get('referrer'), str) else request.headers.get('Referer', '')
+    
+    # Validate every event first, then enrich once for the whole batch (one session, one IP)
+    now = datetime.utcnow()
+    results = []
+    accepted = []
+    for index, raw in enumerate(raw_events):
+        try:
+            accepted.append(normalize_event(raw, now=now))
+            results.append({'index': index, 'status': 'accepted'})
+        except InvalidEvent as e:
+            results.append({'index': index, 'status': 'rejected', 'error': str(e)})
+    
+    # Bot traffic is only counted, before any geolocation or insert work
+    if accepted and bot_filter.check(user_agent, session_id, events=len(accepted), now=now):
+        for result in results:
+            if result['status'] == 'accepted':
+                result['status'] = 'filtered'
+        accepted = []
+    
+    # Under load, keep a weighted sample so the database stays free for content reads
+    if accepted:
+        kept = load_shedder.sample(accepted, now=now)
+        if len(kept) < len(accepted):
+            kept_ids = {id(event) for event in kept}
+            events = iter(accepted)
+            for result in results:
+                if result['status'] == 'accepted' and id(next(events)) not in kept_ids:
+                    result['status'] = 'sampled'
+            accepted = kept
+    
+    if accepted:
+        location = get_location_from_ip(ip_address)
+        for event in accepted:
+            event.update({
+                'session_id': session_id,
+                'ip_address': ip_address,
+                'user_agent': user_agent,
+                'country': location['country'],
+                'city': location['city'],
+                'referrer': referrer
+            })
+            event.setdefault('timestamp', now)
+        
+        # Rows are flushed together by the ingest worker as one multi-row INSERT
+        try:
+            queue_events(accepted)
+        except IngestQueueFull as e:
+            # Events are queued in order, so everything after the first e.accepted needs a retry
+            queued = e.accepted
+            for result in results:
+                if result['status'] == 'accepted':
+                    if queued > 0:
+                        queued -= 1
+                    else:
+                        result['status'] = 'retry'
+            return jsonify({
+                'message': 'Analytics ingest is busy, retry later',
+                'session_id': session_id,
+                'results': results
+            }), 503, {'Retry-After': '5'}
+    
+    return jsonify({
+        'message': 'Events tracked',
+        'session_id': session_id,
+        'accepted': len(accepted),
+        'rejected': sum(1 for r in results if r['status'] == 'rejected'),
+        'filtered': sum(1 for r in results if r['status'] == 'filtered'),
+        'sampled': sum(1 for r in results if r['status'] == 'sampled'),
+        'results': results
+    }), 202
+
+@app.route('/api/analytics/pipeline', methods=['GET'])
+@jwt_required()
+def get_analytics_pipeline_stats():
+    """Get ingest pipeline counters (queue depth, batches, flush latency)"""
+    return jsonify({
+        'ingest': ingest_buffer.get_stats(),
+        'geoip': geoip_resolver.get_stats(),
+        'location_cache': location_cache.get_stats(),
+        'bot_filter': bot_filter.get_stats(),
+        'sampling': load_shedder.get_stats()
+    }), 200
+
+@app.route('/api/analytics/geoip/reload', methods=['POST'])
+@jwt_required()
+def reload_geoip_database():
+    """Reload the GeoIP database file without restarting the server"""
+    try:
+        if not geoip_resolver.reload():
+            return jsonify({'message': 'GeoIP database file not found', 'geoip': geoip_resolver.get_stats()}), 404
+    except Exception as e:
+        return jsonify({'message': f'Error loading GeoIP database: {str(e)}'}), 500
+    return jsonify({'message': 'GeoIP database reloaded', 'geoip': geoip_resolver.get_stats()}), 200
+
+@app.route('/api/analytics/export', methods=['GET'])
+@jwt_required()
+def export_analytics():
+    """Stream raw analytics events as NDJSON or CSV
+    
+    Query params: format (ndjson|csv), from/to (ISO date or datetime, UTC),
+    event_type (comma-separated) and gzip=true for a compressed download.
+    Otherwise the stream is compressed in transit if Accept-Encoding allows.
+    """
+    fmt = request.args.get('format', 'ndjson').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'message': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        start = parse_time_arg(request.args.get('from'))
+        end = parse_time_arg(request.args.get('to'))
+    except ValueError:
+        return jsonify({'message': 'from/to must be ISO 8601 dates or datetimes'}), 400
+    event_types = [t for t in request.args.get('event_type', '').split(',') if t]
+    compress = request.args.get('gzip', 'false').lower() == 'true'
+    
+    chunks = iter_export(export_query(start, end, event_types), fmt)
+    filename = f"analytics-{datetime.utcnow():%Y%m%d%H%M%S}.{fmt}"
+    mimetype = EXPORT_FORMATS[fmt]
+    if compress:
+        chunks = gzip_stream(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+    # Otherwise compressed in transit only: the client decodes it back to the plain file
+    encoding = None if compress else compression.negotiate()
+    if encoding:
+        chunks = compression.stream(chunks, encoding)
+        headers['Content-Encoding'] = encoding
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
 
 @app.route('/api/analytics/stats', methods=['GET'])
 @jwt_required()
 def get_analytics_stats():
-    """Get analytics statistics for dashboard"""
-    # Total visitors
-    total_visitors = db.session.query(func.count(func.distinct(Analytics.session_id))).scalar()
-    
+    """Get analytics statistics for dashboard
+    
+    from/to (ISO date or datetime, UTC) limit the totals to a time range
+    (default: all time). granularity (minute|hour|day|week) sets the bucket
+    size of the zero-filled `traffic` series, which covers the range, or the
+    24 hours up to `to` (default: now) when `from` is not given. Distinct-visitor numbers are HyperLogLog estimates; pass
+    ?exact=true to count distinct sessions over the raw events instead. Visitor counts and time-on-section
+    percentiles come from daily sketches and cover whole UTC days; `range.daily` is the range they cover.
+    """
+    exact = request.args.get('exact', 'false').lower() == 'true'
+    try:
+        start = parse_time_arg(request.args.get('from'))
+        end = parse_time_arg(request.args.get('to'))
+    except ValueError:
+        return jsonify({'message': 'from/to must be ISO 8601 dates or datetimes'}), 400
+    if start and end and start >= end:
+        return jsonify({'message': 'from must be earlier than to'}), 400
+    
+    now = datetime.utcnow()
+    yesterday = now - timedelta(days=1)
+    series_end = end or now
+    series_start = start or series_end - timedelta(days=1)
+    granularity = request.args.get('granularity') or series_granularity(series_start, series_end)
+    if granularity not in SERIES_GRANULARITIES:
+        return jsonify({'message': f"granularity must be one of: {', '.join(SERIES_GRANULARITIES)}"}), 400
+    if bucket_count(granularity, series_start, series_end) > MAX_SERIES_BUCKETS:
+        return jsonify({'message': f'Range too large for {granularity} buckets (max {MAX_SERIES_BUCKETS})'}), 400
+    
+    # Counters below come from the pre-aggregated rollups, not the raw events.
+    # Daily rollups serve day-aligned ranges; anything else sums the overlapping hours.
+    rollup_range = {
+        'granularity': range_granularity(start, end),
+        'start': bucket_start(start, 'hour') if start else None,
+        'end': end
+    }
     # Total page views
-    total_views = Analytics.query.filter_by(event_type='page_view').count()
+    total_views = sum(r[2] for r in rollup_totals('total', event_type='page_view', **rollup_range))
     
     # Section views
-    section_views = db.session.query(
-        Analytics.section,
-        func.count(Analytics.id).label('count')
-    ).filter(
-        Analytics.section.isnot(None)
-    ).group_by(Analytics.section).all()
-    
-    # Top projects
-    top_projects = db.session.query(
-        Analytics.item_name,
-        func.count(Analytics.id).label('count')
-    ).filter(
-        Analytics.event_type == 'project_click',
-        Analytics.item_name.isnot(None)
-    ).group_by(Analytics.item_name).order_by(desc('count')).limit(10).all()
-    
-    # Visitors by country
-    visitors_by_country = db.session.query(
-        Analytics.country,
-        func.count(func.distinct(Analytics.session_id)).label('count')
-    ).filter(
-        Analytics.country.isnot(None),
-        Analytics.country != 'Unknown'
-    ).group_by(Analytics.country).order_by(desc('count')).all()
-    
-    # Visitors by city
-    visitors_by_city = db.session.query(
-        Analytics.city,
-        Analytics.country,
-        func.count(func.distinct(Analytics.session_id)).label('count')
-    ).filter(
-        Analytics.city.isnot(None),
-        Analytics.city != 'Unknown'
-    ).group_by(Analytics.city, Analytics.country).order_by(desc('count')).limit(20).all()
+    section_views = [(r[0], r[2]) for r in rollup_totals('section', **rollup_range)]
+    
+    # Top projects, items and sections: merged daily Space-Saving sketches instead of a GROUP BY over every item.
+    # The sketches are daily, so ranges that are not day-aligned use the exact hourly rollups like the totals.
+    def ranked(dimension, event_type=None):
+        if rollup_range['granularity'] == 'day':
+            return top_items(dimension, event_type=event_type, start=start, end=end, limit=10)
+        return [(r[0], r[2], 0) for r in rollup_totals(dimension, event_type=event_type, limit=10, **rollup_range)]
+    top_projects = ranked('item_name', event_type='project_click')
+    top_clicked = ranked('item_name')
+    top_sections = ranked('section')
+    
+    # Time-on-section percentiles from the merged daily DDSketches of `duration`
+    time_on_section = duration_percentiles('section', start, end)
+    daily_start = bucket_start(start, 'day') if start else None
+    daily_end = bucket_start(end, 'day') if end else None
+    if daily_end is not None and daily_end != end:
+        daily_end += timedelta(days=1)
+    overall_duration = duration_percentiles('total', start, end).get('')
+    
+    # Browser, OS, device and referrer breakdowns (parsed once per distinct string at ingest)
+    breakdowns = {
+        dimension: [{'name': r[0], 'count': r[2]} for r in rollup_totals(dimension, limit=10, **rollup_range)]
+        for dimension in ('browser', 'os', 'device', 'referrer_domain')
+    }
+    
+    # Bot traffic dropped at ingest, by reason
+    filtered_events = [{'reason': r[0], 'count': r[2]} for r in rollup_totals('filtered', **rollup_range)]
+    
+    if exact:
+        total_visitors = db.session.execute(exact_visitors_query(start, end)).scalar()
+        visitors_by_country = db.session.execute(exact_visitors_by_country_query(start, end)).all()
+        visitors_by_city = db.session.execute(exact_visitors_by_city_query(start=start, end=end)).all()
+    else:
+        # Merge the daily HyperLogLog sketches instead of COUNT(DISTINCT session_id)
+        total_visitors = sum(distinct_sessions('total', start, end).values())
+        visitors_by_country = sorted(
+            [(value, count) for (value, _), count in distinct_sessions('country', start, end).items() if value != 'Unknown'],
+            key=lambda c: c[1], reverse=True
+        )
+        visitors_by_city = sorted(
+            [(value, parent or None, count) for (value, parent), count in distinct_sessions('city', start, end).items()
+             if value != 'Unknown'],
+            key=lambda c: c[2], reverse=True
+        )[:20]
     
     # Recent activity (last 24 hours)
-    from datetime import timedelta
-    yesterday = datetime.utcnow() - timedelta(days=1)
-    recent_activity = Analytics.query.filter(
-        Analytics.timestamp >= yesterday
-    ).order_by(desc(Analytics.timestamp)).limit(50).all()
-    
-    # Hourly traffic (last 24 hours)
-    hourly_traffic = db.session.query(
-        func.extract('hour', Analytics.timestamp).label('hour'),
-        func.count(Analytics.id).label('count')
-    ).filter(
-        Analytics.timestamp >= yesterday
-    ).group_by('hour').order_by('hour').all()
+    recent_activity = db.session.execute(recent_activity_query(yesterday)).scalars().all()
+    
+    # Traffic over the range, one zero-filled bucket per minute/hour/day/week
+    traffic = dense_series(granularity, series_start, series_end)
+    
+    # Hourly traffic (last 24 hours): one bucket per hour, so hour-of-day labels are unique
+    hourly_traffic = dense_series('hour', bucket_start(yesterday, 'hour') + timedelta(hours=1), now)
     
     return jsonify({
+        'range': {
+            'from': start.isoformat() if start else None,
+            'to': end.isoformat() if end else None,
+            'granularity': granularity,
+            'daily': {
+                'from': daily_start.isoformat() if daily_start else None,
+                'to': daily_end.isoformat() if daily_end else None
+            }
+        },
         'total_visitors': total_visitors or 0,
         'total_views': total_views or 0,
         'section_views': [{'section': s[0], 'count': s[1]} for s in section_views],
         'top_projects': [{'name': p[0], 'count': p[1]} for p in top_projects],
+        'top_items': [{'name': p[0], 'count': p[1], 'error': p[2]} for p in top_clicked],
+        'top_sections': [{'section': p[0], 'count': p[1], 'error': p[2]} for p in top_sections],
+        'time_on_section': sorted(
+            [dict(percentiles, section=section) for section, percentiles in time_on_section.items()],
+            key=lambda s: s['count'], reverse=True
+        ),
+        'time_on_site': overall_duration,
+        'browsers': breakdowns['browser'],
+        'operating_systems': breakdowns['os'],
+        'devices': breakdowns['device'],
+        'referrer_domains': breakdowns['referrer_domain'],
+        'filtered_events': filtered_events,
         'visitors_by_country': [{'country': c[0], 'count': c[1]} for c in visitors_by_country],
         'visitors_by_city': [{'city': c[0], 'country': c[1], 'count': c[2]} for c in visitors_by_city],
         'recent_activity': [a.to_dict() for a in recent_activity],
-        'hourly_traffic': [{'hour': int(h[0]), 'count': h[1]} for h in hourly_traffic]
+        'traffic': [{'bucket': b.isoformat(), 'count': c} for b, c in traffic],
+        'hourly_traffic': [{'hour': b.hour, 'count': c} for b, c in hourly_traffic],
+        'visitor_counts': 'exact' if exact else {'approximate': True, 'standard_error': analytics_sketches.error_bound()}
+    }), 200
+
+def _range_args():
+    """Parse the from/to query args; raises ValueError on a bad value or an empty range"""
+    start = parse_time_arg(request.args.get('from'))
+    end = parse_time_arg(request.args.get('to'))
+    if start and end and start >= end:
+        raise ValueError('from must be earlier than to')
+    return start, end
+
+@app.route('/api/analytics/sessions', methods=['GET'])
+@jwt_required()
+def get_session_stats():
+    """Visit count, average duration, bounce rate and entry/exit sections for visits started in from/to"""
+    try:
+        start, end = _range_args()
+    except ValueError as e:
+        return jsonify({'message': f'Invalid range: {str(e)}'}), 400
+    
+    summary = session_summary(start, end)
+    summary['entry_sections'] = [{'section': s[0], 'count': s[1]} for s in summary['entry_sections']]
+    summary['exit_sections'] = [{'section': s[0], 'count': s[1]} for s in summary['exit_sections']]
+    return jsonify(summary), 200
+
+@app.route('/api/analytics/funnel', methods=['GET'])
+@jwt_required()
+def get_funnel():
+    """Step conversion for visits started in from/to
+    
+    steps: comma-separated 'event_type' or 'event_type:section' ('*:section'
+    matches any event in a section), e.g. page_view,section_view:projects,project_click
+    """
+    try:
+        steps = parse_steps(request.args.get('steps'))
+        start, end = _range_args()
+    except ValueError as e:
+        return jsonify({'message': f'Invalid funnel: {str(e)}'}), 400
+    
+    results = funnel(steps, start, end)
+    first = results[0][1]
+    return jsonify({
+        'steps': [{
+            'step': step,
+            'visits': visits,
+            'conversion': round(visits / results[i - 1][1], 4) if i and results[i - 1][1] else (1.0 if not i and visits else 0),
+            'overall': round(visits / first, 4) if first else 0
+        } for i, (step, visits) in enumerate(results)]
     }), 200
 
 @app.route('/api/analytics/realtime', methods=['GET'])
 @jwt_required()
 def get_realtime_stats():
-    """Get real-time analytics (last hour)"""
-    from datetime import timedelta
-    one_hour_ago = datetime.utcnow() - timedelta(hours=1)
-    
-    recent_visitors = db.session.query(
-        func.count(func.distinct(Analytics.session_id))
-    ).filter(
-        Analytics.timestamp >= one_hour_ago
-    ).scalar()
-    
-    recent_views = Analytics.query.filter(
-        Analytics.timestamp >= one_hour_ago
-    ).count()
-    
-    recent_locations = db.session.query(
-        Analytics.city,
-        Analytics.country,
-        func.count(func.distinct(Analytics.session_id)).label('count')
-    ).filter(
-        Analytics.timestamp >= one_hour_ago,
-        Analytics.city.isnot(None),
-        Analytics.city != 'Unknown'
-    ).group_by(Analytics.city, Analytics.country).order_by(desc('count')).limit(10).all()
+    """Get real-time analytics (last hour) from the in-memory per-minute window"""
+    snapshot = realtime_window.snapshot()
     
     return jsonify({
-        'visitors_last_hour': recent_visitors or 0,
-        'views_last_hour': recent_views or 0,
-        'recent_locations': [{'city': l[0], 'country': l[1], 'count': l[2]} for l in recent_locations]
+        'visitors_last_hour': snapshot['visitors'],
+        'views_last_hour': snapshot['views'],
+        'recent_locations': [{'city': l[0], 'country': l[1], 'count': l[2]} for l in snapshot['locations']]
     }), 200
 
 # Experience routes
 @app.route('/api/experience', methods=['GET'])
+@conditional('experience')
 def get_experience():
-    experiences = Experience.query.order_by(Experience.order.desc(), Experience.start_date.desc()).all()
-    return jsonify([exp.to_dict() for exp in experiences]), 200
+    return json_response(experience_json()), 200
+
+def experience_json():
+    return fragments_json(
+        Experience, fragment_query(Experience).order_by(Experience.order.desc(), Experience.start_date.desc())
+    )
 
 @app.route('/api/experience/<int:exp_id>', methods=['GET'])
+@conditional('experience')
 def get_experience_item(exp_id):
-    exp = Experience.query.get_or_404(exp_id)
-    return jsonify(exp.to_dict()), 200
+    body = fragment_json(Experience, exp_id)
+    if body is None:
+        abort(404)
+    return json_response(body), 200
 
 @app.route('/api/experience', methods=['POST'])
 @jwt_required()
@@ -901,8 +1302,10 @@ Message:
 @app.route('/api/contact', methods=['GET'])
 @jwt_required()
 def get_contacts():
-    contacts = Contact.query.order_by(Contact.created_at.desc()).all()
-    return jsonify([c.to_dict() for c in contacts]), 200
+    if wants_page(request.args):
+        return list_page(contact_serializer.query(), 'contacts', (Contact.created_at, Contact.id),
+                         contact_serializer.compile())
+    return jsonify(contact_serializer.all(contact_serializer.query().order_by(Contact.created_at.desc()))), 200
 
 @app.route('/api/contact/<int:contact_id>', methods=['GET'])
 @jwt_required()
@@ -938,10 +1341,13 @@ def delete_contact(contact_id):
 @app.route('/api/activity', methods=['GET'])
 @jwt_required()
 def get_activity_logs():
-    """Get activity logs for admin dashboard"""
+    """Get activity logs for admin dashboard (?limit= newest, or cursor pages with ?page_size= / ?cursor=)"""
+    if wants_page(request.args):
+        return list_page(activity_serializer.query(), 'activity', (ActivityLog.timestamp, ActivityLog.id),
+                         activity_serializer.compile())
     limit = request.args.get('limit', 50, type=int)
-    activities = ActivityLog.query.order_by(desc(ActivityLog.timestamp)).limit(limit).all()
-    return jsonify([a.to_dict() for a in activities]), 200
+    activities = activity_serializer.query().order_by(desc(ActivityLog.timestamp)).limit(limit)
+    return jsonify(activity_serializer.all(activities)), 200
 
 @app.route('/api/activity/undo/<int:activity_id>', methods=['POST'])
 @jwt_required()
@@ -1049,12 +1455,16 @@ def get_github_settings():
     return jsonify(settings.to_dict()), 200
 
 @app.route('/api/github/settings/public', methods=['GET'])
+@conditional('github')
 def get_public_github_settings():
     """Get GitHub settings for public frontend (only enabled status)"""
+    return jsonify(public_github_settings_payload()), 200
+
+def public_github_settings_payload():
     settings = GitHubSettings.query.first()
     if not settings or not settings.enabled:
-        return jsonify({'enabled': False}), 200
-    return jsonify({'enabled': settings.enabled}), 200
+        return {'enabled': False}
+    return {'enabled': settings.enabled}
 
 @app.route('/api/github/settings', methods=['PUT'])
 @jwt_required()
@@ -1165,16 +1575,19 @@ def fetch_github_repos():
 @app.route('/api/github/repos/public', methods=['GET'])
 def get_public_github_repos():
     """Get selected GitHub repos for public frontend"""
+    return jsonify(public_github_repos_payload()), 200
+
+def public_github_repos_payload():
     settings = GitHubSettings.query.first()
     
     if not settings:
-        return jsonify({'repos': [], 'error': 'GitHub settings not configured'}), 200
+        return {'repos': [], 'error': 'GitHub settings not configured'}
     
     if not settings.enabled:
-        return jsonify({'repos': [], 'error': 'GitHub section is disabled'}), 200
+        return {'repos': [], 'error': 'GitHub section is disabled'}
     
     if not settings.github_username:
-        return jsonify({'repos': [], 'error': 'GitHub username not configured'}), 200
+        return {'repos': [], 'error': 'GitHub username not configured'}
     
     try:
         # Get selected repos
@@ -1186,7 +1599,7 @@ def get_public_github_repos():
                 selected_repos = []
         
         if not selected_repos:
-            return jsonify({'repos': [], 'error': 'No repositories selected. Please select repositories in admin settings.'}), 200
+            return {'repos': [], 'error': 'No repositories selected. Please select repositories in admin settings.'}
         
         # Fetch fresh data from GitHub
         headers = {}
@@ -1225,7 +1638,7 @@ def get_public_github_repos():
                         'is_private': repo['private']
                     })
             
-            return jsonify({'repos': formatted_repos}), 200
+            return {'repos': formatted_repos}
         else:
             # Log the error
             error_msg = f'GitHub API returned status {response.status_code}'
@@ -1236,61 +1649,112 @@ def get_public_github_repos():
             elif response.status_code == 403:
                 error_msg = 'GitHub API rate limit exceeded or access denied. Please try again later.'
             print(f"GitHub API error: {error_msg}")
-            return jsonify({'repos': [], 'error': error_msg}), 200
+            return {'repos': [], 'error': error_msg}
             
     except requests.exceptions.RequestException as e:
         error_msg = f'Network error: {str(e)}'
         print(f"GitHub API request error: {error_msg}")
-        return jsonify({'repos': [], 'error': error_msg}), 200
+        return {'repos': [], 'error': error_msg}
     except Exception as e:
         # Log error for debugging
         error_msg = str(e)
         print(f"Error fetching GitHub repos: {error_msg}")
         # Return empty on error
-        return jsonify({'repos': [], 'error': error_msg}), 200
+        return {'repos': [], 'error': error_msg}
 
 # Blog routes
 @app.route('/api/blogs', methods=['GET'])
+@conditional('blogs')
 def get_blogs():
-    """Get all published blogs"""
+    """Get all published blogs as cards
+
+    ?fields=title,slug,... picks the card fields (default: Blog.PUBLIC_SUMMARY_FIELDS).
+    The article body and the view count are only served by the single-post endpoints:
+    the list is cached per content version, and counting a view is not a content change.
+    """
     published = request.args.get('published', 'true').lower() == 'true'
     homepage = request.args.get('homepage', 'false').lower() == 'true'
-    
-    query = Blog.query
+    try:
+        fields = blog_fields_arg()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    if wants_page(request.args):
+        # Drafts have no published_at: they sort by creation time
+        return list_page(blogs_query(published, homepage, fields), 'blogs',
+                         (func.coalesce(Blog.published_at, Blog.created_at), Blog.id),
+                         blog_serializer.compile(fields),
+                         key_of=lambda blog: (blog.published_at or blog.created_at, blog.id))
+    return json_response(blogs_json(published, homepage, fields)), 200
+
+def blog_fields_arg(allowed=Blog.PUBLIC_SUMMARY_FIELDS):
+    """Card fields requested with ?fields= (always with id; default: all of `allowed`); raises ValueError on
+    unknown fields"""
+    value = request.args.get('fields', 'summary')
+    if value == 'summary':
+        return allowed
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    single = [name for name in fields if name in Blog.FIELDS and name not in allowed]
+    if single:
+        raise ValueError(f"{', '.join(single)}: only served by /api/blogs/<id> and /api/blogs/slug/<slug>")
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return tuple(dict.fromkeys(['id'] + fields))
+
+def filter_blogs(query, published=True, homepage=False):
     if published:
         query = query.filter(Blog.published == True)
     if homepage:
         query = query.filter(Blog.show_on_homepage == True)
-    
-    blogs = query.order_by(Blog.published_at.desc(), Blog.created_at.desc()).all()
-    return jsonify([blog.to_dict() for blog in blogs]), 200
+    return query
+
+def blogs_query(published=True, homepage=False, fields=Blog.PUBLIC_SUMMARY_FIELDS):
+    """Column tuples of `fields` (then the sort keys) of the matching blogs"""
+    return filter_blogs(blog_serializer.query(fields, extra=('published_at', 'created_at')), published, homepage)
+
+def blogs_json(published=True, homepage=False, fields=Blog.PUBLIC_SUMMARY_FIELDS, order_by=None):
+    """JSON array of blog cards: the stored fragments for the summaries, else the requested columns"""
+    order_by = order_by or (Blog.published_at.desc(), Blog.created_at.desc())
+    if fields in (Blog.SUMMARY_FIELDS, Blog.PUBLIC_SUMMARY_FIELDS):
+        spliced = tuple(name for name in SPLICED_FIELDS[Blog] if name in fields)
+        query = filter_blogs(fragment_query(Blog, spliced), published, homepage).order_by(*order_by)
+        return fragments_json(Blog, query, spliced)
+    return dumpb(blog_serializer.all(blogs_query(published, homepage, fields).order_by(*order_by), fields))
 
 @app.route('/api/blogs/all', methods=['GET'])
 @jwt_required()
 def get_all_blogs():
-    """Get all blogs (including drafts) for admin"""
+    """Get all blogs (including drafts) for admin, as cards like get_blogs (?fields=) plus view counts"""
+    try:
+        fields = blog_fields_arg(Blog.SUMMARY_FIELDS)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    if wants_page(request.args):
+        return list_page(blogs_query(False, False, fields), 'blogs_all', (Blog.created_at, Blog.id),
+                         blog_serializer.compile(fields))
     try:
-        blogs = Blog.query.order_by(Blog.created_at.desc()).all()
-        return jsonify([blog.to_dict() for blog in blogs]), 200
+        return json_response(blogs_json(False, False, fields, order_by=(Blog.created_at.desc(),))), 200
     except Exception as e:
         print(f"Error fetching blogs: {e}")
         return jsonify({'message': f'Error fetching blogs: {str(e)}'}), 500
 
 @app.route('/api/blogs/<int:blog_id>', methods=['GET'])
+@jwt_required(optional=True)
 def get_blog(blog_id):
-    """Get a single blog post"""
-    blog = Blog.query.get_or_404(blog_id)
+    """Get a single blog post, with its content (the admin editor loads posts here without counting a view)"""
+    blog = Blog.query.options(undefer(Blog.content)).get_or_404(blog_id)
     
     # Increment view count
-    blog.views = (blog.views or 0) + 1
-    db.session.commit()
+    if not get_jwt_identity():
+        blog.views = (blog.views or 0) + 1
+        db.session.commit()
     
     return jsonify(blog.to_dict()), 200
 
 @app.route('/api/blogs/slug/<slug>', methods=['GET'])
 def get_blog_by_slug(slug):
-    """Get blog by slug"""
-    blog = Blog.query.filter_by(slug=slug).first_or_404()
+    """Get blog by slug, with its content"""
+    blog = Blog.query.options(undefer(Blog.content)).filter_by(slug=slug).first_or_404()
     
     # Only return if published (unless admin)
     # For now, return all
@@ -1621,6 +2085,102 @@ def mark_notifications_read():
     db.session.commit()
     return jsonify({'message': 'Notifications marked as read'}), 200
 
+
+# Homepage bootstrap: every public section the homepage needs, in one response
+homepage_bootstrap.register_section('about', 'about', about_payload)
+homepage_bootstrap.register_section('projects', 'projects', projects_json)
+homepage_bootstrap.register_section('skills', 'skills', skills_payload)
+homepage_bootstrap.register_section('experience', 'experience', experience_json)
+homepage_bootstrap.register_section('blogs', 'blogs', lambda: blogs_json(published=True, homepage=True))
+homepage_bootstrap.register_section('github_settings', 'github', public_github_settings_payload)
+# Repos come from the GitHub API: cached for a while, and not at all when the fetch failed
+homepage_bootstrap.register_section('github_repos', 'github', public_github_repos_payload,
+                                    ttl=app.config['BOOTSTRAP_GITHUB_REPOS_TTL'],
+                                    cache_if=lambda payload: not payload.get('error'))
+
+@app.route('/api/bootstrap', methods=['GET'])
+def get_bootstrap():
+    """Get the homepage sections in one response (?sections=about,projects,... for a subset)"""
+    requested = [name.strip() for name in request.args.get('sections', '').split(',') if name.strip()]
+    unknown = [name for name in requested if name not in homepage_bootstrap.sections]
+    if unknown:
+        return jsonify({'message': f"Unknown sections: {', '.join(unknown)}",
+                        'sections': list(homepage_bootstrap.sections)}), 400
+
+    body, _ = homepage_bootstrap.assemble(requested or None)
+    etag = homepage_bootstrap.etag(body)
+    encoding = compression.negotiate()
+    if not is_resource_modified(request.environ, etag=f'{etag}-{encoding}' if encoding else etag):
+        response = app.response_class('', status=304)
+    else:
+        # Keyed by the body hash, and dropped with the scopes of the sections it holds
+        key = (homepage_bootstrap.scopes(requested or None), 'bootstrap', etag)
+        response = http_cache.encoded_response(key, body, 'application/json', encoding)
+    response.set_etag(f'{etag}-{encoding}' if encoding else etag)
+    response.headers['Cache-Control'] = http_cache.CACHE_CONTROL
+    return response
+
+# Static snapshot: the public GET responses, exported to STATIC_SNAPSHOT_DIR and rebuilt on content commits
+def bootstrap_snapshot(sections=None):
+    body, errors = homepage_bootstrap.assemble(sections)
+    return None if errors else body
+
+def about_snapshot():
+    about = about_payload()
+    return dumpb(about) if about else None
+
+def github_repos_snapshot():
+    payload = public_github_repos_payload()
+    return None if payload.get('error') else dumpb(payload)
+
+def published_blog_slugs():
+    return [slug for slug, in db.session.query(Blog.slug).filter(Blog.published.is_(True)).order_by(Blog.id)]
+
+def blog_snapshot(slug):
+    blog = Blog.query.options(undefer(Blog.content)).filter_by(slug=slug).first()
+    return dumpb(blog.to_dict()) if blog else None
+
+
+static_snapshot.register('/api/about', 'about', about_snapshot)
+static_snapshot.register('/api/projects', 'projects', projects_json)
+static_snapshot.register('/api/projects/{}', 'projects', lambda project_id: fragment_json(Project, project_id),
+                         keys=lambda: [project_id for project_id, in db.session.query(Project.id)])
+static_snapshot.register('/api/skills', 'skills', lambda: dumpb(skills_payload()))
+static_snapshot.register('/api/experience', 'experience', experience_json)
+static_snapshot.register('/api/experience/{}', 'experience', lambda exp_id: fragment_json(Experience, exp_id),
+                         keys=lambda: [exp_id for exp_id, in db.session.query(Experience.id)])
+static_snapshot.register('/api/blogs', 'blogs', blogs_json)
+static_snapshot.register('/api/blogs?published=true', 'blogs', blogs_json)
+static_snapshot.register('/api/blogs?homepage=true', 'blogs', lambda: blogs_json(homepage=True))
+# Posts count a view per read, so the app keeps answering them; static hosts serve the export-time count
+static_snapshot.register('/api/blogs/slug/{}', 'blogs', blog_snapshot, keys=published_blog_slugs, served=False)
+static_snapshot.register('/api/github/settings/public', 'github', lambda: dumpb(public_github_settings_payload()))
+static_snapshot.register('/api/github/repos/public', 'github', github_repos_snapshot)
+static_snapshot.register('/api/bootstrap', homepage_bootstrap.scopes(), bootstrap_snapshot)
+static_snapshot.register('/api/bootstrap?sections=about,projects,skills', ('about', 'projects', 'skills'),
+                         lambda: bootstrap_snapshot(['about', 'projects', 'skills']))
+http_cache.add_commit_listener(static_snapshot.schedule)
+
+# Bring the snapshot up to date with changes made while the app was down
+if static_snapshot.directory and app.config['STATIC_SNAPSHOT_ON_WRITE']:
+    with app.app_context():
+        try:
+            written, removed = static_snapshot.rebuild()
+            if written or removed:
+                print(f"🗄️  Static snapshot: {len(written)} files written, {len(removed)} removed")
+        except Exception as e:
+            print(f"⚠️  Static snapshot rebuild failed: {e}")
+
+# Cache stats
+@app.route('/api/cache/stats', methods=['GET'])
+@jwt_required()
+def get_cache_stats():
+    """Get hit rates and sizes of the in-process caches"""
+    return jsonify({
+        'responses': response_cache.get_stats(),
+        'locations': location_cache.get_stats()
+    }), 200
+
 # Health check
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -0,0 +1,18 @@
+"""Regenerate the pre-rendered JSON fragments of projects, experience and blogs.
+
+Run after bumping fragments.FRAGMENT_VERSION or changing a serializer. The
+app also renders missing or stale fragments on startup.
+
+Usage:
+    python backfill_fragments.py          # render missing and stale fragments
+    python backfill_fragments.py --all    # re-render every fragment
+"""
+import sys
+
+from app import app
+from fragments import FRAGMENT_VERSION, backfill_fragments
+
+with app.app_context():
+    force = '--all' in sys.argv
+    print(f"🧱 Rendering {'all' if force else 'stale'} content fragments (version {FRAGMENT_VERSION})...")
+    print(f"✅ Rendered {backfill_fragments(force=force)} fragments")
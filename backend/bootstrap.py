@@ -0,0 +1,102 @@
+"""Single-roundtrip homepage bootstrap.
+
+The homepage used to fetch about, projects, skills, experience, homepage
+blogs and the public GitHub settings and repos as separate requests, paying
+TLS, routing and a database connection checkout for each. `/api/bootstrap`
+returns all of them in one JSON object, each key with the same shape as its
+own endpoint.
+
+Each section is serialized and cached on its own in the public response
+cache, keyed by the version of its content scope, so a write invalidates only
+the sections of that scope. Sections that miss the cache are built
+concurrently on a small thread pool, each in its own app context (and so its
+own database session). A failing section is returned as null and reported in
+`errors`, without failing the whole response.
+"""
+import atexit
+import hashlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from http_cache import current_versions, response_cache
+from json_provider import dumpb
+
+Section = namedtuple('Section', 'name scope builder ttl cache_if')
+
+
+class Bootstrap:
+    """Assembles the registered sections into one response body"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.workers = 4
+        self.cache_enabled = True
+        self.sections = {}  # name -> Section, in registration (response) order
+        self._executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = max(1, app.config.get('BOOTSTRAP_WORKERS', 4))
+        self.cache_enabled = app.config.get('RESPONSE_CACHE_ENABLED', True)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bootstrap')
+            atexit.register(self._executor.shutdown, wait=False)
+
+    def register_section(self, name, scope, builder, ttl=None, cache_if=None):
+        """Add a section built by `builder()` (JSON-serializable value or JSON bytes), cached per `scope` version"""
+        self.sections[name] = Section(name, scope, builder, ttl, cache_if)
+
+    def _build(self, section):
+        """Serialized section bytes, built in a fresh app context (runs on a pool thread)"""
+        with self.app.app_context():
+            payload = section.builder()
+            body = payload if isinstance(payload, bytes) else dumpb(payload)  # Builders may return JSON bytes
+            return body, section.cache_if is None or section.cache_if(payload)
+
+    def assemble(self, names=None):
+        """(body bytes, errors) for the requested section names (all when None)"""
+        sections = [self.sections[name] for name in (names or self.sections)]
+        versions = current_versions(sorted({section.scope for section in sections}))
+        parts = {}
+        keys = {}
+        for section in sections:
+            keys[section.name] = ((section.scope,), 'bootstrap:' + section.name,
+                                  (versions.get(section.scope, (0,))[0],))
+            cached = response_cache.get(keys[section.name]) if self.cache_enabled else None
+            if cached is not None:
+                parts[section.name] = cached[0]
+
+        misses = [section for section in sections if section.name not in parts]
+        futures = {section.name: self._executor.submit(self._build, section) for section in misses[1:]}
+        errors = {}
+        for section in misses:
+            try:
+                # The first miss is built on the request thread while the pool builds the others
+                body, cacheable = futures[section.name].result() if section.name in futures else self._build(section)
+            except Exception as e:
+                print(f"Bootstrap section {section.name} failed: {e}")
+                parts[section.name] = b'null'
+                errors[section.name] = str(e)
+                continue
+            parts[section.name] = body
+            if cacheable and self.cache_enabled:
+                response_cache.set(keys[section.name], (body, 'application/json'), ttl=section.ttl, size=len(body))
+
+        members = [b'"%s":%s' % (section.name.encode('utf-8'), parts[section.name]) for section in sections]
+        if errors:
+            members.append(b'"errors":' + dumpb(errors))
+        body = b'{' + b','.join(members) + b'}'
+        return body, errors
+
+    def scopes(self, names=None):
+        """Content scopes of the given sections (all when None)"""
+        return tuple(sorted({self.sections[name].scope for name in (names or self.sections)}))
+
+    @staticmethod
+    def etag(body):
+        return hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+homepage_bootstrap = Bootstrap()
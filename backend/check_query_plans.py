@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Verify that every analytics dashboard query can use an index.
+
+Runs EXPLAIN for each statement in analytics_queries.stats_queries() against
+the configured database (SQLite or Postgres) and exits non-zero if any of them
+reads a whole analytics table: a table scan, or an index scan without a search
+condition (SQLite `SCAN ... USING INDEX`, a Postgres index scan without an
+Index Cond). Only the all-time aggregate in WHOLE_TABLE_QUERIES may read the
+whole table, and then only through an index.
+
+Usage:
+    python check_query_plans.py
+"""
+import re
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db  # noqa: E402
+from analytics_queries import stats_queries  # noqa: E402
+
+CHECKED_TABLES = {'analytics', 'analytics_rollup', 'analytics_sketch', 'analytics_session'}
+_PARTITION_TABLE = re.compile(r'^analytics_p(\d{6}|default)$')
+_SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(.*)$')
+# The all-time exact count reads every event by design; it must still be served from an index
+WHOLE_TABLE_QUERIES = {'exact_visitors'}
+_PG_INDEX_SCANS = ('Index Scan', 'Index Only Scan', 'Bitmap Index Scan')
+
+
+def _checked(table):
+    return table in CHECKED_TABLES or bool(_PARTITION_TABLE.match(table or ''))
+
+
+def _explain_args(conn, statement):
+    compiled = statement.compile(dialect=conn.dialect)
+    params = compiled.construct_params()
+    if compiled.positional:
+        return compiled.string, tuple(params[name] for name in compiled.positiontup)
+    return compiled.string, params
+
+
+def sqlite_full_scans(conn, statement, whole_table=False):
+    sql, params = _explain_args(conn, statement)
+    plan = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+    scans = []
+    for row in plan:
+        detail = row[-1]
+        match = _SQLITE_SCAN.match(detail)
+        # SEARCH uses an index condition; SCAN reads every row, of the table or of an index
+        if match and _checked(match.group(1)) and not (whole_table and 'INDEX' in match.group(2)):
+            scans.append(detail)
+    return scans, [row[-1] for row in plan]
+
+
+def postgres_full_scans(conn, statement, whole_table=False):
+    sql, params = _explain_args(conn, statement)
+    # With seq scans disabled the planner only picks one when no index can serve the query
+    conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    plan = conn.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {sql}', params).scalar()
+    if isinstance(plan, str):
+        import json
+        plan = json.loads(plan)
+    scans, nodes = [], []
+
+    def walk(node):
+        node_type, relation = node['Node Type'], node.get('Relation Name')
+        nodes.append(f"{node_type} {relation or ''}".strip())
+        if node_type == 'Seq Scan' and _checked(relation):
+            scans.append(f"Seq Scan on {relation}")
+        elif (node_type in _PG_INDEX_SCANS and 'Index Cond' not in node and not whole_table
+              and _checked(relation or _index_table(conn, node.get('Index Name')))):
+            # A forced index scan without a condition still reads the whole index
+            scans.append(f"{node_type} without Index Cond on {node.get('Index Name')}")
+        for child in node.get('Plans', []):
+            walk(child)
+
+    walk(plan[0]['Plan'])
+    return scans, nodes
+
+
+def _index_table(conn, index_name):
+    # Bitmap Index Scan nodes name only the index
+    return conn.exec_driver_sql(
+        'SELECT indrelid::regclass::text FROM pg_index WHERE indexrelid = %(name)s::regclass', {'name': index_name}
+    ).scalar()
+
+
+def main():
+    failures = 0
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        if dialect not in ('sqlite', 'postgresql'):
+            print(f"⚠️  Query plan check is not supported for {dialect}")
+            return 0
+        check = sqlite_full_scans if dialect == 'sqlite' else postgres_full_scans
+        print(f"🔍 Checking analytics query plans ({dialect})")
+        for name, statement in stats_queries():
+            with db.engine.connect() as conn:
+                with conn.begin():
+                    scans, plan = check(conn, statement, whole_table=name in WHOLE_TABLE_QUERIES)
+            if scans:
+                failures += 1
+                print(f"✗ {name}: full scan ({'; '.join(scans)})")
+                for step in plan:
+                    print(f"    {step}")
+            else:
+                print(f"✓ {name}")
+
+    if failures:
+        print(f"\n{failures} quer{'y' if failures == 1 else 'ies'} fell back to a full scan")
+        return 1
+    print("\nAll analytics queries use an index")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""Content-Encoding negotiation and compression of responses.
+
+The public content responses are cached as serialized bytes per content
+version (http_cache). Their gzip and Brotli variants are cached the same
+way. Each variant is compressed once, the first time a client asks for that
+encoding, and then served as stored bytes. Every variant has its own ETag.
+
+Large responses that are not cached (e.g. single blog posts, whose view count
+changes on every read) are compressed on the fly above COMPRESSION_MIN_SIZE.
+Exports are compressed as they stream.
+
+Brotli is used when the `brotli` package is installed; gzip always works.
+"""
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip is offered
+    brotli = None
+
+# Server preference when the client accepts several encodings equally
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+# Only these are worth compressing; images and archives are compressed already
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+
+class Compression:
+    """Negotiates an encoding per request and compresses bodies and streams"""
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.gzip_level = 6
+        self.brotli_quality = 5  # Streams and on-the-fly bodies; cached variants use the highest quality
+        self.min_size = 1024
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('COMPRESSION_ENABLED', True)
+        self.gzip_level = app.config.get('COMPRESSION_GZIP_LEVEL', 6)
+        self.brotli_quality = app.config.get('COMPRESSION_BROTLI_QUALITY', 5)
+        self.min_size = app.config.get('COMPRESSION_MIN_SIZE', 1024)
+        app.after_request(self._compress_response)
+
+    def negotiate(self):
+        """Best encoding the current request accepts ('br' or 'gzip'), or None for identity"""
+        if not self.enabled:
+            return None
+        return request.accept_encodings.best_match(ENCODINGS)
+
+    def compress(self, body, encoding, cached=False):
+        """Compressed bytes; `cached` variants are computed once, so they get the best ratio"""
+        if encoding == 'br':
+            return brotli.compress(body, quality=11 if cached else self.brotli_quality)
+        return zlib.compress(body, 9 if cached else self.gzip_level, wbits=31)  # wbits=31: gzip framing
+
+    def stream(self, chunks, encoding):
+        """Compress a stream of text chunks as they are produced"""
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            compress, finish = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+            compress, finish = compressor.compress, compressor.flush
+        for chunk in chunks:
+            data = compress(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield finish()
+
+    def _compress_response(self, response):
+        """after_request: compress large uncompressed responses that no cached variant covers"""
+        response.vary.add('Accept-Encoding')
+        if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+                or 'Content-Encoding' in response.headers
+                or not response.mimetype.startswith(COMPRESSIBLE_TYPES)):
+            return response
+        encoding = self.negotiate()
+        if encoding is None or (response.content_length or 0) < self.min_size:
+            return response
+        response.set_data(self.compress(response.get_data(), encoding))
+        response.headers['Content-Encoding'] = encoding
+        if response.get_etag()[0]:
+            etag, weak = response.get_etag()
+            response.set_etag(f'{etag}-{encoding}', weak)
+        return response
+
+
+compression = Compression()
@@ -61,3 +61,85 @@ class Config:
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or os.environ.get('MAIL_USERNAME')
     ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL') or os.environ.get('MAIL_USERNAME')
 
+    # Public response cache: serialized bytes of the public content GETs, keyed by content version.
+    # Other workers' writes are picked up within RESPONSE_CACHE_VERSION_TTL seconds.
+    RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', 'true').lower() in ['true', 'on', '1']
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES') or 1024)
+    RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES') or 32 * 1024 * 1024)
+    RESPONSE_CACHE_VERSION_TTL = float(os.environ.get('RESPONSE_CACHE_VERSION_TTL') or 2.0)  # seconds
+
+    # JSON responses are encoded with orjson when it is installed; false keeps Flask's stdlib provider
+    JSON_FAST_PROVIDER = os.environ.get('JSON_FAST_PROVIDER', 'true').lower() in ['true', 'on', '1']
+
+    # Response compression (Accept-Encoding: br, gzip). Cached public responses are compressed once per
+    # content version; other responses from COMPRESSION_MIN_SIZE bytes are compressed per request.
+    # Brotli needs the `brotli` package, otherwise only gzip is offered.
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() in ['true', 'on', '1']
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE') or 1024)
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL') or 6)
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY') or 5)
+
+    # Cursor pagination of the list endpoints (opt-in with ?page_size= or ?cursor=)
+    PAGINATION_DEFAULT_PAGE_SIZE = int(os.environ.get('PAGINATION_DEFAULT_PAGE_SIZE') or 20)
+    PAGINATION_MAX_PAGE_SIZE = int(os.environ.get('PAGINATION_MAX_PAGE_SIZE') or 100)
+
+    # Homepage bootstrap (/api/bootstrap): sections missing from the cache are built on this many threads.
+    # GitHub repos come from the GitHub API and are cached for BOOTSTRAP_GITHUB_REPOS_TTL seconds.
+    BOOTSTRAP_WORKERS = int(os.environ.get('BOOTSTRAP_WORKERS') or 4)
+    BOOTSTRAP_GITHUB_REPOS_TTL = float(os.environ.get('BOOTSTRAP_GITHUB_REPOS_TTL') or 600)
+
+    # Static snapshot: the public GET responses as JSON files (with .gz/.br variants and manifest.json) in
+    # STATIC_SNAPSHOT_DIR, for a static host or CDN. Empty disables it. Content commits rebuild the affected
+    # files in the background unless STATIC_SNAPSHOT_ON_WRITE=false (then run `python export_static.py`).
+    # STATIC_SNAPSHOT_SERVE=true also answers those GETs from the files.
+    STATIC_SNAPSHOT_DIR = os.environ.get('STATIC_SNAPSHOT_DIR', '')
+    STATIC_SNAPSHOT_ON_WRITE = os.environ.get('STATIC_SNAPSHOT_ON_WRITE', 'true').lower() in ['true', 'on', '1']
+    STATIC_SNAPSHOT_SERVE = os.environ.get('STATIC_SNAPSHOT_SERVE', 'false').lower() in ['true', 'on', '1']
+
+    # Analytics ingest buffer
+    # Events are queued in memory and written in batches by a background worker.
+    # Set ANALYTICS_BUFFER_ENABLED=false to write each event synchronously.
+    ANALYTICS_BUFFER_ENABLED = os.environ.get('ANALYTICS_BUFFER_ENABLED', 'true').lower() in ['true', 'on', '1']
+    ANALYTICS_QUEUE_SIZE = int(os.environ.get('ANALYTICS_QUEUE_SIZE') or 10000)
+    ANALYTICS_BATCH_SIZE = int(os.environ.get('ANALYTICS_BATCH_SIZE') or 500)
+    ANALYTICS_FLUSH_INTERVAL = float(os.environ.get('ANALYTICS_FLUSH_INTERVAL') or 2.0)  # seconds
+    ANALYTICS_ENQUEUE_TIMEOUT = float(os.environ.get('ANALYTICS_ENQUEUE_TIMEOUT') or 0.05)  # seconds
+    ANALYTICS_MAX_BATCH_EVENTS = int(os.environ.get('ANALYTICS_MAX_BATCH_EVENTS') or 100)  # per /track/batch request
+    # Drop bot traffic before enrichment: known crawler/monitor User-Agents, missing User-Agents and
+    # sessions sending more events per minute than a person could. Extra patterns are comma-separated regexes.
+    ANALYTICS_BOT_FILTER = os.environ.get('ANALYTICS_BOT_FILTER', 'true').lower() in ['true', 'on', '1']
+    ANALYTICS_BOT_MAX_EVENTS_PER_MINUTE = int(os.environ.get('ANALYTICS_BOT_MAX_EVENTS_PER_MINUTE') or 120)
+    ANALYTICS_BOT_EXTRA_PATTERNS = os.environ.get('ANALYTICS_BOT_EXTRA_PATTERNS') or ''
+    # Sample events under load (queue above a fraction of its capacity or slow flushes). Kept events carry a
+    # weight so rollups stay unbiased; sheddable event types are sampled, then dropped, before page views.
+    ANALYTICS_SAMPLING = os.environ.get('ANALYTICS_SAMPLING', 'true').lower() in ['true', 'on', '1']
+    ANALYTICS_SAMPLING_QUEUE_THRESHOLD = float(os.environ.get('ANALYTICS_SAMPLING_QUEUE_THRESHOLD') or 0.5)
+    ANALYTICS_SAMPLING_LATENCY_MS = float(os.environ.get('ANALYTICS_SAMPLING_LATENCY_MS') or 1000)
+    ANALYTICS_SAMPLING_MAX_WEIGHT = int(os.environ.get('ANALYTICS_SAMPLING_MAX_WEIGHT') or 10)  # lowest rate 1/10
+    ANALYTICS_SHEDDABLE_EVENTS = os.environ.get('ANALYTICS_SHEDDABLE_EVENTS') or 'section_view,time_spent,link_click'
+    # Target standard error of the HyperLogLog distinct-visitor sketches (0.02 = 2%)
+    ANALYTICS_HLL_ERROR = float(os.environ.get('ANALYTICS_HLL_ERROR') or 0.02)
+    # Counters per daily Space-Saving top-K sketch (items/sections) and the relative error of the
+    # daily DDSketch duration percentiles (0.01 = 1%)
+    ANALYTICS_TOPK_CAPACITY = int(os.environ.get('ANALYTICS_TOPK_CAPACITY') or 100)
+    ANALYTICS_DURATION_ACCURACY = float(os.environ.get('ANALYTICS_DURATION_ACCURACY') or 0.01)
+    # Monthly partitions of raw events: months kept in the hot SQLite table, Postgres partitions created ahead
+    ANALYTICS_HOT_MONTHS = int(os.environ.get('ANALYTICS_HOT_MONTHS') or 2)
+    ANALYTICS_PARTITIONS_AHEAD = int(os.environ.get('ANALYTICS_PARTITIONS_AHEAD') or 2)
+    # Raw events older than this many months are archived and dropped by analytics_maintenance.py (0 = keep all)
+    ANALYTICS_RETENTION_MONTHS = int(os.environ.get('ANALYTICS_RETENTION_MONTHS') or 0)
+    ANALYTICS_ARCHIVE_DIR = os.environ.get('ANALYTICS_ARCHIVE_DIR') or os.path.join(_base_dir, 'instance', 'archive')
+    # Per-minute traffic rollups are pruned after this many days by analytics_maintenance.py
+    ANALYTICS_MINUTE_ROLLUP_DAYS = int(os.environ.get('ANALYTICS_MINUTE_ROLLUP_DAYS') or 7)
+
+    # Offline GeoIP database (CSV of start_ip,end_ip,country,city; may be gzipped)
+    GEOIP_DB_PATH = os.environ.get('GEOIP_DB_PATH') or os.path.join(_base_dir, 'instance', 'geoip.csv')
+    GEOIP_RELOAD_INTERVAL = int(os.environ.get('GEOIP_RELOAD_INTERVAL') or 300)  # seconds between file checks (ingest worker)
+    # Fall back to the ipapi.co web service when no local database is loaded. Off by default: the call blocks
+    # the tracking request for up to 2 seconds per uncached address
+    GEOIP_REMOTE_FALLBACK = os.environ.get('GEOIP_REMOTE_FALLBACK', 'false').lower() in ['true', 'on', '1']
+    # Per-IP location cache in front of the resolver; "Unknown" results expire sooner
+    GEOIP_CACHE_SIZE = int(os.environ.get('GEOIP_CACHE_SIZE') or 10000)
+    GEOIP_CACHE_TTL = int(os.environ.get('GEOIP_CACHE_TTL') or 86400)  # seconds
+    GEOIP_NEGATIVE_CACHE_TTL = int(os.environ.get('GEOIP_NEGATIVE_CACHE_TTL') or 600)  # seconds
+
@@ -0,0 +1,27 @@
+"""Export the public API responses to STATIC_SNAPSHOT_DIR.
+
+The app keeps the snapshot current after admin writes; run this for the first
+export, after a deploy that changed a response shape, or to refresh the GitHub
+repos. Only files whose content changed are rewritten.
+
+Usage:
+    python export_static.py           # write changed files, remove deleted ones
+    python export_static.py --full    # rewrite every file
+"""
+import sys
+
+from app import app
+from static_snapshot import static_snapshot
+
+with app.app_context():
+    if not static_snapshot.directory:
+        print("❌ STATIC_SNAPSHOT_DIR is not set")
+        sys.exit(1)
+    full = '--full' in sys.argv
+    print(f"🗄️  Exporting {'all' if full else 'changed'} public API responses to {static_snapshot.directory}...")
+    written, removed = static_snapshot.rebuild(force=full)
+    for path in written:
+        print(f"   ✏️  {path}")
+    for path in removed:
+        print(f"   🗑️  {path}")
+    print(f"✅ {len(written)} files written, {len(removed)} removed, {len(static_snapshot.manifest)} in manifest")
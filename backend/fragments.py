@@ -0,0 +1,152 @@
+"""Pre-rendered JSON fragments stored on content rows.
+
+Projects, experience entries and blogs are read far more often than they are
+written, and each read produced the same JSON from the same row. Each of
+these rows now carries its serialized list form in `cached_json`. The form is
+written by mapper events whenever the row is inserted (including an undo
+restore) or its content changes. Public list reads select only the fragments
+and join them into the response body: no ORM objects, no per-field work.
+
+`cached_json_version` records FRAGMENT_VERSION at render time. Bump
+FRAGMENT_VERSION whenever a serializer's output changes (a new column, a
+renamed field). Stale or missing fragments are rendered on the fly until
+`python backfill_fragments.py` (also run at startup) regenerates them.
+
+Blog view counts (and the updated_at they bump) change on every read and are
+not content changes, so they are kept out of the fragment and spliced in at
+read time.
+"""
+from sqlalchemy import bindparam, event, inspect, or_, update
+
+from models import db, Blog, Experience, Project
+from http_cache import IGNORED_CHANGES
+from json_provider import dumpb
+from serializers import blog_serializer, experience_serializer, project_serializer
+
+FRAGMENT_VERSION = 1
+
+FRAGMENT_SERIALIZERS = {
+    Project: project_serializer,
+    Experience: experience_serializer,
+    Blog: blog_serializer,
+}
+# Columns left out of the fragment and added from the row at read time
+SPLICED_FIELDS = {
+    Blog: ('views', 'updated_at'),
+}
+
+
+def fragment_fields(model):
+    spliced = SPLICED_FIELDS.get(model, ())
+    return tuple(name for name in FRAGMENT_SERIALIZERS[model].fields if name not in spliced)
+
+
+def render(obj):
+    """Fragment bytes of a model instance"""
+    model = type(obj)
+    fields = fragment_fields(model)
+    return dumpb(FRAGMENT_SERIALIZERS[model].compile(fields)(tuple(getattr(obj, name) for name in fields)))
+
+
+def _fragment_update(table, **values):
+    # Setting onupdate columns (updated_at) to themselves keeps storing a fragment from bumping them
+    unchanged = {column.name: column for column in table.c if column.onupdate is not None}
+    return update(table).values(cached_json_version=FRAGMENT_VERSION, **unchanged, **values)
+
+
+def _store(connection, model, row_id, fragment):
+    table = model.__table__
+    connection.execute(_fragment_update(table, cached_json=fragment.decode('utf-8')).where(table.c.id == row_id))
+
+
+def _after_insert(mapper, connection, target):
+    _store(connection, type(target), target.id, render(target))
+
+
+def _after_update(mapper, connection, target):
+    ignored = IGNORED_CHANGES.get(type(target), ())
+    state = inspect(target)
+    if any(attr.history.has_changes() for attr in state.attrs
+           if attr.key not in ignored and attr.key not in ('cached_json', 'cached_json_version')):
+        _store(connection, type(target), target.id, render(target))
+
+
+def fragment_query(model, spliced=None):
+    """Query of (id, cached_json, cached_json_version, *spliced columns); add filters and ordering
+
+    `spliced` picks which of the model's SPLICED_FIELDS are added (default: all of them).
+    """
+    spliced = SPLICED_FIELDS.get(model, ()) if spliced is None else spliced
+    return db.session.query(model.id, model.cached_json, model.cached_json_version,
+                            *(getattr(model, name) for name in spliced))
+
+
+def fragments_json(model, query, spliced=None):
+    """JSON array bytes of the fragments of a fragment_query (with the same `spliced`), rendering stale ones
+    from their columns"""
+    rows = query.all()
+    stale = [row[0] for row in rows if row[2] != FRAGMENT_VERSION or not row[1]]
+    rendered = {}
+    if stale:
+        serializer = FRAGMENT_SERIALIZERS[model]
+        fields = fragment_fields(model)
+        serialize = serializer.compile(fields)
+        for row in serializer.query(fields).filter(model.id.in_(stale)):
+            rendered[row[0]] = dumpb(serialize(row))
+
+    spliced = SPLICED_FIELDS.get(model, ()) if spliced is None else spliced
+    serialize_spliced = FRAGMENT_SERIALIZERS[model].compile(spliced) if spliced else None
+    parts = []
+    for row in rows:
+        fragment = rendered.get(row[0]) or row[1].encode('utf-8')
+        if spliced:
+            # '{...}' + '{"views":12,...}' -> '{...,"views":12,...}'
+            fragment = fragment[:-1] + b',' + dumpb(serialize_spliced(row[3:]))[1:]
+        parts.append(fragment)
+    return b'[' + b','.join(parts) + b']'
+
+
+def fragment_json(model, row_id):
+    """JSON object bytes of one row, or None when there is no such row"""
+    body = fragments_json(model, fragment_query(model).filter(model.id == row_id))
+    return body[1:-1] or None
+
+
+def backfill_fragments(chunk_size=500, force=False):
+    """Render missing or stale fragments (all of them with force); returns rows updated"""
+    total = 0
+    for model, serializer in FRAGMENT_SERIALIZERS.items():
+        fields = fragment_fields(model)
+        serialize = serializer.compile(fields)
+        table = model.__table__
+        last_id = 0
+        while True:
+            query = serializer.query(fields).filter(model.id > last_id)
+            if not force:
+                query = query.filter(_stale(model))
+            rows = query.order_by(model.id).limit(chunk_size).all()
+            if not rows:
+                break
+            db.session.execute(_fragment_update(table, cached_json=bindparam('fragment')).where(
+                table.c.id == bindparam('row_id')
+            ), [{'row_id': row[0], 'fragment': dumpb(serialize(row)).decode('utf-8')} for row in rows])
+            db.session.commit()
+            total += len(rows)
+            last_id = rows[-1][0]
+    return total
+
+
+def _stale(model):
+    return or_(model.cached_json_version.is_(None), model.cached_json_version != FRAGMENT_VERSION)
+
+
+def stale_fragments():
+    """Whether any row lacks a current fragment"""
+    return any(db.session.query(model.id).filter(_stale(model)).first() for model in FRAGMENT_SERIALIZERS)
+
+
+def init_app(app):
+    for model in FRAGMENT_SERIALIZERS:
+        for name, listener in (('after_insert', _after_insert), ('after_update', _after_update)):
+            if not event.contains(model, name, listener):
+                event.listen(model, name, listener)
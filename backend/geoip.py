@@ -0,0 +1,172 @@
+"""Offline IP geolocation from a local IP-range database.
+
+The database is a CSV file (optionally gzipped) with one range per line:
+
+    start_ip,end_ip,country,city
+
+Addresses may be written in dotted/colon notation or as integers, and both
+IPv4 and IPv6 ranges can live in the same file. Lines starting with '#' and a
+header row are ignored. Ranges are loaded into sorted, array-backed indexes
+(one per address family) and resolved with a binary search.
+
+Changed files are picked up by `check_for_update`, an ingest periodic task,
+so a reload never runs inside a tracking request.
+"""
+import bisect
+import csv
+import gzip
+import io
+import ipaddress
+import os
+import threading
+import time
+from array import array
+
+UNKNOWN = {'country': 'Unknown', 'city': 'Unknown'}
+
+
+def _parse_ip(value):
+    value = value.strip()
+    if value.isdigit():
+        number = int(value)
+        return (4 if number <= 0xFFFFFFFF else 6), number
+    ip = ipaddress.ip_address(value)
+    return ip.version, int(ip)
+
+
+class _GeoIndex:
+    """Immutable interval index for one loaded database file"""
+
+    def __init__(self):
+        # IPv4 fits in unsigned 64-bit arrays; IPv6 needs Python ints
+        self.v4_starts = array('Q')
+        self.v4_ends = array('Q')
+        self.v4_locs = array('I')
+        self.v6_starts = []
+        self.v6_ends = []
+        self.v6_locs = array('I')
+        self.locations = []
+
+    def __len__(self):
+        return len(self.v4_starts) + len(self.v6_starts)
+
+    @classmethod
+    def from_rows(cls, rows):
+        index = cls()
+        loc_ids = {}
+        v4, v6 = [], []
+        for row in rows:
+            if len(row) < 3 or not row[0] or row[0].lstrip().startswith('#'):
+                continue
+            try:
+                start_version, start = _parse_ip(row[0])
+                _, end = _parse_ip(row[1])
+            except ValueError:
+                continue  # Header row or malformed line
+            country = row[2].strip() or 'Unknown'
+            city = row[3].strip() if len(row) > 3 and row[3].strip() else 'Unknown'
+            loc = loc_ids.setdefault((country, city), len(loc_ids))
+            (v4 if start_version == 4 else v6).append((start, end, loc))
+
+        index.locations = [{'country': c, 'city': t} for (c, t) in loc_ids]
+        for start, end, loc in sorted(v4):
+            index.v4_starts.append(start)
+            index.v4_ends.append(end)
+            index.v4_locs.append(loc)
+        for start, end, loc in sorted(v6):
+            index.v6_starts.append(start)
+            index.v6_ends.append(end)
+            index.v6_locs.append(loc)
+        return index
+
+    def lookup(self, version, number):
+        if version == 4:
+            starts, ends, locs = self.v4_starts, self.v4_ends, self.v4_locs
+        else:
+            starts, ends, locs = self.v6_starts, self.v6_ends, self.v6_locs
+        i = bisect.bisect_right(starts, number) - 1
+        if i >= 0 and number <= ends[i]:
+            return self.locations[locs[i]]
+        return None
+
+
+class GeoIPResolver:
+    """Resolves IP addresses against a local range database, reloading on change"""
+
+    def __init__(self, path=None, reload_interval=300):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._index = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._reload_listeners = []
+
+    def init_app(self, app):
+        self.path = app.config.get('GEOIP_DB_PATH')
+        self.reload_interval = app.config.get('GEOIP_RELOAD_INTERVAL', 300)
+        self.reload()
+
+    def add_reload_listener(self, listener):
+        """Register a callable() run after every successful reload (e.g. to drop cached lookups)"""
+        self._reload_listeners.append(listener)
+
+    @property
+    def loaded(self):
+        return self._index is not None
+
+    def reload(self):
+        """(Re)load the database file; the previous index stays live until the swap"""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        with self._lock:
+            mtime = os.path.getmtime(self.path)
+            opener = gzip.open if self.path.endswith('.gz') else open
+            with opener(self.path, 'rb') as raw:
+                reader = csv.reader(io.TextIOWrapper(raw, encoding='utf-8', errors='replace'))
+                index = _GeoIndex.from_rows(reader)
+            self._index = index
+            self._mtime = mtime
+            self._checked_at = time.monotonic()
+        print(f"🌍 GeoIP database loaded: {len(index)} ranges from {self.path}")
+        for listener in self._reload_listeners:
+            listener()
+        return True
+
+    def check_for_update(self, session=None):
+        """Ingest periodic task: reload a new or changed database file, checking every reload_interval"""
+        now = time.monotonic()
+        if not self.path or now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        try:
+            if os.path.exists(self.path) and os.path.getmtime(self.path) != self._mtime:
+                self.reload()
+        except Exception as e:
+            print(f"⚠️  GeoIP reload failed: {e}")
+
+    def lookup(self, ip_address):
+        """Return {'country', 'city'} for an address, or None if not covered"""
+        index = self._index
+        if index is None:
+            return None
+        try:
+            ip = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return None
+        if ip.version == 6 and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        return index.lookup(ip.version, int(ip))
+
+    def get_stats(self):
+        index = self._index
+        return {
+            'loaded': index is not None,
+            'path': self.path,
+            'ipv4_ranges': len(index.v4_starts) if index else 0,
+            'ipv6_ranges': len(index.v6_starts) if index else 0,
+            'locations': len(index.locations) if index else 0,
+        }
+
+
+geoip_resolver = GeoIPResolver()
@@ -0,0 +1,225 @@
+"""Conditional GET support for the public content endpoints.
+
+Public content changes a few times a month, but every page load used to
+rebuild and resend the full JSON body. Each content scope has a version
+counter in ContentVersion. A `before_flush` hook bumps it whenever a row of
+that scope is created, updated or deleted, whether by a CRUD handler or an
+undo. `@conditional(scope, ...)` derives a strong ETag and Last-Modified from
+those counters with a single primary-key lookup, without loading any content
+rows. It answers `304 Not Modified` when the client already has that version.
+
+Responses are also kept in an in-process cache of their serialized bytes,
+keyed by path, query args and scope versions. A write in another worker bumps
+the version, so a stale entry is never served. Versions are memoized for
+RESPONSE_CACHE_VERSION_TTL seconds, so repeat reads skip the database
+altogether. A commit in this process drops the entries and memoized versions
+of exactly the scopes it changed.
+
+Compressed variants (gzip, Brotli) live in the same cache, next to the bytes
+they were compressed from. Each is computed once per content version, when a
+client first accepts that encoding, and has its own ETag.
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, make_response, request
+from sqlalchemy import event, inspect, insert, select, update
+from werkzeug.http import is_resource_modified
+
+from models import db, About, Blog, ContentVersion, Experience, GitHubSettings, Project, Skill
+from cache import LRUCache
+from compression import compression
+
+CONTENT_SCOPES = {
+    About: 'about',
+    Project: 'projects',
+    Skill: 'skills',
+    Experience: 'experience',
+    Blog: 'blogs',
+    GitHubSettings: 'github',
+}
+# Columns whose changes alone do not make a new content version (blog view counts change on every read, so
+# they are left out of the cached blog lists; see Blog.PUBLIC_SUMMARY_FIELDS)
+IGNORED_CHANGES = {
+    Blog: frozenset(('views', 'updated_at')),
+}
+CACHE_CONTROL = 'public, no-cache'  # Browsers keep the body but revalidate it on every use
+
+# (scopes, full path, versions) -> (body bytes, mimetype), and (..., encoding) -> compressed bytes; sized by init_app
+response_cache = LRUCache(maxsize=1024, maxbytes=32 * 1024 * 1024)
+# scope -> (version, updated_at), briefly memoized
+_versions = LRUCache(maxsize=64, default_ttl=2.0)
+# Called with the set of changed scopes after each commit that changed content
+_commit_listeners = []
+
+
+def _is_content_change(obj):
+    ignored = IGNORED_CHANGES.get(type(obj), ())
+    state = inspect(obj)
+    return any(attr.history.has_changes() for attr in state.attrs if attr.key not in ignored)
+
+
+def changed_scopes(session):
+    """Content scopes touched by the pending changes of a session"""
+    scopes = set()
+    for obj in session.new | session.deleted:
+        if type(obj) in CONTENT_SCOPES:
+            scopes.add(CONTENT_SCOPES[type(obj)])
+    for obj in session.dirty:
+        if type(obj) in CONTENT_SCOPES and _is_content_change(obj):
+            scopes.add(CONTENT_SCOPES[type(obj)])
+    return scopes
+
+
+def bump_versions(conn, scopes, now=None):
+    """Increment the version of each scope, creating its row on first use"""
+    table = ContentVersion.__table__
+    now = now or datetime.utcnow()
+    for scope in sorted(scopes):
+        bumped = conn.execute(
+            update(table).where(table.c.scope == scope).values(version=table.c.version + 1, updated_at=now)
+        ).rowcount
+        if not bumped:
+            conn.execute(insert(table).values(scope=scope, version=1, updated_at=now))
+
+
+def _before_flush(session, flush_context, instances):
+    scopes = changed_scopes(session)
+    if scopes:
+        # Same transaction as the content change, so the version can never run ahead of the data
+        bump_versions(session.connection(), scopes)
+        session.info.setdefault('content_scopes', set()).update(scopes)
+
+
+def invalidate(scopes):
+    """Drop the cached responses and memoized versions of the given scopes; returns responses dropped"""
+    scopes = set(scopes)
+    for scope in scopes:
+        _versions.delete(scope)
+    return response_cache.delete_matching(lambda key: not scopes.isdisjoint(key[0]))
+
+
+def add_commit_listener(listener):
+    """Call `listener(scopes)` after every commit that changed content in this process"""
+    if listener not in _commit_listeners:
+        _commit_listeners.append(listener)
+
+
+def _after_commit(session):
+    scopes = session.info.pop('content_scopes', None)
+    if scopes:
+        invalidate(scopes)
+        for listener in _commit_listeners:
+            listener(scopes)
+
+
+def _after_rollback(session):
+    session.info.pop('content_scopes', None)
+
+
+def ensure_versions():
+    """Create the version row of every scope, so concurrent first writes only ever UPDATE"""
+    table = ContentVersion.__table__
+    existing = set(db.session.execute(select(table.c.scope)).scalars())
+    missing = [scope for scope in CONTENT_SCOPES.values() if scope not in existing]
+    if missing:
+        now = datetime.utcnow()
+        db.session.execute(insert(table), [{'scope': scope, 'version': 0, 'updated_at': now} for scope in missing])
+        db.session.commit()
+
+
+def init_app(app):
+    response_cache.maxsize = app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 1024)
+    response_cache.maxbytes = app.config.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+    _versions.default_ttl = app.config.get('RESPONSE_CACHE_VERSION_TTL', 2.0)
+    for name, listener in (('before_flush', _before_flush), ('after_commit', _after_commit),
+                           ('after_rollback', _after_rollback)):
+        if not event.contains(db.session, name, listener):
+            event.listen(db.session, name, listener)
+
+
+def current_versions(scopes):
+    """{scope: (version, updated_at)} for the given scopes, memoized for a short TTL"""
+    versions = {}
+    missing = []
+    for scope in scopes:
+        cached = _versions.get(scope)
+        if cached is None:
+            missing.append(scope)
+        else:
+            versions[scope] = cached
+    if missing:
+        table = ContentVersion.__table__
+        rows = db.session.execute(
+            select(table.c.scope, table.c.version, table.c.updated_at).where(table.c.scope.in_(missing))
+        )
+        for scope, version, updated_at in rows:
+            versions[scope] = (version, updated_at)
+            _versions.set(scope, (version, updated_at))
+    return versions
+
+
+def validators(scopes, versions=None):
+    """(etag, last_modified) of the current request's representation"""
+    versions = current_versions(scopes) if versions is None else versions
+    # The same path with other query args (e.g. ?homepage=true) is a different representation
+    key = '|'.join([request.full_path] + [f'{scope}:{versions.get(scope, (0, None))[0]}' for scope in scopes])
+    etag = hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest()
+    modified = [updated_at for _, updated_at in versions.values() if updated_at]
+    return etag, max(modified).replace(microsecond=0) if modified else None
+
+
+def encoded_body(key, body, encoding):
+    """`body` in the negotiated encoding, compressed once per cache key"""
+    if encoding is None:
+        return body
+    if not current_app.config.get('RESPONSE_CACHE_ENABLED', True):
+        return compression.compress(body, encoding)
+    variant_key = key + (encoding,)
+    data = response_cache.get(variant_key)
+    if data is None:
+        data = compression.compress(body, encoding, cached=True)
+        response_cache.set(variant_key, data, size=len(data))
+    return data
+
+
+def encoded_response(key, body, mimetype, encoding):
+    response = current_app.response_class(encoded_body(key, body, encoding), mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def conditional(*scopes):
+    """Serve a public GET with ETag/Last-Modified: 304 when the client's copy is current, else cached bytes"""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            versions = current_versions(scopes)
+            etag, last_modified = validators(scopes, versions)
+            encoding = compression.negotiate()
+            if encoding:
+                etag = f'{etag}-{encoding}'  # Each encoding is a different representation
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = make_response('', 304)
+            else:
+                key = (scopes, request.full_path, tuple(versions.get(scope, (0,))[0] for scope in scopes))
+                cached = response_cache.get(key) if current_app.config.get('RESPONSE_CACHE_ENABLED', True) else None
+                if cached is not None:
+                    body, mimetype = cached
+                else:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    body, mimetype = response.get_data(), response.mimetype
+                    if current_app.config.get('RESPONSE_CACHE_ENABLED', True):
+                        response_cache.set(key, (body, mimetype), size=len(body))
+                response = encoded_response(key, body, mimetype, encoding)
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            response.headers['Cache-Control'] = CACHE_CONTROL
+            return response
+        return wrapped
+    return decorator
@@ -34,8 +34,10 @@ class Project(db.Model):
     live_url = db.Column(db.String(500))
     image_url = db.Column(db.String(500))
     screenshots = db.Column(db.Text)  # JSON array of screenshot URLs
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Keyset pagination key
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    cached_json = db.deferred(db.Column(db.Text))  # Pre-rendered list JSON, maintained by fragments.py
+    cached_json_version = db.Column(db.Integer)  # fragments.FRAGMENT_VERSION it was rendered with
 
     def to_dict(self):
         import json
@@ -112,6 +114,27 @@ class Skill(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class UserAgent(db.Model):
+    """Distinct User-Agent string seen by analytics, parsed once when first seen"""
+    __tablename__ = 'analytics_user_agent'
+    id = db.Column(db.Integer, primary_key=True)
+    ua_hash = db.Column(db.String(32), unique=True, nullable=False)  # blake2b of the raw string
+    user_agent = db.Column(db.String(500), nullable=False)
+    browser = db.Column(db.String(50))
+    browser_version = db.Column(db.String(20))  # Major version
+    os = db.Column(db.String(50))
+    device = db.Column(db.String(20))  # 'desktop', 'mobile', 'tablet', 'bot'
+    first_seen = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Referrer(db.Model):
+    """Distinct referrer URL seen by analytics, with its normalized domain"""
+    __tablename__ = 'analytics_referrer'
+    id = db.Column(db.Integer, primary_key=True)
+    url_hash = db.Column(db.String(32), unique=True, nullable=False)  # blake2b of the raw URL
+    url = db.Column(db.String(500), nullable=False)
+    domain = db.Column(db.String(255), index=True)  # Host without 'www.'
+    first_seen = db.Column(db.DateTime, default=datetime.utcnow)
+
 class Analytics(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.String(200), nullable=False)
@@ -120,12 +143,28 @@ class Analytics(db.Model):
     item_id = db.Column(db.Integer)  # ID of project, skill, etc. if applicable
     item_name = db.Column(db.String(200))  # Name of the item clicked
     ip_address = db.Column(db.String(50))
-    user_agent = db.Column(db.String(500))
+    user_agent = db.Column(db.String(500))  # Legacy rows only; new rows use user_agent_id
     country = db.Column(db.String(100))
     city = db.Column(db.String(100))
-    referrer = db.Column(db.String(500))
+    referrer = db.Column(db.String(500))  # Legacy rows only; new rows use referrer_id
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     duration = db.Column(db.Integer)  # Time spent in seconds
+    weight = db.Column(db.Integer, default=1)  # Events this row stands for when ingest was sampling (NULL = 1)
+    user_agent_id = db.Column(db.Integer, db.ForeignKey('analytics_user_agent.id'))
+    referrer_id = db.Column(db.Integer, db.ForeignKey('analytics_referrer.id'))
+
+    agent = db.relationship('UserAgent')
+    referrer_info = db.relationship('Referrer')
+
+    # Indexes matching the dashboard queries (see check_query_plans.py)
+    __table_args__ = (
+        db.Index('ix_analytics_timestamp', 'timestamp'),  # Recent activity, time-range scans
+        db.Index('ix_analytics_session_timestamp', 'session_id', 'timestamp'),  # Distinct sessions, sessionizing
+        db.Index('ix_analytics_event_type_timestamp', 'event_type', 'timestamp'),
+        db.Index('ix_analytics_section_timestamp', 'section', 'timestamp'),
+        db.Index('ix_analytics_country_session', 'country', 'session_id'),  # Covers exact visitors by country
+        db.Index('ix_analytics_city_country_session', 'city', 'country', 'session_id'),  # Covers exact visitors by city
+    )
 
     def to_dict(self):
         return {
@@ -136,12 +175,95 @@ class Analytics(db.Model):
             'item_id': self.item_id,
             'item_name': self.item_name,
             'ip_address': self.ip_address,
-            'user_agent': self.user_agent,
+            'user_agent': self.agent.user_agent if self.agent else self.user_agent,
+            'browser': self.agent.browser if self.agent else None,
+            'os': self.agent.os if self.agent else None,
+            'device': self.agent.device if self.agent else None,
             'country': self.country,
             'city': self.city,
-            'referrer': self.referrer,
+            'referrer': self.referrer_info.url if self.referrer_info else self.referrer,
+            'referrer_domain': self.referrer_info.domain if self.referrer_info else None,
             'timestamp': self.timestamp.isoformat() if self.timestamp else None,
-            'duration': self.duration
+            'duration': self.duration,
+            'weight': self.weight or 1
+        }
+
+class AnalyticsRollup(db.Model):
+    """Pre-aggregated event counts per time bucket and dimension value"""
+    __tablename__ = 'analytics_rollup'
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(10), nullable=False)  # 'minute', 'hour' or 'day'
+    bucket_start = db.Column(db.DateTime, nullable=False)  # Start of the bucket (UTC)
+    dimension = db.Column(db.String(50), nullable=False)  # 'total', 'section', 'item_name', 'country', 'city', 'browser', ...
+    value = db.Column(db.String(200), nullable=False, default='')  # Dimension value ('' for 'total')
+    parent_value = db.Column(db.String(100), nullable=False, default='')  # Country for 'city' rows
+    event_type = db.Column(db.String(100), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('granularity', 'dimension', 'bucket_start', 'event_type', 'value', 'parent_value',
+                            name='uq_analytics_rollup_key'),
+    )
+
+    def to_dict(self):
+        return {
+            'granularity': self.granularity,
+            'bucket_start': self.bucket_start.isoformat() if self.bucket_start else None,
+            'dimension': self.dimension,
+            'value': self.value,
+            'parent_value': self.parent_value,
+            'event_type': self.event_type,
+            'count': self.count
+        }
+
+class AnalyticsSketch(db.Model):
+    """Serialized probabilistic sketch (e.g. HyperLogLog) per time bucket and dimension value"""
+    __tablename__ = 'analytics_sketch'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # 'hll'
+    granularity = db.Column(db.String(10), nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    dimension = db.Column(db.String(50), nullable=False)
+    value = db.Column(db.String(200), nullable=False, default='')
+    parent_value = db.Column(db.String(100), nullable=False, default='')
+    data = db.Column(db.LargeBinary, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'granularity', 'dimension', 'bucket_start', 'value', 'parent_value',
+                            name='uq_analytics_sketch_key'),
+    )
+
+class AnalyticsSession(db.Model):
+    """One visit: consecutive events of a session_id with no gap longer than the session timeout"""
+    __tablename__ = 'analytics_session'
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.String(200), nullable=False)
+    started_at = db.Column(db.DateTime, nullable=False)
+    ended_at = db.Column(db.DateTime, nullable=False)
+    event_count = db.Column(db.Integer, nullable=False, default=0)
+    page_views = db.Column(db.Integer, nullable=False, default=0)
+    entry_section = db.Column(db.String(100))
+    exit_section = db.Column(db.String(100))
+    path = db.Column(db.Text)  # JSON list of "event_type[:section]" steps, repeats collapsed
+    weight = db.Column(db.Integer)  # Visits this row stands for when ingest was sampling (NULL = 1)
+
+    __table_args__ = (
+        db.UniqueConstraint('session_id', 'started_at', name='uq_analytics_session_start'),
+        db.Index('ix_analytics_session_started_at', 'started_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'session_id': self.session_id,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'ended_at': self.ended_at.isoformat() if self.ended_at else None,
+            'duration': int((self.ended_at - self.started_at).total_seconds()) if self.started_at and self.ended_at else 0,
+            'event_count': self.event_count,
+            'page_views': self.page_views,
+            'entry_section': self.entry_section,
+            'exit_section': self.exit_section,
+            'weight': self.weight or 1
         }
 
 class Experience(db.Model):
@@ -158,6 +280,8 @@ class Experience(db.Model):
     order = db.Column(db.Integer, default=0)  # For ordering in timeline
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    cached_json = db.deferred(db.Column(db.Text))  # Pre-rendered list JSON, maintained by fragments.py
+    cached_json_version = db.Column(db.Integer)  # fragments.FRAGMENT_VERSION it was rendered with
 
     def to_dict(self):
         return {
@@ -183,7 +307,11 @@ class Contact(db.Model):
     subject = db.Column(db.String(200))
     message = db.Column(db.Text, nullable=False)
     read = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Keyset pagination key
+
+    __table_args__ = (
+        db.Index('ix_contact_created_at_id', 'created_at', 'id'),  # Inbox pages (keyset pagination)
+    )
 
     def to_dict(self):
         return {
@@ -204,9 +332,13 @@ class ActivityLog(db.Model):
     entity_name = db.Column(db.String(200))  # Name/title of the entity
     admin_user = db.Column(db.String(100), nullable=False)
     data_snapshot = db.Column(db.Text)  # JSON snapshot of deleted/updated data for undo
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Keyset pagination key
     undone = db.Column(db.Boolean, default=False)  # Whether this action was undone
 
+    __table_args__ = (
+        db.Index('ix_activity_log_timestamp_id', 'timestamp', 'id'),  # Activity log pages (keyset pagination)
+    )
+
     def to_dict(self):
         import json
         snapshot = None
@@ -264,7 +396,8 @@ class Blog(db.Model):
     slug = db.Column(db.String(500), unique=True, nullable=False)
     excerpt = db.Column(db.Text)  # Short description/preview
     banner_image_url = db.Column(db.String(500))  # Banner image for blog post
-    content = db.Column(db.Text, nullable=False)  # HTML content with formatting
+    # HTML content with formatting; deferred: only the single-post endpoints load the article body
+    content = db.deferred(db.Column(db.Text, nullable=False))
     author = db.Column(db.String(200), default='Admin')
     published = db.Column(db.Boolean, default=False)  # Draft/Published status
     featured = db.Column(db.Boolean, default=False)  # Featured blog
@@ -272,34 +405,32 @@ class Blog(db.Model):
     tags = db.Column(db.String(500))  # Comma-separated tags
     reading_time = db.Column(db.Integer)  # Estimated reading time in minutes
     views = db.Column(db.Integer, default=0)  # View count
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Keyset pagination key
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     published_at = db.Column(db.DateTime)  # When it was published
+    cached_json = db.deferred(db.Column(db.Text))  # Pre-rendered card JSON (without views), see fragments.py
+    cached_json_version = db.Column(db.Integer)  # fragments.FRAGMENT_VERSION it was rendered with
 
-    def to_dict(self):
-        import json
-        tags_list = []
-        if self.tags:
-            tags_list = [tag.strip() for tag in self.tags.split(',')]
-        
-        return {
-            'id': self.id,
-            'title': self.title,
-            'slug': self.slug,
-            'excerpt': self.excerpt,
-            'banner_image_url': self.banner_image_url,
-            'content': self.content,
-            'author': self.author,
-            'published': self.published,
-            'featured': self.featured,
-            'show_on_homepage': self.show_on_homepage,
-            'tags': tags_list,
-            'reading_time': self.reading_time,
-            'views': self.views,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'published_at': self.published_at.isoformat() if self.published_at else None
-        }
+    # Card fields of the list endpoints: everything but the article body
+    SUMMARY_FIELDS = ('id', 'title', 'slug', 'excerpt', 'banner_image_url', 'author', 'published', 'featured',
+                      'show_on_homepage', 'tags', 'reading_time', 'views', 'created_at', 'updated_at',
+                      'published_at')
+    # Cards of the public lists, which are cached per content version. Counting a view is not a content change,
+    # so view counts are only served by the single-post endpoints and the admin list.
+    PUBLIC_SUMMARY_FIELDS = tuple(name for name in SUMMARY_FIELDS if name != 'views')
+    FIELDS = SUMMARY_FIELDS + ('content',)
+
+    def to_dict(self, fields=None):
+        """All fields, or only `fields` (so columns left unloaded are never fetched)"""
+        data = {}
+        for name in fields or self.FIELDS:
+            value = getattr(self, name)
+            if name == 'tags':
+                value = [tag.strip() for tag in value.split(',')] if value else []
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            data[name] = value
+        return data
 
 class BlogLike(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -368,3 +499,10 @@ class CommentLike(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+
+class ContentVersion(db.Model):
+    """Change counter per public content scope ('projects', 'blogs', ...), bumped on every write"""
+    __tablename__ = 'content_version'
+    scope = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
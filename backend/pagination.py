@@ -0,0 +1,92 @@
+"""Keyset (cursor) pagination for the list endpoints.
+
+OFFSET paging re-reads every skipped row, so later pages get slower as a
+table grows. Keyset paging continues from the (sort key, id) of the last row
+returned, which is a single index range scan whatever the page. The position
+is handed to clients as an opaque `next_cursor` token. Each token is bound to
+the list it came from, so a cursor from one endpoint is rejected by another.
+
+Paging is opt-in. A request with `page_size` or `cursor` gets
+{'items': [...], 'next_cursor': ..., 'page_size': n}. Without either, the
+endpoint keeps returning the plain list it always did.
+"""
+import base64
+import json
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client-supplied cursor cannot be decoded for this list"""
+
+
+def _encode_value(value):
+    return {'dt': value.isoformat()} if isinstance(value, datetime) else value
+
+
+def _decode_value(value):
+    return datetime.fromisoformat(value['dt']) if isinstance(value, dict) else value
+
+
+def encode_cursor(name, values):
+    payload = json.dumps([name, [_encode_value(v) for v in values]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(name, token):
+    """Key values encoded in a cursor of list `name`"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        cursor_name, values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        values = [_decode_value(v) for v in values]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor('Invalid cursor')
+    if cursor_name != name:
+        raise InvalidCursor('Cursor belongs to another list')
+    return values
+
+
+def wants_page(args):
+    """Whether the request opted into paging (legacy clients get the full list)"""
+    return 'page_size' in args or 'cursor' in args
+
+
+def page_size_arg(args):
+    """Requested page size, clamped to 1..PAGINATION_MAX_PAGE_SIZE"""
+    default = current_app.config.get('PAGINATION_DEFAULT_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    maximum = current_app.config.get('PAGINATION_MAX_PAGE_SIZE', MAX_PAGE_SIZE)
+    return min(max(args.get('page_size', default, type=int) or default, 1), maximum)
+
+
+def paginate(query, name, keys, page_size, cursor=None, key_of=None):
+    """(rows, next_cursor) of one page of `query`, newest first by `keys` (non-null, id last)
+
+    Rows are ordered by every key descending, and a page continues strictly
+    after the cursor position, so rows inserted meanwhile never shift a page.
+    Keys must never be NULL (declare the columns NOT NULL): a NULL key drops
+    its row out of the tuple comparison, and out of every later page.
+    `key_of(row)` gives a row's key values when the keys are not plain columns.
+    """
+    query = query.order_by(*(key.desc() for key in keys))
+    if cursor:
+        values = decode_cursor(name, cursor)
+        if len(values) != len(keys):
+            raise InvalidCursor('Invalid cursor')
+        query = query.filter(tuple_(*keys) < tuple(values))
+    # One extra row tells whether there is a next page without a COUNT
+    rows = query.limit(page_size + 1).all()
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    last = rows[-1]
+    values = key_of(last) if key_of else [getattr(last, key.key) for key in keys]
+    return rows, encode_cursor(name, values)
+
+
+def page_response(items, next_cursor, page_size):
+    return {'items': items, 'next_cursor': next_cursor, 'page_size': page_size}
@@ -0,0 +1,30 @@
+"""Rebuild analytics rollups from raw events.
+
+Usage:
+    python rebuild_rollups.py            # rebuild everything still in the raw events
+    python rebuild_rollups.py --days 7   # rebuild only the last 7 days
+
+Rollups and sketches of months archived by retention cannot be recomputed, so
+a rebuild never starts before the oldest raw event still stored.
+"""
+import sys
+from datetime import datetime, timedelta
+
+from app import app
+from analytics_rollups import rebuild_rollups, rebuild_start
+
+with app.app_context():
+    since = None
+    if '--days' in sys.argv:
+        days = int(sys.argv[sys.argv.index('--days') + 1])
+        since = datetime.utcnow() - timedelta(days=days)
+
+    start = rebuild_start(since)
+    if start is None:
+        print("ℹ️  No raw analytics events stored; nothing to rebuild")
+        sys.exit(0)
+    if since is None or start > since:
+        print(f"ℹ️  Raw events start at {start:%Y-%m-%d}; earlier (archived) rollups are kept as they are")
+    print(f"📊 Rebuilding analytics rollups from {start:%Y-%m-%d}...")
+    total = rebuild_rollups(since=start)
+    print(f"✅ Rolled up {total} analytics events")
@@ -0,0 +1,151 @@
+"""Keep the live database schema in step with the models.
+
+db.create_all() only creates missing tables; it never touches tables that
+already exist. `ensure_schema` also adds missing nullable columns, enforces
+columns declared NOT NULL since, and creates any declared index that is
+missing, so existing deployments pick up new columns and indexes on their next
+start without a manual migration.
+"""
+from datetime import datetime
+
+from sqlalchemy import DateTime, inspect, text, update
+from sqlalchemy.schema import CreateColumn
+
+from models import db
+from analytics_partitions import list_partitions
+
+
+def _is_partitioned(engine, table_name):
+    # Partitioned parent tables do not support CREATE INDEX CONCURRENTLY
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT relkind = 'p' FROM pg_class WHERE relname = :name"), {'name': table_name}
+        ).scalar() or False
+
+
+def _invalid_indexes(engine):
+    # A failed or interrupted CREATE INDEX CONCURRENTLY leaves an INVALID index that is never used
+    if engine.dialect.name != 'postgresql':
+        return set()
+    with engine.connect() as conn:
+        return set(conn.execute(text(
+            'SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE NOT i.indisvalid'
+        )).scalars())
+
+
+def ensure_indexes(engine=None):
+    """Create declared indexes that are missing (or invalid) on existing tables; returns their names"""
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    invalid = _invalid_indexes(engine)
+    created = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {ix['name'] for ix in inspector.get_indexes(table.name)} - invalid
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            concurrently = engine.dialect.name == 'postgresql' and not _is_partitioned(engine, table.name)
+            if index.name in invalid:
+                print(f"⚠️  Rebuilding invalid index {index.name}")
+                with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                    conn.execute(text(f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS {index.name}"))
+            if concurrently:
+                # CONCURRENTLY avoids blocking inserts on a large table, but cannot run in a transaction
+                options = index.dialect_options['postgresql']
+                with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                    options['concurrently'] = True
+                    try:
+                        index.create(bind=conn, checkfirst=True)
+                    finally:
+                        options['concurrently'] = False
+            else:
+                index.create(bind=engine, checkfirst=True)
+            created.append(index.name)
+    return created
+
+
+def _add_missing_columns(engine, table, target_name, existing):
+    added = []
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        if not column.nullable or column.primary_key:
+            print(f"⚠️  Cannot add NOT NULL column {target_name}.{column.name} automatically")
+            continue
+        ddl = CreateColumn(column).compile(dialect=engine.dialect)
+        with engine.begin() as conn:
+            conn.execute(text(f'ALTER TABLE {target_name} ADD COLUMN {ddl}'))
+        added.append(f'{target_name}.{column.name}')
+    return added
+
+
+def ensure_columns(engine=None):
+    """Add declared nullable columns that are missing from existing tables; returns 'table.column' names"""
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {c['name'] for c in inspector.get_columns(table.name)}
+        added += _add_missing_columns(engine, table, table.name, existing)
+    # SQLite month tables of analytics (native Postgres partitions follow their parent)
+    if engine.dialect.name == 'sqlite':
+        analytics = db.metadata.tables['analytics']
+        for _, name in list_partitions(engine):
+            existing = {c['name'] for c in inspector.get_columns(name)}
+            added += _add_missing_columns(engine, analytics, name, existing)
+    return added
+
+
+def _backfill_value(column):
+    # Rows without a time get the epoch, so they sort as the oldest; other columns get their default
+    if isinstance(column.type, DateTime):
+        return datetime(1970, 1, 1)
+    if column.default is not None and column.default.is_scalar:
+        return column.default.arg
+    return None
+
+
+def ensure_not_null(engine=None):
+    """Fill NULLs of columns declared NOT NULL that existing tables still allow, then enforce the constraint
+    (Postgres; SQLite cannot alter a column, so there new tables only); returns 'table.column' names"""
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    changed = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        nullable = {c['name'] for c in inspector.get_columns(table.name) if c['nullable']}
+        for column in table.columns:
+            if column.nullable or column.primary_key or column.name not in nullable:
+                continue
+            value = _backfill_value(column)
+            if value is None:
+                print(f"⚠️  Cannot make {table.name}.{column.name} NOT NULL automatically")
+                continue
+            with engine.begin() as conn:
+                filled = conn.execute(update(table).where(column.is_(None)).values({column.name: value})).rowcount
+                if engine.dialect.name == 'postgresql':
+                    conn.execute(text(f'ALTER TABLE {table.name} ALTER COLUMN {column.name} SET NOT NULL'))
+            if filled or engine.dialect.name == 'postgresql':
+                changed.append(f'{table.name}.{column.name}')
+    return changed
+
+
+def ensure_schema():
+    added = ensure_columns()
+    if added:
+        print(f"✅ Added columns: {', '.join(added)}")
+    enforced = ensure_not_null()
+    if enforced:
+        print(f"✅ Made columns NOT NULL: {', '.join(enforced)}")
+    created = ensure_indexes()
+    if created:
+        print(f"✅ Created indexes: {', '.join(created)}")
+    return added + enforced + created
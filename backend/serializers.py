@@ -0,0 +1,111 @@
+"""Column-level serializers for the list endpoints.
+
+`to_dict()` needs a hydrated ORM instance per row, then runs the same
+attribute lookups, splits, `json.loads` and `isoformat()` calls for every row
+of every request. A ModelSerializer selects only the columns it needs and
+turns each result tuple into the `to_dict()` shape with a function generated
+once per field list: a single dict literal reading row positions, with the
+converters inlined. No ORM objects are created on the read path.
+
+The output must match the model's `to_dict()`, which is still used for single
+rows and by the write endpoints.
+"""
+import json
+
+from sqlalchemy import DateTime
+
+from models import db, About, ActivityLog, Blog, Contact, Experience, Project, Skill
+
+
+def split_list(value):
+    return value.split(',') if value else []
+
+
+def split_stripped(value):
+    return [item.strip() for item in value.split(',')] if value else []
+
+
+def json_list(value):
+    try:
+        return json.loads(value) if value else []
+    except ValueError:
+        return []
+
+
+def json_or_none(value):
+    try:
+        return json.loads(value) if value else None
+    except ValueError:
+        return None
+
+
+class ModelSerializer:
+    """Serializes result tuples of selected model columns, without ORM instances"""
+
+    def __init__(self, model, fields, converters=None):
+        self.model = model
+        self.fields = tuple(fields)
+        self.converters = converters or {}
+        self._compiled = {}  # field tuple -> generated function
+
+    def query(self, fields=None, extra=()):
+        """Query of the `fields` columns, then any `extra` ones (e.g. sort keys) the row also needs"""
+        fields = tuple(fields or self.fields)
+        names = fields + tuple(name for name in extra if name not in fields)
+        return db.session.query(*(getattr(self.model, name) for name in names))
+
+    def compile(self, fields=None):
+        """Function turning a row of query(fields) into a dict"""
+        fields = tuple(fields or self.fields)
+        serialize = self._compiled.get(fields)
+        if serialize is None:
+            serialize = self._compiled[fields] = self._generate(fields)
+        return serialize
+
+    def _generate(self, fields):
+        namespace = {}
+        items = []
+        for position, name in enumerate(fields):
+            value = f'row[{position}]'
+            if name in self.converters:
+                namespace[f'convert_{position}'] = self.converters[name]
+                value = f'convert_{position}({value})'
+            elif isinstance(self.model.__table__.c[name].type, DateTime):
+                value = f'({value}.isoformat() if {value} is not None else None)'
+            items.append(f'{name!r}: {value}')
+        source = 'def serialize(row):\n    return {' + ', '.join(items) + '}\n'
+        exec(compile(source, f'<{self.model.__name__} serializer>', 'exec'), namespace)
+        return namespace['serialize']
+
+    def all(self, query, fields=None):
+        serialize = self.compile(fields)
+        return [serialize(row) for row in query]
+
+
+project_serializer = ModelSerializer(
+    Project,
+    ('id', 'title', 'description', 'detailed_description', 'technologies', 'github_url', 'live_url', 'image_url',
+     'screenshots', 'created_at', 'updated_at'),
+    converters={'technologies': split_list, 'screenshots': json_list}
+)
+about_serializer = ModelSerializer(
+    About,
+    ('id', 'name', 'title', 'bio', 'email', 'github_url', 'linkedin_url', 'twitter_url', 'profile_image_url',
+     'hero_top_skills', 'hero_short_description', 'updated_at'),
+    converters={'hero_top_skills': split_stripped}
+)
+skill_serializer = ModelSerializer(Skill, ('id', 'name', 'category', 'proficiency', 'icon', 'created_at'))
+experience_serializer = ModelSerializer(
+    Experience,
+    ('id', 'company', 'position', 'start_date', 'end_date', 'location', 'short_description', 'detailed_description',
+     'technologies', 'company_logo_url', 'order', 'created_at', 'updated_at'),
+    converters={'technologies': split_list}
+)
+blog_serializer = ModelSerializer(Blog, Blog.SUMMARY_FIELDS, converters={'tags': split_stripped})
+contact_serializer = ModelSerializer(Contact, ('id', 'name', 'email', 'subject', 'message', 'read', 'created_at'))
+activity_serializer = ModelSerializer(
+    ActivityLog,
+    ('id', 'action', 'entity_type', 'entity_id', 'entity_name', 'admin_user', 'data_snapshot', 'timestamp',
+     'undone'),
+    converters={'data_snapshot': json_or_none}
+)
@@ -0,0 +1,269 @@
+"""Mergeable probabilistic sketches used by the analytics aggregates.
+
+All sketches serialize to compact bytes so they can be stored per time bucket
+and merged at query time to answer questions over any range.
+"""
+import hashlib
+import json
+import math
+import struct
+import zlib
+
+_HASH_BITS = 64
+
+
+def _hash64(item):
+    # Stable across processes (unlike hash()), so persisted sketches stay mergeable
+    return int.from_bytes(hashlib.blake2b(item.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter with 2**p registers"""
+
+    MIN_PRECISION = 4
+    MAX_PRECISION = 16
+
+    def __init__(self, p=12, registers=None):
+        if not self.MIN_PRECISION <= p <= self.MAX_PRECISION:
+            raise ValueError(f'HyperLogLog precision must be between {self.MIN_PRECISION} and {self.MAX_PRECISION}')
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+
+    @classmethod
+    def precision_for_error(cls, error):
+        """Smallest precision whose standard error (1.04 / sqrt(m)) is within `error`"""
+        p = math.ceil(math.log2((1.04 / error) ** 2))
+        return max(cls.MIN_PRECISION, min(cls.MAX_PRECISION, p))
+
+    @classmethod
+    def for_error(cls, error):
+        return cls(cls.precision_for_error(error))
+
+    @property
+    def standard_error(self):
+        return 1.04 / math.sqrt(self.m)
+
+    def add(self, item):
+        x = _hash64(item)
+        index = x >> (_HASH_BITS - self.p)
+        w = x & ((1 << (_HASH_BITS - self.p)) - 1)
+        rank = (_HASH_BITS - self.p) - w.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
+    def fold(self, p):
+        """Return a copy reduced to a lower precision so it can merge with coarser sketches"""
+        if p == self.p:
+            return HyperLogLog(self.p, self.registers)
+        if p > self.p:
+            raise ValueError('Cannot increase HyperLogLog precision')
+        shift = self.p - p
+        folded = HyperLogLog(p)
+        for index, rank in enumerate(self.registers):
+            if not rank:
+                continue
+            # The dropped index bits become the leading bits of the remaining hash
+            dropped = index & ((1 << shift) - 1)
+            new_rank = shift - dropped.bit_length() + 1 if dropped else shift + rank
+            new_index = index >> shift
+            if new_rank > folded.registers[new_index]:
+                folded.registers[new_index] = new_rank
+        return folded
+
+    def merge(self, other):
+        """Merge another sketch in place (folding to the lower precision if needed)"""
+        if other.p < self.p:
+            folded = self.fold(other.p)
+            self.p, self.m, self.registers = folded.p, folded.m, folded.registers
+        elif other.p > self.p:
+            other = other.fold(self.p)
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        m = self.m
+        if m >= 128:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        else:
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        return bytes([self.p]) + zlib.compress(bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(data[0], zlib.decompress(data[1:]))
+
+
+class SpaceSaving:
+    """Space-Saving heavy hitters: the top items of a stream with `capacity` counters
+
+    Each counter keeps an over-estimate `count` and its maximum over-count
+    `error`, so `count - error` is a guaranteed lower bound. Any item seen more
+    than total / capacity times is always present. Merging follows Agarwal et
+    al., "Mergeable Summaries", so daily sketches combine into any range.
+    """
+
+    def __init__(self, capacity=100, counters=None):
+        if capacity < 1:
+            raise ValueError('SpaceSaving capacity must be at least 1')
+        self.capacity = capacity
+        self.counters = dict(counters) if counters else {}  # item -> [count, error]
+
+    def _min_count(self):
+        return min(c[0] for c in self.counters.values()) if len(self.counters) >= self.capacity else 0
+
+    def add(self, item, weight=1):
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += weight
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = [weight, 0]
+        else:
+            # Replace the smallest counter; the new item may have been counted under it
+            victim = min(self.counters, key=lambda k: self.counters[k][0])
+            floor = self.counters.pop(victim)[0]
+            self.counters[item] = [floor + weight, floor]
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
+    def merge(self, other):
+        """Merge another sketch in place, keeping this sketch's capacity"""
+        own_floor, other_floor = self._min_count(), other._min_count()
+        merged = {}
+        for item in self.counters.keys() | other.counters.keys():
+            count, error = self.counters.get(item, (own_floor, own_floor))
+            other_count, other_error = other.counters.get(item, (other_floor, other_floor))
+            merged[item] = [count + other_count, error + other_error]
+        top = sorted(merged.items(), key=lambda kv: kv[1][0], reverse=True)[:self.capacity]
+        self.counters = dict(top)
+        return self
+
+    def top(self, n=None):
+        """[(item, count, error), ...] by estimated count, highest first"""
+        ranked = sorted(self.counters.items(), key=lambda kv: (-kv[1][0], kv[0]))
+        return [(item, count, error) for item, (count, error) in ranked[:n]]
+
+    def to_bytes(self):
+        payload = json.dumps([self.capacity, [[item, c, e] for item, (c, e) in self.counters.items()]],
+                             separators=(',', ':'))
+        return zlib.compress(payload.encode('utf-8'))
+
+    @classmethod
+    def from_bytes(cls, data):
+        capacity, counters = json.loads(zlib.decompress(data))
+        return cls(capacity, {item: [count, error] for item, count, error in counters})
+
+
+class DDSketch:
+    """Quantile sketch with relative error `relative_accuracy` (DDSketch, Masson et al. 2019)
+
+    Positive values go into logarithmic bins of ratio gamma = (1 + a) / (1 - a),
+    so every quantile is returned within a relative error of a. Sketches with
+    the same accuracy merge exactly by adding bin counts. When there are more
+    than `max_bins` bins, the lowest ones are collapsed, which keeps the
+    accuracy of the upper quantiles.
+    """
+
+    _MIN_VALUE = 1e-9  # Smaller values (and zero) are counted in the zero bin
+
+    def __init__(self, relative_accuracy=0.01, max_bins=2048):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError('DDSketch relative accuracy must be between 0 and 1')
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = {}  # index -> count
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+
+    def _index(self, value):
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, index):
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value, weight=1):
+        if value < 0:
+            raise ValueError('DDSketch only accepts non-negative values')
+        if value < self._MIN_VALUE:
+            self.zero_count += weight
+        else:
+            index = self._index(value)
+            self.bins[index] = self.bins.get(index, 0) + weight
+            if len(self.bins) > self.max_bins:
+                self._collapse()
+        self.count += weight
+        self.sum += value * weight
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def _collapse(self):
+        indexes = sorted(self.bins)
+        excess = len(indexes) - self.max_bins
+        target = indexes[excess]
+        self.bins[target] += sum(self.bins.pop(index) for index in indexes[:excess])
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Cannot merge DDSketches with different relative accuracy')
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        return self
+
+    def quantile(self, q):
+        """Value at quantile q (0..1), or None for an empty sketch"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                return self._value(index)
+        return self._value(max(self.bins))
+
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def to_bytes(self):
+        indexes = sorted(self.bins)
+        header = struct.pack('<dIqqdI', self.relative_accuracy, self.max_bins, self.zero_count, self.count, self.sum,
+                             len(indexes))
+        body = b''.join(struct.pack('<iq', index, self.bins[index]) for index in indexes)
+        return zlib.compress(header + body)
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = zlib.decompress(data)
+        accuracy, max_bins, zero_count, count, total, n = struct.unpack_from('<dIqqdI', data)
+        sketch = cls(accuracy, max_bins)
+        sketch.zero_count, sketch.count, sketch.sum = zero_count, count, total
+        offset = struct.calcsize('<dIqqdI')
+        for index, bin_count in struct.iter_unpack('<iq', data[offset:offset + n * struct.calcsize('<iq')]):
+            sketch.bins[index] = bin_count
+        return sketch
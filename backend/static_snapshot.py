@@ -0,0 +1,232 @@
+"""Static snapshot of the public API.
+
+Nearly all public traffic reads content that an admin changes rarely. The
+exporter renders every public GET response into STATIC_SNAPSHOT_DIR as plain
+JSON files, plus gzip (and Brotli) variants for static hosts that serve
+precompressed files. `manifest.json` maps each request path to its file,
+SHA-256, size and content scope. Any static host or CDN can then serve the
+public API without Python or the database, and so can this app
+(STATIC_SNAPSHOT_SERVE).
+
+Rebuilds are incremental. A content commit rebuilds only the targets of the
+scopes it changed, on a background thread, and only files whose bytes changed
+are rewritten. Files of deleted rows are removed. Writes go through a
+temporary file and a rename, so readers never see a partial file.
+
+Snapshots are exact at build time. Single blog posts keep the view count they
+had when exported; the app keeps answering them itself so views are still
+counted. GitHub repos are refreshed when the GitHub settings change or with
+`python export_static.py`, and a failed GitHub fetch keeps the previous file.
+"""
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import quote
+
+from flask import request, send_file
+
+from compression import brotli, compression
+
+MANIFEST = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# One public endpoint; `keys` lists its path parameters (None for a fixed path)
+Target = namedtuple('Target', 'name path scopes builder keys served')
+
+
+def file_name(path):
+    """Snapshot file of a request path: /api/blogs?homepage=true -> api/blogs.homepage=true.json"""
+    route, _, query = path.lstrip('/').partition('?')
+    parts = [quote(part, safe='') for part in route.split('/')]
+    if query:
+        parts[-1] += '.' + quote(query, safe='=&')
+    return '/'.join(parts) + '.json'
+
+
+class StaticSnapshot:
+    """Renders the registered public responses to files and keeps them current"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.directory = None  # Disabled until STATIC_SNAPSHOT_DIR is set
+        self.serve = False
+        self.targets = []
+        self.manifest = {}  # path -> entry
+        self._manifest_mtime = None
+        self._lock = threading.Lock()  # One rebuild at a time per process
+        self._executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.directory = app.config.get('STATIC_SNAPSHOT_DIR') or None
+        self.serve = bool(self.directory) and app.config.get('STATIC_SNAPSHOT_SERVE', False)
+        if not self.directory:
+            return
+        self.manifest = self._read_manifest()
+        if app.config.get('STATIC_SNAPSHOT_ON_WRITE', True) and self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='static-snapshot')
+            atexit.register(self._executor.shutdown, wait=True)
+        if self.serve:
+            app.before_request(self._serve)
+
+    def register(self, path, scopes, builder, keys=None, served=True):
+        """Export `builder()` (JSON bytes) at `path`, rebuilt when one of `scopes` changes
+
+        With `keys`, `path` is a template formatted with each of `keys()`, and the builder gets the
+        key; a None body skips the key. A None body of a fixed path keeps the previous file. Targets
+        with served=False are exported for static hosts but still answered by the app.
+        """
+        scopes = (scopes,) if isinstance(scopes, str) else tuple(scopes)
+        self.targets.append(Target(path, path, frozenset(scopes), builder, keys, served))
+
+    # -- Building --------------------------------------------------------------
+
+    def _render(self, target):
+        """{path: bytes} of one target, or None to keep its files as they are"""
+        if target.keys is None:
+            body = target.builder()
+            return {target.path: body} if body is not None else None
+        rendered = {}
+        for key in target.keys():
+            body = target.builder(key)
+            if body is not None:
+                rendered[target.path.format(key)] = body
+        return rendered
+
+    def rebuild(self, scopes=None, force=False):
+        """Re-render the targets of `scopes` (all when None), writing only changed files (all with
+        force); returns (written, removed) paths"""
+        if not self.directory:
+            return [], []
+        targets = [t for t in self.targets if scopes is None or not t.scopes.isdisjoint(scopes)]
+        written, removed = [], []
+        with self._lock:
+            self._refresh_manifest()
+            manifest = dict(self.manifest)
+            for target in targets:
+                rendered = self._render(target)
+                if rendered is None:
+                    continue
+                for path, body in rendered.items():
+                    digest = hashlib.sha256(body).hexdigest()
+                    entry = manifest.get(path)
+                    if not force and entry and entry['sha256'] == digest and os.path.exists(self._file(entry['file'])):
+                        continue
+                    manifest[path] = self._write(path, body, digest, target)
+                    written.append(path)
+                for path, entry in list(manifest.items()):
+                    if entry['target'] == target.name and path not in rendered:
+                        self._remove(entry['file'])
+                        del manifest[path]
+                        removed.append(path)
+            if written or removed or not os.path.exists(self._file(MANIFEST)):
+                self._write_manifest(manifest)
+            self.manifest = manifest
+        return written, removed
+
+    def _file(self, name):
+        return os.path.join(self.directory, *name.split('/'))
+
+    def _write(self, path, body, digest, target):
+        name = file_name(path)
+        variants = {name: body, name + '.gz': gzip.compress(body, 9, mtime=0)}
+        if brotli is not None:
+            variants[name + '.br'] = brotli.compress(body, quality=11)
+        for variant, data in variants.items():
+            self._atomic_write(self._file(variant), data)
+        return {
+            'file': name,
+            'sha256': digest,
+            'bytes': len(body),
+            'target': target.name,
+            'scopes': sorted(target.scopes),
+            'served': target.served,
+        }
+
+    def _remove(self, name):
+        for variant in (name, name + '.gz', name + '.br'):
+            try:
+                os.remove(self._file(variant))
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _atomic_write(filename, data):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        temporary = f'{filename}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(data)
+        os.replace(temporary, filename)
+
+    def _read_manifest(self):
+        try:
+            self._manifest_mtime = os.stat(self._file(MANIFEST)).st_mtime_ns
+            with open(self._file(MANIFEST), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return manifest.get('files', {}) if manifest.get('version') == MANIFEST_VERSION else {}
+
+    def _write_manifest(self, manifest):
+        document = {
+            'version': MANIFEST_VERSION,
+            'generated_at': datetime.utcnow().isoformat(),
+            'files': dict(sorted(manifest.items())),
+        }
+        self._atomic_write(self._file(MANIFEST), json.dumps(document, indent=2).encode('utf-8'))
+        self._manifest_mtime = os.stat(self._file(MANIFEST)).st_mtime_ns
+
+    # -- Hooks -----------------------------------------------------------------
+
+    def schedule(self, scopes):
+        """Commit listener: rebuild the changed scopes in the background"""
+        if self._executor is not None:
+            self._executor.submit(self._rebuild_in_context, set(scopes))
+
+    def _rebuild_in_context(self, scopes):
+        with self.app.app_context():
+            try:
+                self.rebuild(scopes)
+            except Exception as e:
+                print(f"Static snapshot rebuild failed: {e}")
+
+    def _refresh_manifest(self):
+        # Other processes (workers, export_static.py) may have rebuilt the snapshot
+        try:
+            mtime = os.stat(self._file(MANIFEST)).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self._manifest_mtime:
+            self.manifest = self._read_manifest()
+
+    def _serve(self):
+        """before_request: answer public GETs from the snapshot files"""
+        if request.method != 'GET':
+            return None
+        self._refresh_manifest()
+        entry = self.manifest.get(request.full_path.rstrip('?'))
+        if entry is None or not entry['served']:
+            return None
+        encoding = compression.negotiate()  # Offers 'br' only when the .br variants were written
+        suffix, etag = {'br': ('.br', '-br'), 'gzip': ('.gz', '-gzip')}.get(encoding, ('', ''))
+        try:
+            response = send_file(self._file(entry['file'] + suffix), mimetype='application/json',
+                                 etag=entry['sha256'] + etag, conditional=True, max_age=0)
+        except FileNotFoundError:  # Removed by a rebuild since the manifest was read
+            return None
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = 'public, no-cache'
+        return response
+
+
+static_snapshot = StaticSnapshot()
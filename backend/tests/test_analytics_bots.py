@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from analytics_bots import FLAG_DURATION, BotFilter
+from analytics_dimensions import is_bot_user_agent, parse_user_agent
+
+REAL_DEVICES = [
+    # CUBOT phones: "bot" at the end of a word
+    'Mozilla/5.0 (Linux; Android 10; CUBOT X30) AppleWebKit/537.36 (KHTML, like Gecko) '
+    'Chrome/120.0.6099.144 Mobile Safari/537.36',
+    'Mozilla/5.0 (Linux; Android 9; CUBOT_POWER Build/PPR1.180610.011) AppleWebKit/537.36 (KHTML, like Gecko) '
+    'Chrome/119.0.6045.163 Mobile Safari/537.36',
+    'Mozilla/5.0 (Linux; Android 11; KingKong 5 Pro CUBOT) AppleWebKit/537.36 (KHTML, like Gecko) '
+    'Chrome/118.0.5993.111 Mobile Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 '
+    'Safari/605.1.15',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 '
+    'Mobile/15E148 Safari/604.1',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:125.0) Gecko/20100101 Firefox/125.0',
+    'Mozilla/5.0 (Linux; Android 14; SM-S918B) AppleWebKit/537.36 (KHTML, like Gecko) SamsungBrowser/24.0 '
+    'Chrome/117.0.0.0 Mobile Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 '
+    'Safari/537.36 Edg/124.0.2478.67',
+    'Mozilla/5.0 (Linux; Android 13; Pixel 7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 '
+    'Mobile Safari/537.36 OPR/81.0.4292.78746',
+    'Mozilla/5.0 (iPad; CPU OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) CriOS/124.0.6367.88 '
+    'Mobile/15E148 Safari/604.1',
+]
+
+BOTS = [
+    'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+    'Mozilla/5.0 (compatible; bingbot/2.0; +http://www.bing.com/bingbot.htm)',
+    'Mozilla/5.0 (compatible; YandexBot/3.0; +http://yandex.com/bots)',
+    'Mozilla/5.0 (compatible; SomeNewBot; +https://example.com/crawler)',
+    'Mozilla/5.0 AppleWebKit/537.36 (KHTML, like Gecko; compatible; GPTBot/1.0; +https://openai.com/gptbot)',
+    'facebookexternalhit/1.1 (+http://www.facebook.com/externalhit_uatext.php)',
+    'Mozilla/5.0 (compatible; UptimeRobot/2.0; http://www.uptimerobot.com/)',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) HeadlessChrome/124.0.0.0 Safari/537.36',
+    'python-requests/2.31.0',
+    'curl/8.4.0',
+]
+
+
+@pytest.mark.parametrize('user_agent', REAL_DEVICES)
+def test_real_devices_are_not_bots(user_agent):
+    assert not is_bot_user_agent(user_agent)
+    assert parse_user_agent(user_agent)[3] != 'bot'
+
+
+@pytest.mark.parametrize('user_agent', BOTS)
+def test_crawlers_are_bots(user_agent):
+    assert is_bot_user_agent(user_agent)
+    assert parse_user_agent(user_agent)[3] == 'bot'
+
+
+def test_rate_flag_expires_while_events_keep_coming():
+    bot_filter = BotFilter()
+    bot_filter.max_events_per_minute = 10
+    user_agent = REAL_DEVICES[0]
+    start = datetime(2026, 1, 1, 12, 0, 0)
+    assert bot_filter.check(user_agent, 'session', events=10, now=start) is None
+    assert bot_filter.check(user_agent, 'session', events=1, now=start) == 'session_rate'
+    # Still flagged while events keep arriving, until FLAG_DURATION after the flag was set
+    now = start
+    while now + timedelta(minutes=1) < start + FLAG_DURATION:
+        now += timedelta(minutes=1)
+        assert bot_filter.check(user_agent, 'session', events=1, now=now) == 'session_rate'
+    assert bot_filter.check(user_agent, 'session', events=1, now=start + FLAG_DURATION) is None
@@ -0,0 +1,50 @@
+from analytics_sampling import LoadShedder, session_share
+from analytics_sketches import weighted_session_ids
+from sketches import HyperLogLog
+
+
+def _shedder(sheddable_weight, core_weight):
+    shedder = LoadShedder()
+    shedder.pressure = lambda: 5
+    shedder.weights = lambda pressure: (sheddable_weight, core_weight)
+    return shedder
+
+
+def _events(sessions):
+    return [
+        {'session_id': f'session-{i}', 'event_type': event_type}
+        for i in range(sessions) for event_type in ('page_view', 'project_click', 'page_view')
+    ]
+
+
+def test_sessions_are_kept_or_dropped_whole():
+    kept = _shedder(4, 4).sample(_events(3000))
+    per_session = {}
+    for event in kept:
+        per_session[event['session_id']] = per_session.get(event['session_id'], 0) + 1
+        assert event['weight'] == 4
+    assert set(per_session.values()) == {3}
+    assert abs(len(per_session) - 3000 / 4) < 4 * (3000 * 0.25 * 0.75) ** 0.5
+
+
+def test_lower_rates_keep_a_subset_of_the_sessions():
+    at_half = {e['session_id'] for e in _shedder(2, 2).sample(_events(2000))}
+    at_tenth = {e['session_id'] for e in _shedder(10, 10).sample(_events(2000))}
+    assert at_tenth <= at_half
+
+
+def test_share_is_independent_of_the_hyperloglog_hash():
+    # The kept sessions are a hash-selected subset; their sketch must still count them correctly
+    kept = [f'session-{i}' for i in range(30000) if session_share(f'session-{i}') * 5 < 1]
+    hll = HyperLogLog(12)
+    hll.update(kept)
+    assert abs(hll.count() / len(kept) - 1) < 0.1
+
+
+def test_weighted_sessions_estimate_the_sessions_before_sampling():
+    sessions = [f'session-{i}' for i in range(20000)]
+    hll = HyperLogLog(12)
+    for session_id in sessions:
+        if session_share(session_id) * 5 < 1:
+            hll.update(weighted_session_ids(session_id, 5))
+    assert abs(hll.count() / len(sessions) - 1) < 0.1
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, create_engine, insert
+from sqlalchemy.orm import Session
+
+from models import ActivityLog, Blog, Contact, Project
+from pagination import InvalidCursor, decode_cursor, encode_cursor, paginate
+
+metadata = MetaData()
+items = Table(
+    'item', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('created_at', DateTime, nullable=False),
+)
+KEYS = (items.c.created_at, items.c.id)
+START = datetime(2026, 1, 1, 12, 0, 0, 123456)
+
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    # Runs of rows sharing a created_at, so page boundaries fall inside ties
+    with engine.begin() as conn:
+        conn.execute(insert(items), [
+            {'id': i, 'created_at': START + timedelta(minutes=i // 4)} for i in range(1, 31)
+        ])
+    with Session(engine) as session:
+        yield session
+
+
+def all_pages(session, page_size, name='items'):
+    pages, cursor = [], None
+    while True:
+        rows, cursor = paginate(session.query(items.c.id, items.c.created_at), name, KEYS, page_size, cursor)
+        pages.append([row.id for row in rows])
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip():
+    values = [START, 42]
+    cursor = encode_cursor('contacts', values)
+    assert decode_cursor('contacts', cursor) == values
+    assert not set(cursor) & set('=+/')  # Safe in a query string as is
+
+
+def test_cursor_of_another_list_is_rejected():
+    cursor = encode_cursor('projects', [START, 1])
+    with pytest.raises(InvalidCursor, match='another list'):
+        decode_cursor('contacts', cursor)
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', '', 'W10', encode_cursor('items', [])[:-2] + '!!'])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor('items', cursor)
+
+
+def test_cursor_with_other_keys_is_rejected(session):
+    with pytest.raises(InvalidCursor):
+        paginate(session.query(items.c.id), 'items', KEYS, 5, encode_cursor('items', [START]))
+
+
+@pytest.mark.parametrize('page_size', [1, 3, 4, 7, 30, 50])
+def test_pages_cover_tied_keys_once_in_order(session, page_size):
+    pages = all_pages(session, page_size)
+    assert [row_id for page in pages for row_id in page] == list(range(30, 0, -1))
+    assert all(len(page) == page_size for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= page_size
+
+
+def test_no_cursor_after_an_exactly_full_last_page(session):
+    rows, cursor = paginate(session.query(items.c.id, items.c.created_at), 'items', KEYS, 30)
+    assert len(rows) == 30
+    assert cursor is None
+
+
+def test_rows_inserted_meanwhile_do_not_shift_pages(session):
+    first, cursor = paginate(session.query(items.c.id, items.c.created_at), 'items', KEYS, 10)
+    session.execute(insert(items), [{'id': 100, 'created_at': START + timedelta(days=1)},
+                                    {'id': 101, 'created_at': first[-1].created_at}])
+    second, _ = paginate(session.query(items.c.id, items.c.created_at), 'items', KEYS, 10, cursor)
+    assert [row.id for row in second] == list(range(20, 10, -1))
+
+
+@pytest.mark.parametrize('column', [Project.created_at, Contact.created_at, ActivityLog.timestamp, Blog.created_at])
+def test_sort_keys_of_the_paged_lists_are_not_null(column):
+    # A NULL key drops its row out of the `(key, id) < cursor` comparison
+    assert not column.expression.nullable
@@ -0,0 +1,167 @@
+import math
+import random
+from collections import Counter
+
+import pytest
+
+from sketches import DDSketch, HyperLogLog, SpaceSaving
+
+
+def zipf_stream(items, length, seed):
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, items + 1)]
+    return rng.choices([f'item-{i}' for i in range(items)], weights=weights, k=length)
+
+
+# -- HyperLogLog ---------------------------------------------------------------
+
+@pytest.mark.parametrize('cardinality', [10, 1000, 20000, 200000])
+def test_hyperloglog_error_is_within_three_standard_errors(cardinality):
+    hll = HyperLogLog(12)
+    hll.update(f'session-{i}' for i in range(cardinality))
+    assert abs(hll.count() - cardinality) <= max(1, 3 * hll.standard_error * cardinality)
+
+
+def test_hyperloglog_ignores_repeats():
+    hll = HyperLogLog(12)
+    for _ in range(5):
+        hll.update(f'session-{i}' for i in range(500))
+    assert abs(hll.count() - 500) <= 3 * hll.standard_error * 500
+
+
+def test_hyperloglog_merge_equals_sketch_of_the_union():
+    first, second, union = HyperLogLog(12), HyperLogLog(12), HyperLogLog(12)
+    first.update(f'session-{i}' for i in range(0, 6000))
+    second.update(f'session-{i}' for i in range(4000, 10000))
+    union.update(f'session-{i}' for i in range(10000))
+    assert first.merge(second).registers == union.registers
+
+
+def test_hyperloglog_merge_folds_to_the_lower_precision():
+    fine, coarse, expected = HyperLogLog(14), HyperLogLog(10), HyperLogLog(10)
+    fine.update(f'session-{i}' for i in range(5000))
+    coarse.update(f'session-{i}' for i in range(5000, 8000))
+    expected.update(f'session-{i}' for i in range(8000))
+    merged = fine.merge(coarse)
+    assert merged.p == 10
+    assert merged.registers == expected.registers
+
+
+def test_hyperloglog_round_trip():
+    hll = HyperLogLog(11)
+    hll.update(f'session-{i}' for i in range(3000))
+    restored = HyperLogLog.from_bytes(hll.to_bytes())
+    assert (restored.p, restored.registers, restored.count()) == (hll.p, hll.registers, hll.count())
+
+
+# -- SpaceSaving ---------------------------------------------------------------
+
+def assert_within_error_bound(sketch, truth):
+    """Every counter brackets the true count; no item above total / capacity is missing"""
+    total = sum(truth.values())
+    for item, count, error in sketch.top():
+        assert count - error <= truth[item] <= count
+        assert error <= total / sketch.capacity
+    kept = {item for item, _, _ in sketch.top()}
+    assert all(item in kept for item, count in truth.items() if count > total / sketch.capacity)
+
+
+def test_space_saving_error_bound():
+    stream = zipf_stream(1000, 20000, seed=1)
+    sketch = SpaceSaving(50)
+    sketch.update(stream)
+    assert_within_error_bound(sketch, Counter(stream))
+
+
+def test_space_saving_is_exact_below_capacity():
+    stream = zipf_stream(20, 2000, seed=2)
+    sketch = SpaceSaving(50)
+    sketch.update(stream)
+    expected = sorted(Counter(stream).items(), key=lambda kv: (-kv[1], kv[0]))
+    assert sketch.top() == [(item, count, 0) for item, count in expected]
+
+
+def test_space_saving_merge_keeps_the_error_bound():
+    days = [zipf_stream(1000, 5000, seed=day) for day in range(7)]
+    merged = None
+    for stream in days:
+        sketch = SpaceSaving(50)
+        sketch.update(stream)
+        merged = sketch if merged is None else merged.merge(sketch)
+    assert len(merged.counters) <= 50
+    assert_within_error_bound(merged, Counter(item for stream in days for item in stream))
+
+
+def test_space_saving_weighted_add():
+    sketch = SpaceSaving(10)
+    sketch.add('a', 4)
+    sketch.add('b')
+    sketch.add('a', 2)
+    assert sketch.top() == [('a', 6, 0), ('b', 1, 0)]
+
+
+def test_space_saving_round_trip():
+    sketch = SpaceSaving(30)
+    sketch.update(zipf_stream(200, 3000, seed=3))
+    restored = SpaceSaving.from_bytes(sketch.to_bytes())
+    assert restored.capacity == 30
+    assert restored.top() == sketch.top()
+
+
+# -- DDSketch ------------------------------------------------------------------
+
+QUANTILES = (0.01, 0.25, 0.5, 0.75, 0.9, 0.99)
+
+
+def exact_quantile(values, q):
+    """Same rank convention as DDSketch.quantile"""
+    ordered = sorted(values)
+    return ordered[math.floor(q * (len(ordered) - 1))]
+
+
+@pytest.mark.parametrize('accuracy', [0.01, 0.05])
+def test_ddsketch_quantiles_are_within_relative_accuracy(accuracy):
+    rng = random.Random(4)
+    values = [rng.lognormvariate(3, 1.5) for _ in range(20000)]
+    sketch = DDSketch(accuracy)
+    sketch.update(values)
+    for q in QUANTILES:
+        expected = exact_quantile(values, q)
+        assert abs(sketch.quantile(q) - expected) <= accuracy * expected * (1 + 1e-9)
+
+
+def test_ddsketch_merge_equals_sketch_of_all_values():
+    rng = random.Random(5)
+    parts = [[rng.expovariate(1 / 30) for _ in range(3000)] for _ in range(3)]
+    merged, combined = DDSketch(0.01), DDSketch(0.01)
+    for part in parts:
+        sketch = DDSketch(0.01)
+        sketch.update(part)
+        merged.merge(sketch)
+        combined.update(part)
+    assert merged.bins == combined.bins
+    assert merged.count == combined.count
+    assert merged.quantile(0.5) == combined.quantile(0.5)
+
+
+def test_ddsketch_merge_rejects_other_accuracy():
+    with pytest.raises(ValueError):
+        DDSketch(0.01).merge(DDSketch(0.02))
+
+
+def test_ddsketch_counts_zero_durations():
+    sketch = DDSketch(0.01)
+    sketch.update([0, 0, 0, 10])
+    assert sketch.quantile(0.5) == 0.0
+    assert sketch.quantile(1) == pytest.approx(10, rel=0.01)
+
+
+def test_ddsketch_round_trip():
+    rng = random.Random(6)
+    sketch = DDSketch(0.02)
+    for _ in range(2000):
+        sketch.add(round(rng.expovariate(1 / 60)), weight=rng.randint(1, 3))
+    restored = DDSketch.from_bytes(sketch.to_bytes())
+    assert (restored.bins, restored.zero_count, restored.count) == (sketch.bins, sketch.zero_count, sketch.count)
+    assert restored.sum == pytest.approx(sketch.sum)
+    assert [restored.quantile(q) for q in QUANTILES] == [sketch.quantile(q) for q in QUANTILES]
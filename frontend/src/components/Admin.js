@@ -8,6 +8,7 @@ import { ShowHideToggle } from './SlideToggle';
 import './Admin.css';
 
 const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:5001/api';
+const ADMIN_PAGE_SIZE = 50; // Contacts and activity logs per page
 
 function Admin() {
   const [isAuthenticated, setIsAuthenticated] = useState(false);
@@ -22,6 +23,8 @@ function Admin() {
   const [experience, setExperience] = useState([]);
   const [contacts, setContacts] = useState([]);
   const [activityLogs, setActivityLogs] = useState([]);
+  const [contactsCursor, setContactsCursor] = useState(null); // next_cursor of the last loaded page
+  const [activityCursor, setActivityCursor] = useState(null);
   const [undoStack, setUndoStack] = useState([]); // Store recent deletions for undo
   const [confirmModal, setConfirmModal] = useState({ show: false, message: '', onConfirm: null, onCancel: null });
   const [githubSettings, setGithubSettings] = useState(null);
@@ -192,8 +195,8 @@ function Admin() {
         axios.get(`${API_URL}/projects`),
         axios.get(`${API_URL}/skills`),
         axios.get(`${API_URL}/experience`),
-        axios.get(`${API_URL}/contact`, { headers }),
-        axios.get(`${API_URL}/activity`, { headers }),
+        axios.get(`${API_URL}/contact?page_size=${ADMIN_PAGE_SIZE}`, { headers }),
+        axios.get(`${API_URL}/activity?page_size=${ADMIN_PAGE_SIZE}`, { headers }),
         axios.get(`${API_URL}/github/settings`, { headers }).catch(() => ({ data: null }))
       ]);
       
@@ -201,8 +204,10 @@ function Admin() {
       setProjects(projectsRes.data);
       setSkills(skillsRes.data);
       setExperience(expRes.data);
-      setContacts(contactsRes.data);
-      setActivityLogs(activityRes.data);
+      setContacts(contactsRes.data.items);
+      setContactsCursor(contactsRes.data.next_cursor);
+      setActivityLogs(activityRes.data.items);
+      setActivityCursor(activityRes.data.next_cursor);
       if (githubRes.data) {
         setGithubSettings(githubRes.data);
       }
@@ -211,6 +216,49 @@ function Admin() {
     }
   };
 
+  // The blog list only has card fields: the editor needs the full post
+  const startEditBlog = async (id) => {
+    try {
+      const response = await axios.get(`${API_URL}/blogs/${id}`, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      setEditingBlog(response.data);
+      setActiveTab('blog-editor');
+    } catch (error) {
+      toast.error('Error loading blog', {
+        position: "top-right",
+        autoClose: 3000,
+      });
+    }
+  };
+
+  // Contacts and activity logs are loaded a page at a time
+  const loadMoreContacts = async () => {
+    try {
+      const response = await axios.get(`${API_URL}/contact`, {
+        headers: { Authorization: `Bearer ${token}` },
+        params: { page_size: ADMIN_PAGE_SIZE, cursor: contactsCursor }
+      });
+      setContacts(prev => [...prev, ...response.data.items]);
+      setContactsCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error('Error loading contacts:', error);
+    }
+  };
+
+  const loadMoreActivity = async () => {
+    try {
+      const response = await axios.get(`${API_URL}/activity`, {
+        headers: { Authorization: `Bearer ${token}` },
+        params: { page_size: ADMIN_PAGE_SIZE, cursor: activityCursor }
+      });
+      setActivityLogs(prev => [...prev, ...response.data.items]);
+      setActivityCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error('Error loading activity logs:', error);
+    }
+  };
+
   const fetchGithubRepos = async () => {
     if (!token) {
       toast.error('Please login first', {
@@ -1263,6 +1311,9 @@ function Admin() {
                     </div>
                   ))
                 )}
+                {contactsCursor && (
+                  <button onClick={loadMoreContacts} className="load-more-btn">Load More</button>
+                )}
               </div>
             </div>
           )}
@@ -1325,6 +1376,9 @@ function Admin() {
                     ))}
                   </div>
                 )}
+                {activityCursor && (
+                  <button onClick={loadMoreActivity} className="load-more-btn">Load More</button>
+                )}
               </div>
             </div>
           )}
@@ -1537,10 +1591,7 @@ function Admin() {
                         </div>
                       </div>
                       <div className="blog-actions">
-                        <button onClick={() => {
-                          setEditingBlog(blog);
-                          setActiveTab('blog-editor');
-                        }}>Edit</button>
+                        <button onClick={() => startEditBlog(blog.id)}>Edit</button>
                         <button onClick={() => deleteBlog(blog.id)} className="delete-btn">Delete</button>
                       </div>
                     </div>
@@ -8,11 +8,31 @@ import './Analytics.css';
 
 const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:5001/api';
 
+// Dashboard time ranges; `days: null` means all time (traffic chart shows the last 24 hours)
+const RANGES = [
+  { key: '24h', label: 'Last 24 Hours', days: 1 },
+  { key: '7d', label: 'Last 7 Days', days: 7 },
+  { key: '30d', label: 'Last 30 Days', days: 30 },
+  { key: '90d', label: 'Last 90 Days', days: 90 },
+  { key: 'all', label: 'All Time', days: null }
+];
+
+const formatBucket = (bucket, granularity) => {
+  // Buckets are UTC without a zone suffix
+  const date = new Date(`${bucket}Z`);
+  if (granularity === 'minute' || granularity === 'hour') {
+    return date.toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
+  }
+  return date.toLocaleDateString([], { month: 'short', day: 'numeric' });
+};
+
 function Analytics({ token }) {
   const [stats, setStats] = useState(null);
   const [realtime, setRealtime] = useState(null);
+  const [sessions, setSessions] = useState(null);
   const [loading, setLoading] = useState(true);
   const [autoRefresh, setAutoRefresh] = useState(true);
+  const [rangeKey, setRangeKey] = useState('all');
 
   useEffect(() => {
     fetchStats();
@@ -25,14 +45,22 @@ function Analytics({ token }) {
       }, 30000); // Refresh every 30 seconds
       return () => clearInterval(interval);
     }
-  }, [token, autoRefresh]);
+  }, [token, autoRefresh, rangeKey]);
 
   const fetchStats = async () => {
     try {
-      const response = await axios.get(`${API_URL}/analytics/stats`, {
-        headers: { Authorization: `Bearer ${token}` }
-      });
+      const range = RANGES.find(r => r.key === rangeKey);
+      const params = {};
+      if (range?.days) {
+        params.from = new Date(Date.now() - range.days * 24 * 60 * 60 * 1000).toISOString();
+      }
+      const headers = { Authorization: `Bearer ${token}` };
+      const [response, sessionsResponse] = await Promise.all([
+        axios.get(`${API_URL}/analytics/stats`, { headers, params }),
+        axios.get(`${API_URL}/analytics/sessions`, { headers, params })
+      ]);
       setStats(response.data);
+      setSessions(sessionsResponse.data);
       setLoading(false);
     } catch (error) {
       console.error('Error fetching stats:', error);
@@ -61,11 +89,13 @@ function Analytics({ token }) {
     return <div className="analytics-error">No analytics data available</div>;
   }
 
-  // Prepare hourly traffic data
-  const hourlyData = stats.hourly_traffic?.map(h => ({
-    hour: `${h.hour}:00`,
-    views: h.count
+  // Prepare traffic data (zero-filled buckets over the selected range)
+  const granularity = stats.range?.granularity || 'hour';
+  const trafficData = stats.traffic?.map(t => ({
+    bucket: formatBucket(t.bucket, granularity),
+    views: t.count
   })) || [];
+  const rangeLabel = RANGES.find(r => r.key === rangeKey)?.label;
 
   // Prepare section views data
   const sectionData = stats.section_views?.map(s => ({
@@ -73,6 +103,17 @@ function Analytics({ token }) {
     value: s.count
   })) || [];
 
+  // Prepare browser and device data
+  const browserData = stats.browsers?.map(b => ({
+    browser: b.name,
+    views: b.count
+  })) || [];
+
+  const deviceData = stats.devices?.map(d => ({
+    name: d.name,
+    value: d.count
+  })) || [];
+
   // Prepare country data
   const countryData = stats.visitors_by_country?.slice(0, 10).map(c => ({
     country: c.country,
@@ -83,6 +124,15 @@ function Analytics({ token }) {
     <div className="analytics-dashboard">
       <div className="analytics-header">
         <h2>Analytics Dashboard</h2>
+        <select
+          className="range-select"
+          value={rangeKey}
+          onChange={(e) => setRangeKey(e.target.value)}
+        >
+          {RANGES.map(r => (
+            <option key={r.key} value={r.key}>{r.label}</option>
+          ))}
+        </select>
         <label className="auto-refresh-toggle">
           <input
             type="checkbox"
@@ -125,17 +175,45 @@ function Analytics({ token }) {
           <h3>Countries</h3>
           <p className="stat-value">{stats.visitors_by_country?.length || 0}</p>
         </div>
+        <div className="stat-card">
+          <h3>Bot Events Filtered</h3>
+          <p className="stat-value">
+            {stats.filtered_events?.filter(f => f.reason !== 'load_shed').reduce((sum, f) => sum + f.count, 0) || 0}
+          </p>
+        </div>
+        <div className="stat-card">
+          <h3>Events Shed Under Load</h3>
+          <p className="stat-value">
+            {stats.filtered_events?.find(f => f.reason === 'load_shed')?.count || 0}
+          </p>
+        </div>
+        {sessions && (
+          <>
+            <div className="stat-card">
+              <h3>Visits</h3>
+              <p className="stat-value">{sessions.visits}</p>
+            </div>
+            <div className="stat-card">
+              <h3>Avg Visit Duration</h3>
+              <p className="stat-value">{Math.round(sessions.avg_duration)}s</p>
+            </div>
+            <div className="stat-card">
+              <h3>Bounce Rate</h3>
+              <p className="stat-value">{(sessions.bounce_rate * 100).toFixed(1)}%</p>
+            </div>
+          </>
+        )}
       </div>
 
       {/* Charts */}
       <div className="charts-grid">
-        {/* Hourly Traffic Chart */}
+        {/* Traffic Chart */}
         <div className="chart-container">
-          <h3>Hourly Traffic (Last 24 Hours)</h3>
+          <h3>Traffic ({rangeKey === 'all' ? 'Last 24 Hours' : rangeLabel})</h3>
           <ResponsiveContainer width="100%" height={300}>
-            <LineChart data={hourlyData}>
+            <LineChart data={trafficData}>
               <CartesianGrid strokeDasharray="3 3" />
-              <XAxis dataKey="hour" />
+              <XAxis dataKey="bucket" />
               <YAxis />
               <Tooltip />
               <Legend />
@@ -196,6 +274,74 @@ function Analytics({ token }) {
             ))}
           </div>
         </div>
+
+        {/* Time on Section (median / 90th percentile) */}
+        <div className="chart-container">
+          <h3>Time on Section</h3>
+          <div className="top-projects-list">
+            {stats.time_on_section?.slice(0, 10).map((section, index) => (
+              <div key={section.section} className="project-stat-item">
+                <span className="project-rank">{index + 1}</span>
+                <span className="project-name">{section.section}</span>
+                <span className="project-count">
+                  {Math.round(section.p50)}s median · {Math.round(section.p90)}s p90
+                </span>
+              </div>
+            ))}
+          </div>
+        </div>
+      </div>
+
+      {/* Browsers, Devices and Referrers */}
+      <div className="charts-grid">
+        <div className="chart-container">
+          <h3>Browsers</h3>
+          <ResponsiveContainer width="100%" height={300}>
+            <BarChart data={browserData}>
+              <CartesianGrid strokeDasharray="3 3" />
+              <XAxis dataKey="browser" />
+              <YAxis />
+              <Tooltip />
+              <Bar dataKey="views" fill="#4facfe" />
+            </BarChart>
+          </ResponsiveContainer>
+        </div>
+
+        <div className="chart-container">
+          <h3>Devices</h3>
+          <ResponsiveContainer width="100%" height={300}>
+            <PieChart>
+              <Pie
+                data={deviceData}
+                cx="50%"
+                cy="50%"
+                labelLine={false}
+                label={({ name, percent }) => `${name} ${(percent * 100).toFixed(0)}%`}
+                outerRadius={80}
+                fill="#8884d8"
+                dataKey="value"
+              >
+                {deviceData.map((entry, index) => (
+                  <Cell key={`device-${index}`} fill={COLORS[index % COLORS.length]} />
+                ))}
+              </Pie>
+              <Tooltip />
+            </PieChart>
+          </ResponsiveContainer>
+        </div>
+
+        <div className="chart-container">
+          <h3>Top Referrers</h3>
+          <div className="top-projects-list">
+            {stats.referrer_domains?.map((referrer, index) => (
+              <div key={index} className="project-stat-item">
+                <span className="project-rank">{index + 1}</span>
+                <span className="project-name">{referrer.name}</span>
+                <span className="project-count">{referrer.count} views</span>
+              </div>
+            ))}
+          </div>
+        </div>
       </div>
 
       {/* Location Data */}
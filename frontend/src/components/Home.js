@@ -44,15 +44,11 @@ function Home() {
 
   const fetchData = async () => {
     try {
-      const [aboutRes, projectsRes, skillsRes] = await Promise.all([
-        axios.get(`${API_URL}/about`),
-        axios.get(`${API_URL}/projects`),
-        axios.get(`${API_URL}/skills`)
-      ]);
+      const { data } = await axios.get(`${API_URL}/bootstrap?sections=about,projects,skills`);
       
-      setAbout(aboutRes.data);
-      setProjects(projectsRes.data);
-      setSkills(skillsRes.data);
+      setAbout(data.about);
+      setProjects(data.projects || []);
+      setSkills(data.skills || []);
     } catch (error) {
       console.error('Error fetching data:', error);
     } finally {
@@ -66,25 +66,18 @@ function ModernHome() {
 
   const fetchData = async () => {
     try {
-      const [aboutRes, projectsRes, skillsRes, expRes, githubSettingsRes, githubRes, blogsRes] = await Promise.all([
-        axios.get(`${API_URL}/about`),
-        axios.get(`${API_URL}/projects`),
-        axios.get(`${API_URL}/skills`),
-        axios.get(`${API_URL}/experience`),
-        axios.get(`${API_URL}/github/settings/public`).catch(() => ({ data: { enabled: false } })),
-        axios.get(`${API_URL}/github/repos/public`).catch(() => ({ data: { repos: [] } })),
-        axios.get(`${API_URL}/blogs?homepage=true`).catch(() => ({ data: [] }))
-      ]);
-
-      setAbout(aboutRes.data);
-      setProjects(projectsRes.data || []);
-      setSkills(skillsRes.data || []);
-      setExperience(expRes.data || []);
-      setGithubSettings(githubSettingsRes.data);
-      setBlogs(blogsRes.data || []);
-
-      if (githubSettingsRes.data?.enabled) {
-        setGithubRepos(githubRes.data?.repos || []);
+      // One round trip: every homepage section comes from /bootstrap
+      const { data } = await axios.get(`${API_URL}/bootstrap`);
+
+      setAbout(data.about);
+      setProjects(data.projects || []);
+      setSkills(data.skills || []);
+      setExperience(data.experience || []);
+      setGithubSettings(data.github_settings || { enabled: false });
+      setBlogs(data.blogs || []);
+
+      if (data.github_settings?.enabled) {
+        setGithubRepos(data.github_repos?.repos || []);
       }
     } catch (error) {
       console.error('Error fetching data:', error);
@@ -11,19 +11,35 @@ const getSessionId = () => {
   return sessionId;
 };
 
-// Track event
-export const trackEvent = async (eventType, data = {}) => {
+// Events are queued and sent together to the batch endpoint
+const BATCH_SIZE = 20;
+const FLUSH_INTERVAL_MS = 2000;
+let eventQueue = [];
+let flushTimer = null;
+
+// Send queued events in one request
+export const flushEvents = async ({ keepalive = false } = {}) => {
+  if (flushTimer) {
+    clearTimeout(flushTimer);
+    flushTimer = null;
+  }
+  if (eventQueue.length === 0) return;
+
+  const events = eventQueue;
+  eventQueue = [];
   try {
-    const sessionId = getSessionId();
-    await fetch(`${API_URL}/analytics/track`, {
+    await fetch(`${API_URL}/analytics/track/batch`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
       },
+      // keepalive lets the request outlive the page when flushing on unload
+      keepalive,
       body: JSON.stringify({
-        session_id: sessionId,
-        event_type: eventType,
-        ...data
+        session_id: getSessionId(),
+        // Where the visitor came from; the Referer header only names this page
+        referrer: document.referrer || undefined,
+        events
       })
     });
   } catch (error) {
@@ -31,6 +47,31 @@ export const trackEvent = async (eventType, data = {}) => {
   }
 };
 
+// Track event
+export const trackEvent = (eventType, data = {}) => {
+  eventQueue.push({
+    event_type: eventType,
+    timestamp: new Date().toISOString(),
+    ...data
+  });
+
+  if (eventQueue.length >= BATCH_SIZE) {
+    flushEvents();
+  } else if (!flushTimer) {
+    flushTimer = setTimeout(() => flushEvents(), FLUSH_INTERVAL_MS);
+  }
+};
+
+// Flush pending events when the tab is hidden or closed
+if (typeof window !== 'undefined') {
+  window.addEventListener('pagehide', () => flushEvents({ keepalive: true }));
+  document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'hidden') {
+      flushEvents({ keepalive: true });
+    }
+  });
+}
+
 // Track page view
 export const trackPageView = () => {
   trackEvent('page_view', {